@@ -0,0 +1,301 @@
+"""ベンチマーク用の合成コーパスを生成する
+
+同じシード・同じ規模からは常に同じファイルを生成するため、
+マシンやコミットをまたいで結果を比較できます。
+"""
+import io
+import random
+import re
+import zipfile
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import pikepdf
+from PIL import Image
+
+# PDFに埋め込む画像の種類（圧縮サービスの分類ごとの経路をひと通り通す）
+IMAGE_KINDS = ("jpeg_photo", "flate_photo", "gray", "bilevel", "palette")
+
+# ZIP（DOCX・XLSX）の各エントリと文書のプロパティに入れる固定の日時
+FIXED_DATE_TIME = (2020, 1, 1, 0, 0, 0)
+_TIMESTAMP = re.compile(rb"(<dcterms:(?:created|modified)[^>]*>)[^<]*(</dcterms:)")
+
+WORDS = (
+    "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi omicron "
+    "pi rho sigma tau upsilon phi chi psi omega"
+).split()
+
+
+@dataclass(frozen=True)
+class Scale:
+    """コーパスの規模"""
+    pdf_pages: int
+    pdf_images: int
+    image_size: int  # 画像の長辺（ピクセル）
+    shared_pages: int  # 共有XObjectのPDFのページ数
+    text_pages: int
+    paragraphs: int  # DOCX・HTMLの段落数
+    rows: int  # XLSXの1シートあたりの行数
+    sheets: int
+
+
+SCALES = {
+    "small": Scale(pdf_pages=12, pdf_images=10, image_size=600, shared_pages=60,
+                   text_pages=30, paragraphs=300, rows=500, sheets=3),
+    "medium": Scale(pdf_pages=60, pdf_images=40, image_size=1200, shared_pages=400,
+                    text_pages=200, paragraphs=2000, rows=5000, sheets=5),
+    "large": Scale(pdf_pages=300, pdf_images=150, image_size=2400, shared_pages=2000,
+                   text_pages=1000, paragraphs=10000, rows=20000, sheets=8),
+}
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_image(kind: str, size: int, rng: random.Random) -> Image.Image:
+    """種類ごとに、それらしい内容を持つ画像を作る（乱数はrngからのみ取る）"""
+    width, height = size, size * 3 // 4
+    if kind == "bilevel":
+        # 文字のような細かい白黒のパターン
+        img = Image.new("1", (width, height), 1)
+        pixels = img.load()
+        for _ in range(width * height // 40):
+            x, y = rng.randrange(width - 4), rng.randrange(height - 2)
+            for dx in range(4):
+                pixels[x + dx, y] = 0
+        return img
+    if kind == "palette":
+        # 少ない色で塗り分けた図表
+        img = Image.new("RGB", (width, height), (255, 255, 255))
+        colors = [(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(6)]
+        bar = max(1, width // 12)
+        for i in range(0, width, bar * 2):
+            top = rng.randrange(height)
+            img.paste(colors[i // bar % len(colors)], (i, top, i + bar, height))
+        return img
+    # 写真: グラデーションに細かいノイズを重ねる
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.frombytes("L", (width, height), rng.randbytes(width * height))
+    gray = Image.blend(gradient, noise, 0.25)
+    if kind == "gray":
+        return gray
+    mirrored = gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    return Image.merge("RGB", (gray, mirrored, noise.point(lambda v: v // 2)))
+
+
+def _image_xobject(pdf: pikepdf.Pdf, kind: str, img: Image.Image) -> pikepdf.Stream:
+    if kind == "jpeg_photo":
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=95)
+        xobj = pikepdf.Stream(pdf, buffer.getvalue())
+        xobj.Filter = pikepdf.Name.DCTDecode
+    else:
+        # PILの"1"は1が白のため、DeviceGrayの1ビットとそのまま一致する
+        xobj = pikepdf.Stream(pdf, zlib.compress(img.tobytes()))
+        xobj.Filter = pikepdf.Name.FlateDecode
+    xobj.Type = pikepdf.Name.XObject
+    xobj.Subtype = pikepdf.Name.Image
+    xobj.Width, xobj.Height = img.size
+    xobj.BitsPerComponent = 1 if img.mode == "1" else 8
+    xobj.ColorSpace = pikepdf.Name.DeviceRGB if img.mode == "RGB" else pikepdf.Name.DeviceGray
+    return pdf.make_indirect(xobj)
+
+
+def _add_page(pdf: pikepdf.Pdf, font, text: str, xobjects: dict):
+    """テキスト1行と、指定したXObjectを並べたページを追加する"""
+    page = pdf.add_blank_page(page_size=(612, 792))
+    page.Resources = pikepdf.Dictionary(
+        Font=pikepdf.Dictionary(F1=font), XObject=pikepdf.Dictionary(xobjects)
+    )
+    content = [f"BT /F1 11 Tf 72 750 Td ({text}) Tj ET"]
+    for i, name in enumerate(xobjects):
+        x, y = 72 + (i % 2) * 240, 480 - (i // 2) * 200
+        content.append(f"q 220 0 0 165 {x} {y} cm {name} Do Q")
+    page.Contents = pdf.make_stream("\n".join(content).encode())
+
+
+def _new_pdf():
+    pdf = pikepdf.new()
+    font = pdf.make_indirect(pikepdf.Dictionary(
+        Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1, BaseFont=pikepdf.Name.Helvetica,
+    ))
+    return pdf, font
+
+
+def make_image_pdf(path, pages: int, images: int, size: int, seed: int = 0):
+    """pages ページに images 枚の画像を並べたPDFを作る
+
+    画像の種類は IMAGE_KINDS を順に使います。画像がページより少ない場合は
+    同じXObjectを複数のページから参照します。
+    """
+    rng = random.Random(seed)
+    pdf, font = _new_pdf()
+    xobjects = [
+        _image_xobject(pdf, kind, make_image(kind, size, rng))
+        for kind in (IMAGE_KINDS[i % len(IMAGE_KINDS)] for i in range(images))
+    ]
+    per_page = max(1, -(-images // pages))
+    for page_number in range(pages):
+        start = page_number * per_page
+        names = {f"/Im{j}": xobjects[(start + j) % images] for j in range(per_page)}
+        _add_page(pdf, font, f"Page {page_number + 1}", names)
+    pdf.save(path, deterministic_id=True)
+
+
+def make_shared_pdf(path, pages: int, size: int, seed: int = 0):
+    """少数の画像（ロゴ・背景など）と、画像を含むForm XObjectを全ページで共有するPDFを作る"""
+    rng = random.Random(seed)
+    pdf, font = _new_pdf()
+    logo = _image_xobject(pdf, "palette", make_image("palette", size // 2, rng))
+    background = _image_xobject(pdf, "jpeg_photo", make_image("jpeg_photo", size, rng))
+    stamp = _image_xobject(pdf, "gray", make_image("gray", size // 2, rng))
+    form = pdf.make_stream(
+        b"q 1 0 0 1 0 0 cm /Im0 Do Q",
+        Type=pikepdf.Name.XObject, Subtype=pikepdf.Name.Form, BBox=[0, 0, 1, 1],
+        Resources=pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=stamp)),
+    )
+    for page_number in range(pages):
+        _add_page(pdf, font, f"Page {page_number + 1}", {"/Logo": logo, "/Bg": background, "/Stamp": form})
+    pdf.save(path, deterministic_id=True)
+
+
+def make_text_pdf(path, pages: int, seed: int = 0):
+    """1ページに数十行のテキストを持つPDFを作る（Markdown変換用）"""
+    rng = random.Random(seed)
+    pdf, font = _new_pdf()
+    for page_number in range(pages):
+        lines = [f"BT /F1 10 Tf 72 750 Td 14 TL (Section {page_number + 1}) Tj"]
+        lines += [f"T* ({_sentence(rng, 10)}) Tj" for _ in range(45)]
+        lines.append("ET")
+        page = pdf.add_blank_page(page_size=(612, 792))
+        page.Resources = pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=font))
+        page.Contents = pdf.make_stream("\n".join(lines).encode())
+    pdf.save(path, deterministic_id=True)
+
+
+def make_docx(path, paragraphs: int, seed: int = 0):
+    """見出し・段落・表を含むDOCXを、最小限のWordprocessingMLで作る"""
+    rng = random.Random(seed)
+    body = []
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            body.append(
+                f'<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr>'
+                f'<w:r><w:t>Chapter {i // 20 + 1}</w:t></w:r></w:p>'
+            )
+        body.append(f"<w:p><w:r><w:t>{escape(_sentence(rng, 30))}</w:t></w:r></w:p>")
+        if i % 50 == 49:
+            rows = "".join(
+                "<w:tr>" + "".join(
+                    f"<w:tc><w:p><w:r><w:t>{rng.randrange(10000)}</w:t></w:r></w:p></w:tc>" for _ in range(4)
+                ) + "</w:tr>"
+                for _ in range(5)
+            )
+            body.append(f"<w:tbl>{rows}</w:tbl>")
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{"".join(body)}</w:body></w:document>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        _writestr(docx, "[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType='
+            '"application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        _writestr(docx, "_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type='
+            '"http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/></Relationships>'
+        ))
+        _writestr(docx, "word/document.xml", document)
+
+
+def _writestr(archive, name: str, data):
+    # 現在時刻ではなく固定の日時でエントリを書き込み、生成するたびに同じバイト列にする
+    archive.writestr(zipfile.ZipInfo(name, FIXED_DATE_TIME), data, zipfile.ZIP_DEFLATED)
+
+
+def _normalize_zip(path):
+    """ZIPの各エントリの日時と、文書のプロパティの作成・更新日時を固定の値に書き換える"""
+    with zipfile.ZipFile(path) as archive:
+        entries = [(info.filename, archive.read(info)) for info in archive.infolist()]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            if name.startswith("docProps/"):
+                data = _TIMESTAMP.sub(rb"\g<1>2020-01-01T00:00:00Z\g<2>", data)
+            _writestr(archive, name, data)
+
+
+def make_xlsx(path, sheets: int, rows: int, seed: int = 0):
+    """数値と文字列の列を持つシートを並べたXLSXを作る"""
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    for sheet_number in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet{sheet_number + 1}")
+        sheet.append(["id", "name", "quantity", "price", "note"])
+        for row in range(rows):
+            sheet.append([
+                row, rng.choice(WORDS), rng.randrange(1000), round(rng.uniform(1, 500), 2), _sentence(rng, 4),
+            ])
+    workbook.save(path)
+    # openpyxlは保存した時刻を書き込むため、後から固定の日時にそろえる
+    _normalize_zip(path)
+
+
+def make_html(path, paragraphs: int, seed: int = 0):
+    """見出し・段落・リスト・表を含むHTMLを作る"""
+    rng = random.Random(seed)
+    parts = ["<html><head><title>Benchmark</title></head><body>"]
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            parts.append(f"<h2>Section {i // 20 + 1}</h2>")
+        parts.append(f"<p>{escape(_sentence(rng, 30))}</p>")
+        if i % 25 == 24:
+            parts.append("<ul>" + "".join(f"<li>{rng.choice(WORDS)}</li>" for _ in range(5)) + "</ul>")
+            parts.append("<table>" + "".join(
+                "<tr>" + "".join(f"<td>{rng.randrange(10000)}</td>" for _ in range(4)) + "</tr>"
+                for _ in range(5)
+            ) + "</table>")
+    parts.append("</body></html>")
+    Path(path).write_text("\n".join(parts), encoding="utf-8")
+
+
+def build_corpus(directory, scale="small", seed: int = 0) -> dict:
+    """規模（SCALESの名前またはScale）に応じたコーパスを directory に生成する
+
+    Returns:
+        ベンチマークの名前 -> {"kind": "compress" または "convert", "files": パスの一覧}
+    """
+    spec = SCALES[scale] if isinstance(scale, str) else scale
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    def path(name):
+        return directory / name
+
+    make_image_pdf(path("images.pdf"), spec.pdf_pages, spec.pdf_images, spec.image_size, seed)
+    make_shared_pdf(path("shared.pdf"), spec.shared_pages, spec.image_size, seed)
+    make_text_pdf(path("text.pdf"), spec.text_pages, seed)
+    make_docx(path("document.docx"), spec.paragraphs, seed)
+    make_xlsx(path("workbook.xlsx"), spec.sheets, spec.rows, seed)
+    make_html(path("page.html"), spec.paragraphs, seed)
+    return {
+        "compress_images": {"kind": "compress", "files": [path("images.pdf")]},
+        "compress_shared": {"kind": "compress", "files": [path("shared.pdf")]},
+        "convert_pdf": {"kind": "convert", "files": [path("text.pdf")]},
+        "convert_docx": {"kind": "convert", "files": [path("document.docx")]},
+        "convert_xlsx": {"kind": "convert", "files": [path("workbook.xlsx")]},
+        "convert_html": {"kind": "convert", "files": [path("page.html")]},
+    }
@@ -0,0 +1,207 @@
+"""変換・圧縮のスループットを測るベンチマーク
+
+合成コーパスを生成し、PDFCompressionService.compress_pdf と
+ConversionService.process_files の経過時間・ページ/秒・MB/秒・最大メモリ使用量・
+出力サイズを測ります。結果はJSONで保存し、保存済みのベースラインと比較できます。
+
+    python -m benchmarks.run --scale small --output bench.json
+    python -m benchmarks.run --save-baseline baseline.json
+    python -m benchmarks.run --baseline baseline.json --output bench.json
+
+ベースラインはマシンごとに異なるため、比較するマシンで --save-baseline して作ってください。
+最大メモリ使用量はこのプロセスの常駐メモリ量のため、変換は既定でプロセスを使わずに実行します。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from application.conversion_service import ConversionService  # noqa: E402
+from application.pdf_compression_service import (  # noqa: E402
+    DEFAULT_SAVE_PROFILE, SAVE_PROFILES, PDFCompressionService,
+)
+from benchmarks.corpus import SCALES, build_corpus  # noqa: E402
+from domain.markdown_converter import MarkdownConverter  # noqa: E402
+from infrastructure.memory_monitor import MemoryMonitor  # noqa: E402
+
+# ベースラインと比較する指標（いずれも値が大きいほど悪い）
+COMPARED_METRICS = ("wall_seconds", "peak_memory_bytes", "output_bytes")
+# この割合を超えて悪化した指標を退行とみなす
+DEFAULT_TOLERANCE = 0.2
+PACKAGES = ("pikepdf", "pillow", "markitdown", "pdfminer.six", "pandas", "openpyxl")
+
+
+async def _compress(files, args) -> dict:
+    service = PDFCompressionService(image_workers=args.image_workers, save_profile=args.save_profile)
+    try:
+        results = [await service.compress_pdf(path, compression_ratio=args.ratio) for path in files]
+    finally:
+        service.shutdown()
+    return {
+        "input_bytes": sum(r.original_size for r in results),
+        "output_bytes": sum(r.compressed_size for r in results),
+        "pages": sum(r.pages for r in results),
+        "save_seconds": sum(r.save_seconds for r in results),
+        "errors": [r.error for r in results if r.error],
+    }
+
+
+async def _convert(files, args) -> dict:
+    service = ConversionService(max_workers=args.workers)
+    try:
+        summary = await service.process_files(files)
+    finally:
+        service.shutdown()
+    return {
+        "input_bytes": sum(r.input_bytes for r in summary.results),
+        "output_bytes": sum(r.output_bytes for r in summary.results),
+        "pages": sum(r.pages for r in summary.results),
+        "errors": [r.error for r in summary.results if r.error],
+    }
+
+
+def run_case(case: dict, args) -> dict:
+    """1つのベンチマークを repeat 回実行し、最も速かった回の値を返す（最大メモリは全回の最大）"""
+    measure = _compress if case["kind"] == "compress" else _convert
+    best = None
+    peak = None
+    for _ in range(args.repeat):
+        monitor = MemoryMonitor()
+        started = time.perf_counter()
+        with monitor:
+            metrics = asyncio.run(measure(case["files"], args))
+        metrics["wall_seconds"] = time.perf_counter() - started
+        if monitor.peak_bytes is not None:
+            peak = max(peak or 0, monitor.peak_bytes)
+        if best is None or metrics["wall_seconds"] < best["wall_seconds"]:
+            best = metrics
+    seconds = best["wall_seconds"]
+    return {
+        "kind": case["kind"],
+        "files": len(case["files"]),
+        **best,
+        "peak_memory_bytes": peak,
+        "pages_per_second": best["pages"] / seconds if seconds else 0.0,
+        "mb_per_second": best["input_bytes"] / (1024 * 1024) / seconds if seconds else 0.0,
+    }
+
+
+def compare(cases: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """ベースラインとの差を指標ごとに返す（changeは増加の割合、regressionは許容範囲を超えた悪化）"""
+    comparison = []
+    for name, current in cases.items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            comparison.append({
+                "case": name, "metric": metric, "baseline": before, "current": after,
+                "change": change, "regression": change > tolerance,
+            })
+    return comparison
+
+
+def environment() -> dict:
+    packages = {}
+    for package in PACKAGES:
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="変換・圧縮のベンチマークを実行します")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="コーパスの規模")
+    parser.add_argument("--seed", type=int, default=0, help="コーパス生成の乱数シード")
+    parser.add_argument("--cases", nargs="*", default=None, help="実行するベンチマーク（省略時はすべて）")
+    parser.add_argument("--repeat", type=int, default=3, help="各ベンチマークの実行回数（最速の回を採用）")
+    parser.add_argument("--corpus-dir", default=None, help="コーパスの生成先（省略時は一時ディレクトリ）")
+    parser.add_argument("--workers", type=int, default=0, help="変換プロセス数（0でプロセスを使わない）")
+    parser.add_argument("--image-workers", type=int, default=None, help="画像の再エンコードに使うワーカー数")
+    parser.add_argument("--ratio", type=float, default=75.0, help="圧縮率（0-100）")
+    parser.add_argument("--save-profile", choices=SAVE_PROFILES, default=DEFAULT_SAVE_PROFILE,
+                        help="圧縮したPDFの保存プロファイル")
+    parser.add_argument("--output", default=None, help="結果のJSONを書き出すファイル（省略時は標準出力）")
+    parser.add_argument("--baseline", default=None, help="比較するベースラインのJSON")
+    parser.add_argument("--save-baseline", default=None, help="今回の結果をベースラインとして保存するファイル")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="退行とみなす悪化の割合（0.2で20%%）")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus = build_corpus(args.corpus_dir or temp_dir, args.scale, args.seed)
+        names = args.cases or list(corpus)
+        unknown = set(names) - set(corpus)
+        if unknown:
+            print(f"エラー: 不明なベンチマーク: {', '.join(sorted(unknown))}", file=sys.stderr)
+            return 2
+        if any(corpus[name]["kind"] == "convert" for name in names):
+            # markitdownの読み込みとエンジンの生成を最初のベンチマークの時間に含めない
+            MarkdownConverter().warm_up()
+        cases = {}
+        for name in names:
+            cases[name] = run_case(corpus[name], args)
+            print(
+                f"{name}: {cases[name]['wall_seconds']:.3f}秒 / {cases[name]['pages_per_second']:.1f} ページ/秒 / "
+                f"{cases[name]['mb_per_second']:.2f} MB/秒",
+                file=sys.stderr, flush=True,
+            )
+
+    report = {
+        "timestamp": time.time(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "save_profile": args.save_profile,
+        "environment": environment(),
+        "cases": cases,
+    }
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if baseline.get("scale") != args.scale or baseline.get("seed") != args.seed:
+            print("警告: ベースラインとコーパスの規模・シードが異なります", file=sys.stderr)
+        if baseline.get("save_profile", DEFAULT_SAVE_PROFILE) != args.save_profile:
+            print("警告: ベースラインと保存プロファイルが異なります", file=sys.stderr)
+        report["comparison"] = compare(cases, baseline, args.tolerance)
+        regressions = [c for c in report["comparison"] if c["regression"]]
+        for c in regressions:
+            print(f"退行: {c['case']} {c['metric']} {c['change']:+.1%}", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(output + "\n", encoding="utf-8")
+    errors = any(case["errors"] for case in cases.values())
+    return 1 if regressions or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
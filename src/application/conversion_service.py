@@ -1,53 +1,350 @@
 import asyncio
+import contextlib
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
+from application.progress import NULL_PROGRESS, ProgressListener
 from domain.markdown_converter import MarkdownConverter
+from infrastructure.conversion_cache import ConversionCache
 from infrastructure.file_repository import FileRepository
+from infrastructure.metrics import NULL_RECORDER, MetricsRecorder
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConversionResult:
+    """1ファイル分の変換結果"""
+    source: str
+    output: str
+    state: str = "queued"  # "done"・"cached"・"error"
+    error: str = None
+    duration_seconds: float = 0.0
+    input_bytes: int = 0
+    output_bytes: int = 0
+    pages: int = 0  # ページ（XLSXはシート）の数。区切りのない形式では1
+    metrics: dict = None  # ステージごとの計測結果（計測しない場合はNone）
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class ConversionSummary:
+    """バッチ全体の変換結果（キャッシュを使わない場合ヒット数・ミス数はNone）"""
+    results: list = field(default_factory=list)
+    duration_seconds: float = 0.0
+    cache_hits: int = None
+    cache_misses: int = None
+
+    @property
+    def failed(self) -> int:
+        return sum(r.state == "error" for r in self.results)
+
+    def to_dict(self) -> dict:
+        return {
+            "duration_seconds": self.duration_seconds,
+            "files": len(self.results),
+            "failed": self.failed,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "results": [r.to_dict() for r in self.results],
+        }
+
+
+def output_path_for(file_path: Path) -> Path:
+    """変換結果の出力先（Markdownの入力を上書きしないよう、.mdの場合は別名にする）"""
+    if file_path.suffix.lower() == ".md":
+        return file_path.with_name(f"converted_{file_path.name}")
+    return file_path.with_suffix(".md")
+
+
+# ワーカープロセスから親プロセスへ進捗を送るキュー
+_progress_queue = None
+# 変換の完了後、ワーカーからの残りの進捗を待つ最大秒数
+PROGRESS_DRAIN_TIMEOUT = 5.0
+
+
+def _init_worker(progress_queue=None):
+    # ワーカープロセス起動時に進捗の送り先を受け取り、エンジンを生成しておく
+    global _progress_queue
+    _progress_queue = progress_queue
+    MarkdownConverter().warm_up()
+
+
+def _convert_to_file(file_path: str, output_path: str, token: int = None, data: bytes = None):
+    """ワーカープロセス内でファイルを変換し、区切りごとに出力ファイルへ書き出す
+
+    Returns:
+        (書き込んだバイト数, 区切りの数, ステージごとの秒数)
+    """
+    report = _progress_queue is not None and token is not None
+    written = 0
+    pages = 0
+    started = time.perf_counter()
+    convert_seconds = 0.0
+    try:
+        with FileRepository().open_atomic_sync(output_path) as f:
+            chunks = MarkdownConverter().iter_chunks(file_path, data)
+            while True:
+                chunk_started = time.perf_counter()
+                chunk = next(chunks, None)
+                convert_seconds += time.perf_counter() - chunk_started
+                if chunk is None:
+                    break
+                f.write(chunk.text)
+                written += len(chunk.text.encode('utf-8'))
+                pages = chunk.total or chunk.done
+                if report and chunk.total:
+                    _progress_queue.put((token, chunk.done / chunk.total))
+    finally:
+        if report:
+            # 進捗の終わりを知らせ、親プロセスが届いた進捗をすべて渡してから完了を通知できるようにする
+            _progress_queue.put((token, None))
+    stages = {"convert": convert_seconds, "write": time.perf_counter() - started - convert_seconds}
+    return written, pages, stages
+
 
 class ConversionService:
-    def __init__(self):
+    """ファイルをMarkdownに変換するサービスクラス
+
+    max_workersが1以上の場合はプロセスプールで並列に変換し、
+    0の場合は同一プロセス内のスレッドで1件ずつ変換します。
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = None, cache: ConversionCache = None,
+                 metrics: MetricsRecorder = None):
+        """
+        Args:
+            max_workers: 変換に使うプロセス数（Noneの場合はCPUコア数、0の場合はプロセスを使わない）
+            max_pending: 同時に投入する変換の上限（Noneの場合はmax_workersの2倍）
+            cache: 変換結果のキャッシュ（Noneの場合はキャッシュしない）
+            metrics: ステージごとの計測結果の記録先（Noneの場合は計測しない）
+        """
         self.converter = MarkdownConverter()
         self.repository = FileRepository()
+        self.cache = cache
+        self.metrics = metrics or NULL_RECORDER
+        if self.cache is not None and not self.cache.namespace:
+            self.cache.namespace = self.converter.fingerprint()
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_pending = max_pending or max(1, self.max_workers * 2)
+        self._executor = None
+        self._progress_queue = None
+        self._progress_thread = None
+        self._progress_targets = {}
+        self._tokens = itertools.count()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Fletのスレッドを持つ親プロセスをforkしないようspawnで起動する
+            context = multiprocessing.get_context("spawn")
+            if self._progress_queue is None:
+                self._progress_queue = context.Queue()
+                self._progress_thread = threading.Thread(
+                    target=self._dispatch_progress, args=(self._progress_queue,),
+                    name="conversion-progress", daemon=True,
+                )
+                self._progress_thread.start()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._progress_queue,),
+            )
+        return self._executor
+
+    def _dispatch_progress(self, progress_queue):
+        """ワーカーから届いた進捗を、変換を待っているイベントループでリスナーに渡す"""
+        while (message := progress_queue.get()) is not None:
+            token, fraction = message
+            target = self._progress_targets.get(token)
+            if target is None:
+                continue
+            loop, listener, index, drained = target
+            if fraction is None:
+                loop.call_soon_threadsafe(drained.set)
+            else:
+                loop.call_soon_threadsafe(listener.item_progress, index, fraction)
+
+    def shutdown(self):
+        """プロセスプールを終了する"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        if self._progress_queue is not None:
+            self._progress_queue.put(None)
+            self._progress_thread.join()
+            self._progress_queue.close()
+            self._progress_queue = self._progress_thread = None
+
+    async def _convert_in_process(self, file_path: Path, output_file: Path, index: int,
+                                  listener: ProgressListener, data: bytes = None):
+        iterator = self.converter.iter_chunks(file_path, data)
+        pages = 0
+        convert_seconds = 0.0
+
+        async def chunks():
+            nonlocal pages, convert_seconds
+            # 変換はスレッドで1区切りずつ進め、届いた分から書き出す
+            while True:
+                chunk_started = time.perf_counter()
+                chunk = await asyncio.to_thread(next, iterator, None)
+                convert_seconds += time.perf_counter() - chunk_started
+                if chunk is None:
+                    return
+                pages = chunk.total or chunk.done
+                if chunk.total:
+                    listener.item_progress(index, chunk.done / chunk.total)
+                yield chunk.text
+
+        started = time.perf_counter()
+        written = await self.repository.write_chunks(output_file, chunks())
+        stages = {"convert": convert_seconds, "write": time.perf_counter() - started - convert_seconds}
+        return written, pages, stages
 
-    async def convert_file(self, file_path: Path, status):
+    async def _convert(self, file_path: Path, output_file: Path, index: int = 0,
+                       listener: ProgressListener = NULL_PROGRESS, data: bytes = None):
+        """ファイルを変換して出力先に書き出し、(書き込んだバイト数, 区切りの数, ステージごとの秒数) を返す"""
+        if self.max_workers == 0:
+            return await self._convert_in_process(file_path, output_file, index, listener, data)
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        token = next(self._tokens)
+        drained = asyncio.Event()
+        self._progress_targets[token] = (loop, listener, index, drained)
         try:
-            result = self.converter.convert(file_path)
-            output_file = file_path.with_suffix('.md')
-            await self.repository.write_content(output_file, result.text_content)
-            status.progress.value = 1.0
-            status.status.value = "完了 ✅"
-        except Exception as ex:
-            status.status.value = f"エラー: {str(ex)} ❌"
+            submitted = time.perf_counter()
+            written, pages, stages = await loop.run_in_executor(
+                executor, _convert_to_file, str(file_path), str(output_file), token, data
+            )
+            # ワーカーが空くまでの待ち時間（プロセス間の受け渡しを含む）
+            stages["queue_wait"] = max(0.0, time.perf_counter() - submitted - sum(stages.values()))
+            # 結果は進捗とは別の経路で届くため、残りの進捗を渡し終えるまで待つ
+            try:
+                await asyncio.wait_for(drained.wait(), PROGRESS_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("進捗の受信を待たずに完了を通知: %s", file_path)
+            return written, pages, stages
+        except BrokenProcessPool:
+            # ワーカーが異常終了した場合、次回以降のためにプールを作り直す
+            self._executor = None
+            raise
         finally:
-            status.progress.update()
-            status.status.update()
-
-    async def process_files(self, files, status_container, total_progress, total_status):
-        total_progress.visible = True
-        total_progress.value = 0
-        total_status.value = "変換中..."
-        status_container.controls.clear()
-
-        file_statuses = []
-        # Presentation層に定義したFileConversionStatusをインポートして利用
-        from presentation.conversion_status import FileConversionStatus
-        for file in files:
-            status = FileConversionStatus(Path(file.path).name)
-            file_statuses.append(status)
-            status_container.controls.append(status.container)
-
-        status_container.update()
-        total_progress.update()
-        total_status.update()
-
-        tasks = [
-            self.convert_file(Path(file.path), status)
-            for file, status in zip(files, file_statuses)
-        ]
-
-        for i, task in enumerate(asyncio.as_completed(tasks)):
-            await task
-            total_progress.value = (i + 1) / len(tasks)
-            total_progress.update()
-
-        total_status.value = "すべての変換が完了しました 🎉"
-        total_status.update()
\ No newline at end of file
+            del self._progress_targets[token]
+
+    async def _lookup_cache(self, file_path: Path, data: bytes = None):
+        """キャッシュを引き、(キー, Markdown) を返す（ミスの場合Markdownは None）"""
+        stat = os.stat(file_path)
+        key = self.cache.lookup_by_stat(file_path, stat)
+        if key is not None:
+            content = self.cache.get(key)
+            if content is not None:
+                return key, content
+        # mtimeが変わっていても内容が同じであればヒットとして扱う
+        if data is not None:
+            key = await asyncio.to_thread(self.cache.key_for_bytes, data)
+        else:
+            key = await asyncio.to_thread(self.cache.key_for_file, file_path)
+        content = self.cache.get(key)
+        if content is not None:
+            self.cache.remember_source(file_path, key, stat)
+        return key, content
+
+    async def convert_file(self, file_path: Path, index: int = 0, listener: ProgressListener = None,
+                           slots: asyncio.Semaphore = None, data: bytes = None) -> ConversionResult:
+        """1ファイルを変換して結果を返す（例外は送出せず結果のerrorに格納する）
+
+        dataに読み込み済みのファイルの内容を渡すと、PDF・XLSXはファイルを読み直さずに変換します。
+        """
+        listener = listener or NULL_PROGRESS
+        file_path = Path(file_path)
+        output_file = output_path_for(file_path)
+        result = ConversionResult(source=str(file_path), output=str(output_file))
+        metrics = self.metrics.job("convert", file_path.name)
+        waiting = time.perf_counter()
+        # 投入数の上限に達している間は待機中のまま待ち、枠が空いてから処理を始める
+        async with slots or contextlib.nullcontext():
+            started = time.perf_counter()
+            metrics.add_time("queue_wait", started - waiting)
+            listener.item_started(index, file_path.name)
+            try:
+                result.input_bytes = len(data) if data is not None else os.path.getsize(file_path)
+                key = text_content = None
+                if self.cache is not None:
+                    with metrics.stage("cache_lookup"):
+                        key, text_content = await self._lookup_cache(file_path, data)
+                cached = text_content is not None
+                if cached:
+                    with metrics.stage("write"):
+                        await self.repository.write_content(output_file, text_content)
+                    result.output_bytes = len(text_content.encode('utf-8'))
+                else:
+                    stat = os.stat(file_path) if self.cache is not None else None
+                    # 変換結果は区切りごとに書き出し、全体をメモリに持たない
+                    result.output_bytes, result.pages, stages = await self._convert(
+                        file_path, output_file, index, listener, data
+                    )
+                    for name, seconds in stages.items():
+                        metrics.add_time(name, seconds)
+                    if self.cache is not None:
+                        with metrics.stage("cache_store"):
+                            self.cache.put_file(key, output_file)
+                            self.cache.remember_source(file_path, key, stat)
+                result.state = "cached" if cached else "done"
+                metrics.count("pages", result.pages)
+                metrics.count("bytes_in", result.input_bytes)
+                metrics.count("bytes_out", result.output_bytes)
+                metrics.count("cache_hits", int(cached))
+            except Exception as ex:
+                result.state = "error"
+                result.error = str(ex)
+            result.duration_seconds = time.perf_counter() - started
+        result.metrics = metrics.to_dict()
+        self.metrics.record(metrics)
+        listener.item_finished(index, result)
+        return result
+
+    async def process_files(self, files, listener: ProgressListener = None) -> ConversionSummary:
+        """複数ファイルを変換する
+
+        Args:
+            files: 変換するファイル（パス、またはpath属性を持つオブジェクト）の一覧
+            listener: 進捗の通知先
+        """
+        listener = listener or NULL_PROGRESS
+        paths = [Path(getattr(file, "path", file)) for file in files]
+        started = time.perf_counter()
+        listener.batch_started([path.name for path in paths])
+
+        # 投入数を制限し、大量のファイルでもワーカーへの待ち行列が膨らまないようにする
+        slots = asyncio.Semaphore(self.max_pending)
+        results = await asyncio.gather(*[
+            self.convert_file(path, i, listener, slots)
+            for i, path in enumerate(paths)
+        ])
+
+        summary = ConversionSummary(
+            results=list(results),
+            duration_seconds=time.perf_counter() - started,
+        )
+        if self.cache is not None:
+            summary.cache_hits = sum(r.state == "cached" for r in results)
+            summary.cache_misses = len(results) - summary.cache_hits
+        listener.batch_finished(summary)
+
+        if self.max_workers == 0:
+            # プロセスプールではエンジンを各ワーカーが持つため、このプロセスの統計は同一プロセスで変換した場合だけ出す
+            stats = self.converter.stats()
+            logger.info(
+                "エンジン再利用: 生成 %d 回 / 変換 %d 件 / 節約時間 %.2f秒",
+                stats.engines_created, stats.conversions, stats.saved_seconds
+            )
+        return summary
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from application.pdf_pipeline import PdfPipeline
+from application.progress import NULL_PROGRESS, ProgressListener
+from infrastructure.watch_index import WatchIndex, file_digest
+
+logger = logging.getLogger(__name__)
+
+# 監視対象から除外するファイル名の接頭辞（このアプリ自身の出力と一時ファイル）
+IGNORED_PREFIXES = ("compressed_", "converted_", ".")
+
+
+@dataclass
+class WatchStats:
+    """監視の累計と現在の待ち行列の長さ"""
+    polls: int = 0
+    queued: int = 0
+    processed: int = 0
+    failed: int = 0
+    unchanged: int = 0  # mtimeだけが変わり、内容は同じだったファイル
+    bytes_processed: int = 0
+    busy_seconds: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def files_per_minute(self) -> float:
+        """処理にかかった時間あたりのファイル数"""
+        if not self.busy_seconds:
+            return 0.0
+        return self.processed * 60 / self.busy_seconds
+
+    @property
+    def mb_per_second(self) -> float:
+        if not self.busy_seconds:
+            return 0.0
+        return self.bytes_processed / (1024 * 1024) / self.busy_seconds
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        del data["started_at"]
+        data["files_per_minute"] = self.files_per_minute
+        data["mb_per_second"] = self.mb_per_second
+        return data
+
+
+class FolderWatcher:
+    """フォルダを定期的に走査し、新規・変更されたファイルを変換・圧縮するクラス
+
+    ファイルはmtimeとサイズが debounce_seconds の間変わらなくなってから処理するため、
+    コピー中のファイルや短時間に続けて保存されたファイルを何度も処理しません。
+    処理済みのファイルはWatchIndexに記録し、mtimeだけが変わって内容が同じ場合も処理を省きます。
+    """
+
+    def __init__(self, directories, conversion_service=None, compression_service=None,
+                 index: WatchIndex = None, convert_extensions=None, debounce_seconds: float = 3.0,
+                 compression_ratio: float = 75.0, target_dpi: float = None,
+                 listener: ProgressListener = None, clock=time.monotonic):
+        """
+        Args:
+            directories: 監視するディレクトリの一覧
+            conversion_service: Markdownに変換する場合のConversionService
+            compression_service: PDFを圧縮する場合のPDFCompressionService
+            index: 処理済みファイルのインデックス
+            convert_extensions: 変換の対象とする拡張子
+            debounce_seconds: ファイルの変更が止まってから処理するまでの秒数
+            compression_ratio: PDFの圧縮率（0-100）
+            target_dpi: 画像をこの実効解像度まで縮小する（Noneの場合は縮小しない）
+            listener: ファイルごとの進捗の通知先
+        """
+        self.directories = [Path(d) for d in directories]
+        self.conversion_service = conversion_service
+        self.compression_service = compression_service
+        self.index = index or WatchIndex()
+        self.convert_extensions = {e.lower() for e in (convert_extensions or ())}
+        self.debounce_seconds = debounce_seconds
+        self.compression_ratio = compression_ratio
+        self.target_dpi = target_dpi
+        self.listener = listener or NULL_PROGRESS
+        self.clock = clock
+        self.stats = WatchStats(started_at=clock())
+        # 変更を検出して安定を待っているファイル: パス -> ((mtime, サイズ), 最後に変わった時刻)
+        self._pending = {}
+
+    def _wants(self, path: Path) -> bool:
+        if path.name.startswith(IGNORED_PREFIXES):
+            return False
+        suffix = path.suffix.lower()
+        if self.conversion_service is not None and suffix in self.convert_extensions:
+            return True
+        return self.compression_service is not None and suffix == ".pdf"
+
+    def _scan(self) -> dict:
+        """監視対象のファイルとそのstatを集める"""
+        found = {}
+        for directory in self.directories:
+            for root, dirs, files in os.walk(directory):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                for name in files:
+                    path = Path(root) / name
+                    if not self._wants(path):
+                        continue
+                    try:
+                        found[path] = path.stat()
+                    except FileNotFoundError:
+                        continue
+        return found
+
+    async def poll(self) -> list:
+        """1回走査し、安定した新規・変更ファイルを処理する
+
+        Returns:
+            今回処理したファイルのパスの一覧
+        """
+        seen = await asyncio.to_thread(self._scan)
+        now = self.clock()
+        self.stats.polls += 1
+
+        for path, stat in seen.items():
+            signature = (stat.st_mtime_ns, stat.st_size)
+            pending = self._pending.get(path)
+            if pending is not None:
+                if pending[0] != signature:
+                    self._pending[path] = (signature, now)
+            elif not self.index.is_current(path, stat):
+                self._pending[path] = (signature, now)
+        # 処理前に削除されたファイルは待ち行列から外す
+        for path in [p for p in self._pending if p not in seen]:
+            del self._pending[path]
+
+        ready = sorted(
+            path for path, (_, changed_at) in self._pending.items()
+            if now - changed_at >= self.debounce_seconds
+        )
+        for path in ready:
+            del self._pending[path]
+        self.stats.queued = len(self._pending) + len(ready)
+        if not ready:
+            return []
+
+        processed = await self._process(ready, seen)
+        self.stats.queued = len(self._pending)
+        return processed
+
+    async def _process(self, ready, seen) -> list:
+        started = time.perf_counter()
+        targets = []
+        for path in ready:
+            stat = seen[path]
+            try:
+                digest = await asyncio.to_thread(file_digest, path)
+            except OSError as e:
+                logger.warning("ファイルを読めないためスキップ: %s (%s)", path, e)
+                continue
+            if self.index.digest_matches(path, digest):
+                # 保存し直されただけで内容は変わっていない
+                self.index.touch(path, stat)
+                self.stats.unchanged += 1
+                continue
+            targets.append((path, stat, digest))
+        if not targets:
+            return []
+
+        errors = {}
+        paths = [path for path, _, _ in targets]
+        to_convert = [p for p in paths if self.conversion_service is not None
+                      and p.suffix.lower() in self.convert_extensions]
+        to_compress = [p for p in paths if self.compression_service is not None and p.suffix.lower() == ".pdf"]
+        # 圧縮と変換の両方を行うPDFは1回だけ読み込み、2つの処理を同時に実行する
+        both = [p for p in to_compress if p in to_convert]
+        to_convert = [p for p in to_convert if p not in both]
+        to_compress = [p for p in to_compress if p not in both]
+        if both:
+            pipeline = PdfPipeline(self.compression_service, self.conversion_service)
+            summary = await pipeline.process_files(
+                both, self.listener, compression_ratio=self.compression_ratio, target_dpi=self.target_dpi
+            )
+            for result in summary.results:
+                if result.error is not None:
+                    errors[Path(result.source)] = result.error
+        if to_convert:
+            summary = await self.conversion_service.process_files(to_convert, self.listener)
+            for result in summary.results:
+                if result.state == "error":
+                    errors[Path(result.source)] = result.error
+        if to_compress:
+            summary = await self.compression_service.compress_files(
+                to_compress, self.listener, compression_ratio=self.compression_ratio, target_dpi=self.target_dpi
+            )
+            for result in summary.results:
+                if result.error is not None:
+                    errors[Path(result.input_path)] = result.error
+
+        for path, stat, digest in targets:
+            # 失敗したファイルも記録し、変更されるまで繰り返し処理しないようにする
+            self.index.record(path, stat, digest, "error" if path in errors else "done")
+            self.stats.processed += 1
+            self.stats.bytes_processed += stat.st_size
+        self.stats.failed += len(errors)
+        self.stats.busy_seconds += time.perf_counter() - started
+        return paths
+
+    async def run(self, interval: float = 2.0, stop: asyncio.Event = None, on_poll=None):
+        """stopがセットされるまで interval 秒ごとに走査する
+
+        Args:
+            interval: 走査の間隔（秒）
+            stop: 監視を止めるためのイベント（Noneの場合は取り消されるまで続ける）
+            on_poll: 走査のたびにWatchStatsを受け取る関数
+        """
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            await self.poll()
+            if on_poll is not None:
+                on_poll(self.stats)
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
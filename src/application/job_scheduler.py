@@ -0,0 +1,272 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from application.progress import NULL_PROGRESS, ProgressListener
+
+logger = logging.getLogger(__name__)
+
+# ジョブの状態
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, ERROR, CANCELLED)
+
+
+@dataclass
+class Job:
+    """スケジューラに投入された1件の処理（変換のバッチやPDF1件の圧縮など）"""
+    id: int
+    kind: str
+    name: str
+    state: str = QUEUED
+    progress: float = 0.0
+    result: object = None
+    error: str = None
+    submitted_at: float = field(default_factory=time.perf_counter)
+    started_at: float = None
+    finished_at: float = None
+    _task: object = field(default=None, repr=False)
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    @property
+    def queue_seconds(self) -> float:
+        """実行開始までの待ち時間（秒）"""
+        return ((self.started_at or time.perf_counter()) - self.submitted_at)
+
+
+class JobListener:
+    """ジョブの状態の変化を受け取るためのインターフェース
+
+    通知はスケジューラのイベントループのスレッドから行われます。
+    """
+
+    def job_changed(self, job: Job) -> None:
+        pass
+
+
+NULL_JOB_LISTENER = JobListener()
+
+
+class _JobProgress(ProgressListener):
+    """サービスからの進捗を転送しつつ、ジョブ全体の進捗率を記録するリスナー"""
+
+    def __init__(self, job: Job, listener: ProgressListener):
+        self.job = job
+        self.listener = listener
+        self.fractions = {}
+        self.total = 1
+
+    def _update(self):
+        self.job.progress = min(1.0, sum(self.fractions.values()) / self.total)
+
+    def batch_started(self, names):
+        self.total = max(1, len(names))
+        self.listener.batch_started(names)
+
+    def item_started(self, index, name):
+        self.listener.item_started(index, name)
+
+    def item_progress(self, index, fraction):
+        self.fractions[index] = fraction
+        self._update()
+        self.listener.item_progress(index, fraction)
+
+    def item_finished(self, index, result):
+        self.fractions[index] = 1.0
+        self._update()
+        self.listener.item_finished(index, result)
+
+    def batch_finished(self, summary):
+        self.listener.batch_finished(summary)
+
+
+class JobScheduler:
+    """UIのスレッドを塞がずに、変換・圧縮をバックグラウンドで実行するスケジューラ
+
+    専用スレッドでイベントループを動かし、投入されたジョブを順番に実行します。
+    同時に実行するジョブ数は全体（max_concurrent）と種類ごと（limits）で制限でき、
+    上限を超えたジョブは投入順に待ち行列で待ちます。
+    待機中・実行中のジョブはcancelで取り消せます。
+    """
+
+    def __init__(self, max_concurrent: int = 2, limits: dict = None, listener: JobListener = None):
+        """
+        Args:
+            max_concurrent: 全体で同時に実行するジョブ数の上限
+            limits: ジョブの種類ごとの同時実行数の上限（例: {"compress": 1}）
+            listener: ジョブの状態の変化の通知先
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.limits = dict(limits or {})
+        self.listener = listener or NULL_JOB_LISTENER
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._slots = None
+        self._kind_slots = {}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="job-scheduler", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def _notify(self, job: Job):
+        try:
+            self.listener.job_changed(job)
+        except Exception:
+            logger.exception("ジョブの状態の通知に失敗: %s", job.name)
+
+    def submit(self, kind: str, name: str, run, listener: ProgressListener = None) -> Job:
+        """ジョブを投入する（すぐに戻り、処理はバックグラウンドで行われる）
+
+        Args:
+            kind: ジョブの種類（種類ごとの同時実行数の制限に使う）
+            name: 表示用の名前
+            run: 進捗リスナーを受け取りコルーチンを返す関数
+            listener: サービスからの進捗の通知先
+
+        Returns:
+            投入したジョブ
+        """
+        loop = self._ensure_loop()
+        job = Job(id=next(self._ids), kind=kind, name=name)
+        progress = _JobProgress(job, listener or NULL_PROGRESS)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._notify(job)
+        loop.call_soon_threadsafe(self._start, job, run, progress)
+        return job
+
+    def _start(self, job: Job, run, progress: ProgressListener):
+        job._task = asyncio.get_running_loop().create_task(self._run(job, run, progress))
+        job._task.add_done_callback(lambda task: self._on_done(job))
+
+    def _on_done(self, job: Job):
+        # 実行が始まる前に取り消されたジョブは_runを通らないため、ここで状態を更新する
+        if not job.finished:
+            job.state = CANCELLED
+            job.finished_at = time.perf_counter()
+            self._notify(job)
+        job._done.set()
+
+    async def _run(self, job: Job, run, progress: ProgressListener):
+        # セマフォはイベントループのスレッドで生成する
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        kind_slots = self._kind_slots.get(job.kind)
+        if kind_slots is None and job.kind in self.limits:
+            kind_slots = self._kind_slots[job.kind] = asyncio.Semaphore(max(1, self.limits[job.kind]))
+
+        try:
+            if kind_slots is not None:
+                await kind_slots.acquire()
+            try:
+                async with self._slots:
+                    job.state = RUNNING
+                    job.started_at = time.perf_counter()
+                    self._notify(job)
+                    job.result = await run(progress)
+                    job.progress = 1.0
+                    job.state = DONE
+            finally:
+                if kind_slots is not None:
+                    kind_slots.release()
+        except asyncio.CancelledError:
+            job.state = CANCELLED
+            raise
+        except Exception as e:
+            logger.error("ジョブが失敗: %s", job.name, exc_info=True)
+            job.state = ERROR
+            job.error = str(e)
+        finally:
+            job.finished_at = time.perf_counter()
+            self._notify(job)
+        return job.result
+
+    def cancel(self, job: Job) -> bool:
+        """ジョブを取り消す（完了済みの場合はFalseを返す）"""
+        if job.finished or self._loop is None:
+            return False
+        # タスクの生成もイベントループのスレッドで行うため、取り消しは必ず生成の後に処理される
+        self._loop.call_soon_threadsafe(self._cancel_task, job)
+        return True
+
+    @staticmethod
+    def _cancel_task(job: Job):
+        if job._task is not None:
+            job._task.cancel()
+
+    def cancel_all(self) -> int:
+        """待機中・実行中のジョブをすべて取り消し、取り消した件数を返す"""
+        return sum(self.cancel(job) for job in self.jobs())
+
+    def jobs(self) -> list:
+        """投入されたジョブの一覧（投入順）"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def counts(self) -> dict:
+        """状態ごとのジョブ数"""
+        counts = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+        for job in self.jobs():
+            counts[job.state] += 1
+        return counts
+
+    def wait(self, job: Job, timeout: float = None):
+        """ジョブの完了を待ち、結果を返す（取り消された場合や失敗した場合はNoneを返す）"""
+        job._done.wait(timeout)
+        return job.result if job.state == DONE else None
+
+    def forget_finished(self):
+        """完了したジョブを一覧から取り除く"""
+        with self._lock:
+            self._jobs = {id_: job for id_, job in self._jobs.items() if not job.finished}
+
+    def shutdown(self, cancel: bool = True, timeout: float = None):
+        """イベントループを停止する
+
+        Args:
+            cancel: 待機中・実行中のジョブを取り消すか（Falseの場合は完了を待つ）
+            timeout: ジョブの完了を待つ最大秒数
+        """
+        if self._loop is None:
+            return
+        jobs = self.jobs()
+        if cancel:
+            for job in jobs:
+                self.cancel(job)
+        # 取り消したジョブも後片付けが終わるまで待ってからループを止める
+        for job in jobs:
+            self.wait(job, timeout)
+        loop, thread = self._loop, self._thread
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
+        self._loop = self._thread = None
+        self._slots = None
+        self._kind_slots = {}
@@ -1,148 +1,867 @@
-import flet as ft
+import io
 import os
 import asyncio
-import pikepdf
-from PIL import Image
-import io
+import multiprocessing
+import time
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+from application.progress import NULL_PROGRESS, ProgressListener
+from infrastructure.memory_monitor import MemoryMonitor, current_rss
+from infrastructure.metrics import NULL_METRICS, NULL_RECORDER, MetricsRecorder
+
+# pikepdf・Pillowは読み込みに時間がかかるため、起動を速くするよう圧縮を始める時点で読み込む
+if TYPE_CHECKING:
+    from domain.image_recompressor import EncodedImage, ImageSource
+    from domain.pdf_analysis import PdfAnalysis
 
-# ログの設定 - デバッグレベルで詳細なログを出力
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 実効解像度が目標のこの倍数を超える画像だけを縮小する（わずかな差での劣化を避ける）
+DOWNSAMPLE_THRESHOLD = 1.5
+# 画像を収集する間、このページ数ごとにイベントループへ制御を返す
+PAGES_PER_YIELD = 50
+# 複数ファイルを並列に圧縮する際のメモリ使用量の見積もり
+# （画像をデコードするため、1ファイルあたり固定分に加えて入力サイズの数倍を使う）
+MEMORY_PER_FILE = 64 * 1024 * 1024
+MEMORY_PER_INPUT_BYTE = 4
+# 目標サイズから品質を決める際に試しにエンコードする画像の数と、品質の探索範囲
+SAMPLE_IMAGES = 8
+MIN_QUALITY = 5
+MAX_QUALITY = 95
+# 保存プロファイル（保存の速さと出力サイズのどちらを優先するか）
+#   fast: 書き換えていないストリームはデコードせずそのまま書き出し、オブジェクトストリームも作り直さない
+#   balanced: すべてのFlateストリームを圧縮し直し、オブジェクトストリームを生成する
+#   maximum: balancedに加え、未使用のリソース・重複したフォントプログラム・メタデータを取り除く
+SAVE_PROFILES = ("fast", "balanced", "maximum")
+DEFAULT_SAVE_PROFILE = "balanced"
+# 圧縮をスキップするかの判断に使う、削減見込みの下限（ファイルサイズに対する割合）の既定値
+DEFAULT_MIN_SAVINGS_RATIO = 0.01
+
+
+def estimate_memory(input_size: int) -> int:
+    """1ファイルの圧縮に必要なメモリ量（バイト）を見積もる"""
+    return MEMORY_PER_FILE + input_size * MEMORY_PER_INPUT_BYTE
+
+
+def quality_for(compression_ratio: float) -> int:
+    """圧縮率（0-100）から画像の再エンコードに使うJPEGの品質を求める"""
+    return max(MIN_QUALITY, int(100 - compression_ratio))
+
+
+def _image_filter(xobj):
+    """画像ストリームのフィルタ名を返す（フィルタなしはNone、複数段の場合は"multiple"）"""
+    import pikepdf
+    filters = xobj.get('/Filter')
+    if isinstance(filters, pikepdf.Array):
+        if len(filters) == 0:
+            return None
+        return str(filters[0]) if len(filters) == 1 else "multiple"
+    return None if filters is None else str(filters)
+
+
+@dataclass
+class CompressionResult:
+    """1ファイル分の圧縮結果"""
+    input_path: str
+    output_path: str = None
+    original_size: int = 0
+    compressed_size: int = 0
+    ratio: float = 0.0
+    pages: int = 0
+    images_total: int = 0
+    images_unique: int = 0
+    images_replaced: int = 0
+    image_bytes_before: int = 0
+    image_bytes_after: int = 0
+    image_classes: dict = field(default_factory=dict)
+    duration_seconds: float = 0.0
+    peak_memory_bytes: int = None  # 計測できない環境ではNone
+    quality: int = None  # 画像の再エンコードに使ったJPEGの品質
+    target_size: int = None  # 目標サイズ（バイト）。指定しなかった場合はNone
+    estimated_size: int = None  # 標本から推定した、選んだ品質での出力サイズ
+    save_profile: str = None  # 保存に使ったプロファイル
+    save_seconds: float = 0.0  # 保存（maximumの場合は不要なデータの除去を含む）にかかった時間
+    estimated_savings: int = None  # 分析で見積もった削減量（分析しなかった場合はNone）
+    skipped: bool = False  # 削減の見込みがなく、出力を作らなかった場合はTrue
+    metrics: dict = None  # ステージごとの計測結果（計測しない場合はNone）
+    error: str = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class CompressionSummary:
+    """複数ファイルの圧縮結果と全体の処理速度"""
+    results: list = field(default_factory=list)
+    duration_seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> list:
+        return [r for r in self.results if r.error is None]
+
+    @property
+    def failed(self) -> int:
+        return sum(r.error is not None for r in self.results)
+
+    @property
+    def original_bytes(self) -> int:
+        return sum(r.original_size for r in self.succeeded)
+
+    @property
+    def compressed_bytes(self) -> int:
+        return sum(r.compressed_size for r in self.succeeded)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.compressed_bytes
+
+    @property
+    def pages(self) -> int:
+        return sum(r.pages for r in self.succeeded)
+
+    @property
+    def mb_per_second(self) -> float:
+        """入力サイズを基準にした処理速度（MB/秒）"""
+        if not self.duration_seconds:
+            return 0.0
+        return self.original_bytes / (1024 * 1024) / self.duration_seconds
+
+    @property
+    def pages_per_second(self) -> float:
+        if not self.duration_seconds:
+            return 0.0
+        return self.pages / self.duration_seconds
+
+    @property
+    def peak_memory_bytes(self):
+        """ファイルごとの最大メモリ使用量のうち最大のもの"""
+        peaks = [r.peak_memory_bytes for r in self.results if r.peak_memory_bytes is not None]
+        return max(peaks) if peaks else None
+
+    def to_dict(self) -> dict:
+        return {
+            "duration_seconds": self.duration_seconds,
+            "files": len(self.results),
+            "failed": self.failed,
+            "original_bytes": self.original_bytes,
+            "compressed_bytes": self.compressed_bytes,
+            "bytes_saved": self.bytes_saved,
+            "pages": self.pages,
+            "mb_per_second": self.mb_per_second,
+            "pages_per_second": self.pages_per_second,
+            "peak_memory_bytes": self.peak_memory_bytes,
+            "results": [r.to_dict() for r in self.results],
+        }
+
+
+def _compress_file(input_path: str, compression_ratio: float, target_dpi: float, image_workers: int,
+                   low_memory: bool = False, memory_budget_mb: float = None,
+                   collect_metrics: bool = False, target_size_mb: float = None,
+                   min_savings_ratio: float = None, data: bytes = None,
+                   save_profile: str = DEFAULT_SAVE_PROFILE) -> CompressionResult:
+    # ワーカープロセス内で1ファイルを圧縮する（戻り値はpickle可能な結果のみ）
+    # 計測結果はresult.metricsに入れて返し、親プロセスのMetricsRecorderに記録する
+    service = PDFCompressionService(
+        image_workers=image_workers, low_memory=low_memory, memory_budget_mb=memory_budget_mb,
+        metrics=MetricsRecorder() if collect_metrics else None, min_savings_ratio=min_savings_ratio,
+        save_profile=save_profile,
+    )
+    try:
+        return asyncio.run(service.compress_pdf(
+            input_path, compression_ratio=compression_ratio, target_dpi=target_dpi, target_size_mb=target_size_mb,
+            data=data,
+        ))
+    finally:
+        service.shutdown()
+
+
 class PDFCompressionService:
     """PDFファイルの圧縮を行うサービスクラス
     
     主な機能：
     - PDFファイル内の画像を検出し圧縮
-    - 進捗状況のリアルタイム表示
-    - 圧縮率の計算と結果表示
+    - 進捗状況のリアルタイム通知
+    - 圧縮率の計算と結果の返却
     """
     
-    async def compress_pdf(self, file_info, status: ft.Text, progress: ft.ProgressBar, compression_ratio: float = 75.0):
+    def __init__(self, image_workers: int = None, image_executor: str = "thread",
+                 file_workers: int = None, memory_limit_mb: float = None,
+                 low_memory: bool = False, memory_budget_mb: float = None,
+                 metrics: MetricsRecorder = None, min_savings_ratio: float = None,
+                 save_profile: str = DEFAULT_SAVE_PROFILE):
+        """
+        Args:
+            image_workers: 画像の再エンコードに使うワーカー数（Noneの場合はCPUコア数、1の場合は逐次処理）
+            image_executor: "thread"（スレッドプール）または "process"（プロセスプール）
+            file_workers: 複数ファイルを圧縮する際に同時に処理するファイル数
+                （Noneの場合はCPUコア数、0の場合はプロセスを使わず1件ずつ処理する）
+            memory_limit_mb: 同時に処理するファイルの見積もりメモリ量の上限（Noneの場合は制限しない）
+            low_memory: 巨大なPDF向けに、入力をメモリマップで開き、画像を少しずつ処理する
+            memory_budget_mb: 1プロセスの常駐メモリ量の目安（MB）。超えている間は新しい画像の処理を始めない
+            metrics: ステージごとの計測結果の記録先（Noneの場合は計測しない）
+            min_savings_ratio: 画像をデコードせずに削減量を見積もり、ファイルサイズのこの割合に
+                満たない場合は再圧縮・保存を行わない（Noneの場合は常に圧縮する）
+            save_profile: 保存プロファイル（SAVE_PROFILESのいずれか）
+        """
+        if save_profile not in SAVE_PROFILES:
+            raise ValueError(f"不明な保存プロファイル: {save_profile}")
+        self.image_workers = (os.cpu_count() or 1) if image_workers is None else max(1, image_workers)
+        self.image_executor = image_executor
+        self.file_workers = (os.cpu_count() or 1) if file_workers is None else max(0, file_workers)
+        self.memory_limit_mb = memory_limit_mb
+        self.low_memory = low_memory
+        self.memory_budget_mb = memory_budget_mb
+        self.metrics = metrics or NULL_RECORDER
+        self.min_savings_ratio = min_savings_ratio
+        self.save_profile = save_profile
+        self._executor = None
+        self._file_executor = None
+
+    def _get_image_executor(self):
+        if self._executor is None:
+            if self.image_executor == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.image_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                # PillowはデコードとエンコードでGILを解放するため、スレッドでも並列に動作する
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.image_workers,
+                    thread_name_prefix="pdf-image",
+                )
+        return self._executor
+
+    def _get_file_executor(self) -> ProcessPoolExecutor:
+        if self._file_executor is None:
+            # Fletのスレッドを持つ親プロセスをforkしないようspawnで起動する
+            self._file_executor = ProcessPoolExecutor(
+                max_workers=self.file_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._file_executor
+
+    def shutdown(self):
+        """画像処理用・ファイル処理用のワーカーを終了する"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        if self._file_executor is not None:
+            self._file_executor.shutdown(cancel_futures=True)
+            self._file_executor = None
+
+    @staticmethod
+    def _should_recompress(xobj) -> bool:
+        """再圧縮しても見た目が変わらない画像かどうかを判定する"""
+        import pikepdf
+        # マスク・Decode配列はピクセル値に依存するため、非可逆圧縮すると表示が崩れる
+        if xobj.get('/ImageMask') or '/Mask' in xobj or '/Decode' in xobj:
+            return False
+        if _image_filter(xobj) in ('/JPXDecode', '/JBIG2Decode', 'multiple'):
+            return False
+        color_space = xobj.get('/ColorSpace')
+        if color_space == '/DeviceCMYK' or (
+            isinstance(color_space, pikepdf.Array) and color_space[0] == '/ICCBased'
+            and int(color_space[1].get('/N', 0)) == 4
+        ):
+            return False
+        return True
+
+    @staticmethod
+    def _prepare_source(job) -> "ImageSource":
+        """ワーカーに渡す画像を用意する（pikepdfを使うためこのスレッドで実行する）"""
+        import pikepdf
+        from domain.image_recompressor import ImageSource
+        xobj = job.xobj
+        if _image_filter(xobj) == '/DCTDecode':
+            return ImageSource(original_size=job.original_size, encoded=xobj.read_raw_bytes())
+        # FlateやCCITTなどはpikepdfの画像APIでデコードする
+        return ImageSource(original_size=job.original_size, image=pikepdf.PdfImage(xobj).as_pil_image())
+
+    @staticmethod
+    def _scale_for(job, target_dpi) -> float:
+        """目標解像度まで縮小するための倍率を返す（縮小しない場合は1.0）"""
+        if not target_dpi:
+            return 1.0
+        dpi = job.effective_dpi()
+        if dpi is None or dpi <= target_dpi * DOWNSAMPLE_THRESHOLD:
+            return 1.0
+        return target_dpi / dpi
+
+    @staticmethod
+    def _sample_jobs(jobs) -> list:
+        """画像をサイズ順に SAMPLE_IMAGES 個の層に分け、各層の中央の画像を選ぶ
+
+        Returns:
+            (標本の画像, その層の画像の合計バイト数) の一覧
+        """
+        if len(jobs) <= SAMPLE_IMAGES:
+            return [(job, job.original_size) for job in jobs]
+        ordered = sorted(jobs, key=lambda job: job.original_size)
+        step = len(ordered) / SAMPLE_IMAGES
+        samples = []
+        for i in range(SAMPLE_IMAGES):
+            stratum = ordered[int(i * step):int((i + 1) * step)]
+            samples.append((stratum[len(stratum) // 2], sum(job.original_size for job in stratum)))
+        return samples
+
+    async def _choose_quality(self, jobs, input_size: int, target_bytes: int, target_dpi=None):
+        """標本の画像を試しにエンコードし、目標サイズに収まる最も高い品質を選ぶ
+
+        出力サイズは「画像以外の部分 + 各層の画像の合計 × その層の標本の圧縮率」とし、
+        品質は二分探索で決めます。どの品質でも収まらない場合は最低品質を返します。
+
+        Returns:
+            (品質, その品質での推定サイズ)
+        """
+        from domain.image_recompressor import recompress_image
+
+        image_bytes = sum(job.original_size for job in jobs)
+        other_bytes = max(0, input_size - image_bytes)
+        samples = []
+        for job, represented in self._sample_jobs(jobs):
+            try:
+                samples.append((self._prepare_source(job), self._scale_for(job, target_dpi), represented))
+            except Exception as e:
+                # 読めない画像は圧縮時にも置き換えられないため、元のサイズのまま残ると見なす
+                logger.warning("画像を標本から除外: %s", e)
+                other_bytes += represented
+        if not samples:
+            return MAX_QUALITY, input_size
+
+        loop = asyncio.get_running_loop()
+        estimates = {}
+
+        async def estimate(quality):
+            if quality not in estimates:
+                if self.image_workers == 1:
+                    outcomes = [recompress_image(source, quality, scale) for source, scale, _ in samples]
+                else:
+                    executor = self._get_image_executor()
+                    outcomes = await asyncio.gather(*[
+                        loop.run_in_executor(executor, recompress_image, source, quality, scale)
+                        for source, scale, _ in samples
+                    ])
+                estimated = other_bytes
+                for outcome, (source, _, represented) in zip(outcomes, samples):
+                    # 元より小さくならない画像は置き換えないため、元のサイズのまま残る
+                    encoded = len(outcome.encoded.data) if outcome.encoded is not None else source.original_size
+                    estimated += represented * encoded / max(1, source.original_size)
+                estimates[quality] = int(estimated)
+            return estimates[quality]
+
+        low, high = MIN_QUALITY, MAX_QUALITY
+        if await estimate(high) <= target_bytes:
+            return high, estimates[high]
+        if await estimate(low) > target_bytes:
+            return low, estimates[low]
+        while high - low > 1:
+            middle = (low + high) // 2
+            if await estimate(middle) <= target_bytes:
+                low = middle
+            else:
+                high = middle
+        return low, estimates[low]
+
+    async def _recompress_images(self, jobs, quality, target_dpi=None, metrics=NULL_METRICS):
+        """画像を再エンコードし、終わったものから (ジョブ, RecompressionResult) を返す
+
+        ワーカーへの投入数はワーカー数の2倍までに抑えます。
+        失敗した画像はRecompressionResultをNoneとして返します。
+        """
+        from domain.image_recompressor import recompress_image
+        if self.image_workers == 1:
+            for job in jobs:
+                try:
+                    with metrics.stage("decode"):
+                        source = self._prepare_source(job)
+                    outcome = recompress_image(source, quality, self._scale_for(job, target_dpi))
+                except Exception as e:
+                    logger.warning("画像処理をスキップ: %s", e)
+                    outcome = None
+                yield job, outcome
+            return
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_image_executor()
+        # 省メモリモードではデコード済みの画像を同時に保持する数をワーカー数までに抑える
+        window = self.image_workers if self.low_memory else self.image_workers * 2
+        remaining = iter(jobs)
+        pending = {}
+        while True:
+            while len(pending) < window:
+                if pending and self._over_budget():
+                    # 処理中の画像が終わってメモリが空くのを待つ
+                    break
+                job = next(remaining, None)
+                if job is None:
+                    break
+                try:
+                    # 画像データはワーカーに渡す直前に読み込み、同時に保持する量を抑える
+                    with metrics.stage("decode"):
+                        source = self._prepare_source(job)
+                except Exception as e:
+                    logger.warning("画像処理をスキップ: %s", e)
+                    yield job, None
+                    continue
+                future = loop.run_in_executor(
+                    executor, recompress_image, source, quality, self._scale_for(job, target_dpi)
+                )
+                pending[future] = job
+            if not pending:
+                return
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in finished:
+                job = pending.pop(future)
+                try:
+                    yield job, future.result()
+                except Exception as e:
+                    logger.warning("画像処理をスキップ: %s", e)
+                    yield job, None
+
+    def _over_budget(self) -> bool:
+        """常駐メモリ量がmemory_budget_mbを超えているか"""
+        if self.memory_budget_mb is None:
+            return False
+        rss = current_rss()
+        return rss is not None and rss > self.memory_budget_mb * 1024 * 1024
+
+    def _write_back(self, job, encoded: "EncodedImage"):
+        """再エンコードした画像をXObjectに書き戻す"""
+        import pikepdf
+        xobj = job.xobj
+        if encoded.color_space == '/Indexed':
+            color_space = pikepdf.Array([
+                pikepdf.Name.Indexed,
+                pikepdf.Name.DeviceRGB,
+                len(encoded.palette) // 3 - 1,
+                pikepdf.String(encoded.palette),
+            ])
+        else:
+            components = 1 if encoded.color_space == '/DeviceGray' else 3
+            color_space = xobj.get('/ColorSpace')
+            # 成分数が同じICCプロファイルはそのまま残す
+            if not (
+                isinstance(color_space, pikepdf.Array) and color_space[0] == '/ICCBased'
+                and int(color_space[1].get('/N', 0)) == components
+            ):
+                color_space = pikepdf.Name(encoded.color_space)
+
+        decode_parms = pikepdf.Dictionary(encoded.decode_parms) if encoded.decode_parms else None
+        xobj.write(encoded.data, filter=pikepdf.Name(encoded.filter), decode_parms=decode_parms)
+        xobj.Width = encoded.width
+        xobj.Height = encoded.height
+        xobj.BitsPerComponent = encoded.bits_per_component
+        xobj.ColorSpace = color_space
+        logger.debug(
+            "画像を圧縮: %s %dB -> %dB (%s, 参照ページ: %s)",
+            job.name, job.original_size, len(encoded.data), encoded.filter, job.pages
+        )
+
+    @staticmethod
+    def _record_outcome(result, job, outcome):
+        """画像の分類ごとの件数と削減量を結果に記録する"""
+        stats = result.image_classes.setdefault(
+            outcome.image_class, {"count": 0, "replaced": 0, "bytes_before": 0, "bytes_after": 0}
+        )
+        stats["count"] += 1
+        if outcome.encoded is None:
+            return
+        stats["replaced"] += 1
+        stats["bytes_before"] += job.original_size
+        stats["bytes_after"] += len(outcome.encoded.data)
+        result.images_replaced += 1
+        result.image_bytes_before += job.original_size
+        result.image_bytes_after += len(outcome.encoded.data)
+
+    async def compress_pdf(self, file_info, listener: ProgressListener = None, compression_ratio: float = 75.0,
+                           index: int = 0, target_dpi: float = None,
+                           target_size_mb: float = None, data: bytes = None) -> CompressionResult:
         """PDFファイルを圧縮する非同期メソッド
-        
+
         Args:
-            file_info: 入力PDFファイルの情報
-            status: 状態表示用のTextコンポーネント
-            progress: 進捗表示用のProgressBarコンポーネント
+            file_info: 入力PDFファイルのパス、またはpath属性を持つファイル情報
+            listener: 進捗の通知先
             compression_ratio: 圧縮率（0-100）、デフォルト75%
+            index: 進捗通知に使う一覧内の位置
+            target_dpi: 画像をこの実効解像度まで縮小する（Noneの場合は縮小しない）
+            target_size_mb: 出力の目標サイズ（MB）。指定した場合はcompression_ratioの代わりに、
+                目標に収まる最も高い品質を標本の画像から推定して使う
+            data: 読み込み済みの入力ファイルの内容（指定した場合はファイルを読み直さない）
+
+        Returns:
+            圧縮結果（エラーが発生した場合はerrorに内容が入る）
         """
+        import pikepdf
+
+        listener = listener or NULL_PROGRESS
+        input_path = str(getattr(file_info, "path", file_info))
+        result = CompressionResult(input_path=input_path)
+        metrics = self.metrics.job("compress", os.path.basename(input_path))
+        started = time.perf_counter()
+        monitor = MemoryMonitor()
         try:
-            # UI初期化
-            progress.visible = True
-            status.value = "PDFを圧縮中..."
-            progress.value = 0
-            progress.update()
-            status.update()
-
-            # 入出力パスの設定
-            input_path = file_info.path
+            listener.item_started(index, os.path.basename(input_path))
+
+            # 出力パスの設定
             output_path = os.path.join(
                 os.path.dirname(input_path),
                 f"compressed_{os.path.basename(input_path)}"
             )
 
             # ログ出力
-            logger.info(f"入力ファイル: {input_path}")
-            logger.info(f"出力ファイル: {output_path}")
-            logger.info(f"圧縮率設定: {compression_ratio}%")
+            logger.info("入力ファイル: %s", input_path)
+            logger.info("出力ファイル: %s", output_path)
+            logger.info("圧縮率設定: %s%%", compression_ratio)
 
             # 画像品質の設定（圧縮率から計算）
-            quality = max(5, 100 - compression_ratio)
-            logger.info(f"画像品質設定: {quality}")
+            quality = quality_for(compression_ratio)
+            logger.info("画像品質設定: %s", quality)
 
             # PDFファイルを開いて処理
-            with pikepdf.open(input_path) as pdf:
-                total_pages = len(pdf.pages)
-                logger.info(f"総ページ数: {total_pages}")
-
-                # 各ページを処理
-                for i, page in enumerate(pdf.pages):
-                    logger.info(f"ページ {i+1}/{total_pages} を処理中")
-                    
-                    # ページ内の画像を検索して処理
-                    if hasattr(page, 'Resources') and '/XObject' in page.Resources:
-                        for name, xobj in page.Resources.XObject.items():
-                            try:
-                                # 画像オブジェクトの場合のみ処理
-                                if xobj.get('/Subtype') == '/Image':
-                                    logger.info(f"画像を検出: {name}")
-                                    # すでにJPEG圧縮されている場合はスキップ
-                                    if xobj.get('/Filter') == '/DCTDecode':
-                                        logger.info(f"既存のJPEG画像をスキップ: {name}")
-                                        continue
-                                    
-                                    try:
-                                        # 画像データの取得と処理
-                                        image_data = xobj.read_raw_bytes()
-                                        img = Image.open(io.BytesIO(image_data))
-                                        logger.info(f"画像サイズ: {img.size}, モード: {img.mode}")
-                                        
-                                        # RGB形式に変換（必要な場合）
-                                        if img.mode != 'RGB':
-                                            img = img.convert('RGB')
-                                        
-                                        # 画像の圧縮
-                                        output = io.BytesIO()
-                                        img.save(output, format='JPEG', quality=int(quality), optimize=True)
-                                        xobj.write(output.getvalue(), filter_=pikepdf.Name('/DCTDecode'))
-                                        logger.info(f"画像を圧縮: {name}")
-                                    except Exception as e:
-                                        logger.warning(f"画像処理をスキップ: {str(e)}")
-                                        continue
-                            except Exception as e:
-                                logger.warning(f"XObjectの処理をスキップ: {str(e)}")
-                                continue
-
-                    # 進捗状況の更新
-                    progress.value = (i + 1) / total_pages
-                    progress.update()
-                    await asyncio.sleep(0.01)
-
-                # 圧縮したPDFを保存
-                logger.info("PDFを保存中...")
+            # 省メモリモードでは入力をメモリマップで開き、ファイル全体を読み込まない
+            access_mode = pikepdf.AccessMode.mmap if self.low_memory else pikepdf.AccessMode.default
+            with monitor:
+                with metrics.stage("open"):
+                    if data is not None:
+                        pdf = pikepdf.open(io.BytesIO(data))
+                    else:
+                        pdf = pikepdf.open(input_path, access_mode=access_mode)
+                with pdf:
+                    await self._compress_opened(
+                        pdf, output_path, result, metrics, listener, index, quality, target_dpi,
+                        None if target_size_mb is None else int(target_size_mb * 1024 * 1024),
+                    )
+
+            # 圧縮結果の計算（スキップした場合は元のファイルをそのまま使う）
+            original_size = len(data) if data is not None else os.path.getsize(input_path)
+            compressed_size = original_size if result.skipped else os.path.getsize(output_path)
+            result.output_path = None if result.skipped else output_path
+            result.original_size = original_size
+            result.compressed_size = compressed_size
+            result.ratio = (1 - compressed_size / original_size) * 100
+            metrics.count("pages", result.pages)
+            metrics.count("images", result.images_unique)
+            metrics.count("images_replaced", result.images_replaced)
+            metrics.count("bytes_in", original_size)
+            metrics.count("bytes_out", compressed_size)
+
+            # 結果のログ出力
+            logger.info(
+                "圧縮結果 - 元サイズ: %dB, 圧縮後: %dB, 圧縮率: %.1f%%",
+                original_size, compressed_size, result.ratio
+            )
+
+        except asyncio.CancelledError:
+            result.error = "キャンセルされました"
+            raise
+        except Exception as e:
+            # エラー処理
+            logger.error("エラーが発生: %s", e, exc_info=True)
+            result.error = str(e)
+        finally:
+            result.duration_seconds = time.perf_counter() - started
+            result.peak_memory_bytes = monitor.peak_bytes
+            result.metrics = metrics.to_dict()
+            self.metrics.record(metrics)
+            listener.item_finished(index, result)
+        return result
+
+    async def _compress_opened(self, pdf, output_path, result, metrics, listener, index, quality, target_dpi,
+                               target_bytes=None):
+        """開いたPDFの画像を再圧縮して保存する（target_bytesを指定した場合は品質をそこから決める）
+
+        min_savings_ratioを指定している場合、削減の見込みがなければ保存せずにresult.skippedを立てます。
+        """
+        total_pages = len(pdf.pages)
+        result.pages = total_pages
+        logger.info("総ページ数: %d", total_pages)
+
+        with metrics.stage("collect"):
+            collector = await self._collect_images(pdf, target_dpi)
+        jobs = collector.jobs
+        result.images_total = collector.references
+        result.images_unique = collector.unique_images
+        logger.info("画像: 参照 %d 件 / 固有 %d 件", collector.references, collector.unique_images)
+
+        if self.min_savings_ratio is not None:
+            input_size = os.path.getsize(result.input_path)
+            if target_bytes is not None:
+                result.skipped = input_size <= target_bytes
+            else:
+                with metrics.stage("analyze"):
+                    analysis = self._analyze(pdf, collector, result.input_path, quality, target_dpi)
+                result.estimated_savings = analysis.estimated_savings
+                result.skipped = not analysis.worth_compressing(self.min_savings_ratio)
+            if result.skipped:
+                logger.info("削減の見込みがないため圧縮をスキップ: %s", result.input_path)
+                return
+
+        if target_bytes is not None:
+            result.target_size = target_bytes
+            if jobs:
+                with metrics.stage("estimate"):
+                    quality, result.estimated_size = await self._choose_quality(
+                        jobs, os.path.getsize(result.input_path), target_bytes, target_dpi
+                    )
+                logger.info("目標サイズ %dB に対して画像品質 %d を選択（推定 %dB）",
+                            target_bytes, quality, result.estimated_size)
+        result.quality = quality
+
+        # 画像のデコード・エンコードをワーカーで実行し、結果をこのスレッドで書き戻す
+        done = 0
+        async for job, outcome in self._recompress_images(jobs, quality, target_dpi, metrics):
+            done += 1
+            if outcome is not None:
+                metrics.add_time("decode", outcome.decode_seconds)
+                metrics.add_time("encode", outcome.encode_seconds)
+                if outcome.encoded is not None:
+                    with metrics.stage("write_back"):
+                        self._write_back(job, outcome.encoded)
+                self._record_outcome(result, job, outcome)
+            # 書き戻したデータはpikepdfが保持するため、こちらの参照はすぐに手放す
+            outcome = None
+            listener.item_progress(index, done / len(jobs))
+
+        # 圧縮したPDFを保存
+        logger.info("PDFを保存中...（プロファイル: %s）", self.save_profile)
+        saving = time.perf_counter()
+        self._save(pdf, output_path, metrics)
+        result.save_profile = self.save_profile
+        result.save_seconds = time.perf_counter() - saving
+        logger.info("PDF保存完了 (%.2f秒)", result.save_seconds)
+
+    def _save(self, pdf, output_path, metrics=NULL_METRICS):
+        """保存プロファイルに従ってPDFを書き出す"""
+        import pikepdf
+        if self.save_profile == "maximum":
+            from domain.pdf_optimizer import dedupe_font_programs, strip_metadata
+            with metrics.stage("optimize"):
+                pdf.remove_unreferenced_resources()
+                metrics.count("fonts_merged", dedupe_font_programs(pdf))
+                strip_metadata(pdf)
+        with metrics.stage("save"):
+            if self.save_profile == "fast":
+                # 既存のストリームはデコードせずに書き出し、圧縮されていないものだけを圧縮する
+                pdf.save(
+                    output_path,
+                    compress_streams=True,
+                    stream_decode_level=pikepdf.StreamDecodeLevel.none,
+                    object_stream_mode=pikepdf.ObjectStreamMode.preserve,
+                )
+            else:
                 pdf.save(
                     output_path,
                     compress_streams=True,
                     object_stream_mode=pikepdf.ObjectStreamMode.generate,
                     recompress_flate=True
                 )
-                logger.info("PDF保存完了")
 
-            # ファイルサイズのフォーマット用関数
-            def format_size(size):
-                for unit in ['B', 'KB', 'MB', 'GB']:
-                    if size < 1024.0:
-                        return f"{size:.1f}{unit}"
-                    size /= 1024.0
-                return f"{size:.1f}GB"
+    async def _collect_images(self, pdf, target_dpi=None):
+        """各ページの画像を重複なく収集する（pikepdfのオブジェクトはこのスレッドでのみ扱う）"""
+        from domain.pdf_image_collector import PdfImageCollector
 
-            # 圧縮結果の計算
-            original_size = os.path.getsize(input_path)
-            compressed_size = os.path.getsize(output_path)
-            actual_ratio = (1 - compressed_size / original_size) * 100
+        collector = PdfImageCollector(accept=self._should_recompress)
+        total_pages = len(pdf.pages)
+        for i, page in enumerate(pdf.pages):
+            logger.debug("ページ %d/%d を処理中", i + 1, total_pages)
+            collector.add_page(page, i + 1, track_placement=bool(target_dpi))
+            if i % PAGES_PER_YIELD == PAGES_PER_YIELD - 1:
+                # 待たずに制御だけ返し、同じループの他のジョブを止めないようにする
+                await asyncio.sleep(0)
+        return collector
 
-            # 結果のログ出力
-            logger.info(f"圧縮結果 - 元サイズ: {format_size(original_size)}, "
-                       f"圧縮後: {format_size(compressed_size)}, "
-                       f"圧縮率: {actual_ratio:.1f}%")
-
-            # UI更新
-            status.value = (
-                f"圧縮完了！\n"
-                f"元のサイズ: {format_size(original_size)}\n"
-                f"圧縮後のサイズ: {format_size(compressed_size)}\n"
-                f"圧縮率: {actual_ratio:.1f}%\n"
-                f"保存先: {output_path}"
-            )
-            progress.value = 1
-            
+    def _analyze(self, pdf, collector, input_path, quality, target_dpi=None) -> "PdfAnalysis":
+        """収集した画像の一覧から、再圧縮による削減量を画像をデコードせずに見積もる"""
+        from domain.pdf_analysis import PdfAnalysis, describe_image, estimate_recompressed_size, estimate_stream_savings
+
+        accepted = {job.objgen for job in collector.jobs}
+        analysis = PdfAnalysis(
+            input_path=input_path,
+            file_size=os.path.getsize(input_path),
+            pages=len(pdf.pages),
+            quality=quality,
+            image_references=collector.references,
+            stream_savings=estimate_stream_savings(pdf),
+        )
+        for job in collector.images:
+            info = describe_image(job, _image_filter(job.xobj), job.objgen in accepted)
+            info.estimated_bytes = estimate_recompressed_size(info, quality, self._scale_for(job, target_dpi))
+            analysis.images.append(info)
+        if self.save_profile == "maximum":
+            # 画像以外の削減（重複したフォント・メタデータ）も見込みに含め、画像のないPDFをスキップしない
+            from domain.pdf_optimizer import duplicate_font_bytes, metadata_bytes
+            analysis.optimize_savings = duplicate_font_bytes(pdf) + metadata_bytes(pdf)
+        return analysis
+
+    async def analyze_pdf(self, file_info, compression_ratio: float = 75.0,
+                          target_dpi: float = None) -> "PdfAnalysis":
+        """PDFを書き換えずに、画像の一覧と再圧縮した場合の削減量の見積もりを返す
+
+        画像はデコード・再エンコードしないため、圧縮より大幅に短い時間で終わります。
+
+        Args:
+            file_info: 入力PDFファイルのパス、またはpath属性を持つファイル情報
+            compression_ratio: 見積もりに使う圧縮率（0-100）
+            target_dpi: 画像をこの実効解像度まで縮小する前提で見積もる（Noneの場合は縮小しない）
+
+        Returns:
+            分析結果（エラーが発生した場合はerrorに内容が入る）
+        """
+        import pikepdf
+        from domain.pdf_analysis import PdfAnalysis
+
+        input_path = str(getattr(file_info, "path", file_info))
+        started = time.perf_counter()
+        try:
+            with pikepdf.open(input_path) as pdf:
+                collector = await self._collect_images(pdf, target_dpi)
+                analysis = self._analyze(pdf, collector, input_path, quality_for(compression_ratio), target_dpi)
         except Exception as e:
-            # エラー処理
-            logger.error(f"エラーが発生: {str(e)}", exc_info=True)
-            status.value = f"エラーが発生しました: {str(e)}"
+            logger.error("分析に失敗: %s", input_path, exc_info=True)
+            analysis = PdfAnalysis(input_path=input_path, error=str(e))
+        analysis.duration_seconds = time.perf_counter() - started
+        logger.info(
+            "分析: %s 画像 %d 件 / 削減見込み %dB (%.3f秒)",
+            input_path, len(analysis.images), analysis.estimated_savings, analysis.duration_seconds
+        )
+        return analysis
+
+    async def compress_files(self, files, listener: ProgressListener = None, compression_ratio: float = 75.0,
+                             target_dpi: float = None, target_size_mb: float = None) -> CompressionSummary:
+        """複数のPDFファイルを圧縮する
+
+        file_workersが1以上の場合はファイルごとにワーカープロセスで並列に圧縮します。
+        memory_limit_mbを指定した場合は、見積もりメモリ量の合計が上限を超えないよう
+        同時に処理するファイルを減らします（ただし1件は必ず処理します）。
+
+        Args:
+            files: 圧縮するファイル（パス、またはpath属性を持つオブジェクト）の一覧
+            listener: 進捗の通知先
+            compression_ratio: 圧縮率（0-100）
+            target_dpi: 画像をこの実効解像度まで縮小する（Noneの場合は縮小しない）
+            target_size_mb: ファイルごとの出力の目標サイズ（MB）
+        """
+        listener = listener or NULL_PROGRESS
+        paths = [str(getattr(file, "path", file)) for file in files]
+        started = time.perf_counter()
+        listener.batch_started([os.path.basename(path) for path in paths])
+
+        results = [None] * len(paths)
+        if self.file_workers == 0:
+            for i, path in enumerate(paths):
+                results[i] = await self.compress_pdf(path, listener, compression_ratio, i, target_dpi, target_size_mb)
+        else:
+            await self._compress_on_pool(paths, results, listener, compression_ratio, target_dpi, target_size_mb)
+
+        summary = CompressionSummary(results=results, duration_seconds=time.perf_counter() - started)
+        listener.batch_finished(summary)
+        logger.info(
+            "一括圧縮: %d件 / 削減 %dB / %.2f MB/秒 / %.1f ページ/秒",
+            len(results), summary.bytes_saved, summary.mb_per_second, summary.pages_per_second
+        )
+        return summary
+
+    async def _compress_on_pool(self, paths, results, listener, compression_ratio, target_dpi, target_size_mb=None):
+        loop = asyncio.get_running_loop()
+        budget = None if self.memory_limit_mb is None else self.memory_limit_mb * 1024 * 1024
+        # ファイル単位で並列に処理するため、画像用のスレッドはプロセス間で分け合う
+        image_workers = max(1, self.image_workers // self.file_workers)
+        batch_started = time.perf_counter()
+        pending = {}
+        in_use = 0
+        next_index = 0
+        try:
+            while next_index < len(paths) or pending:
+                while next_index < len(paths) and len(pending) < self.file_workers:
+                    path = paths[next_index]
+                    try:
+                        needed = estimate_memory(os.path.getsize(path))
+                    except OSError:
+                        needed = MEMORY_PER_FILE
+                    if pending and budget is not None and in_use + needed > budget:
+                        break
+                    listener.item_started(next_index, os.path.basename(path))
+                    future = loop.run_in_executor(
+                        self._get_file_executor(), _compress_file,
+                        path, compression_ratio, target_dpi, image_workers,
+                        self.low_memory, self.memory_budget_mb, self.metrics.enabled, target_size_mb,
+                        self.min_savings_ratio, None, self.save_profile,
+                    )
+                    pending[future] = (next_index, needed, time.perf_counter())
+                    in_use += needed
+                    next_index += 1
+
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in finished:
+                    index, needed, submitted = pending.pop(future)
+                    in_use -= needed
+                    result = self._worker_result(future, paths[index], submitted, batch_started)
+                    results[index] = result
+                    listener.item_finished(index, result)
         finally:
-            # UI更新の確実な実行
-            status.update()
-            progress.update() 
\ No newline at end of file
+            # キャンセルされた場合、まだ始まっていないファイルは処理しない
+            for future in pending:
+                future.cancel()
+
+    def _worker_result(self, future, path, submitted, queued_since) -> CompressionResult:
+        """ワーカープロセスでの圧縮結果を受け取り、計測結果を記録する
+
+        Args:
+            future: _compress_fileを投入したFuture（完了済み）
+            path: 入力ファイルのパス
+            submitted: ワーカーに投入した時刻
+            queued_since: 投入を待ち始めた時刻（メモリの見積もりによる待ちを計測に含める）
+        """
+        try:
+            result = future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # ワーカーが異常終了した場合、残りのファイルのためにプールを作り直す
+                self._file_executor = None
+            logger.error("圧縮に失敗: %s", path, exc_info=True)
+            result = CompressionResult(input_path=path, error=str(e) or type(e).__name__)
+        if result.metrics is not None:
+            # メモリの見積もりによる投入待ちと、ワーカーが処理を始めるまでの待ち時間
+            elapsed = time.perf_counter() - submitted
+            result.metrics["stages"]["queue_wait"] = (
+                submitted - queued_since + max(0.0, elapsed - result.duration_seconds)
+            )
+            self.metrics.record(result.metrics)
+        return result
+
+    async def compress_pdf_in_worker(self, file_info, listener: ProgressListener = None,
+                                     compression_ratio: float = 75.0, index: int = 0, target_dpi: float = None,
+                                     target_size_mb: float = None, data: bytes = None) -> CompressionResult:
+        """1ファイルをファイル処理用のワーカープロセスで圧縮する
+
+        file_workersが0の場合はcompress_pdfと同じくこのプロセスで圧縮します。
+        ワーカーで圧縮する場合、listenerには開始と完了だけを通知します。
+        引数はcompress_pdfと同じです。
+        """
+        if self.file_workers == 0:
+            return await self.compress_pdf(
+                file_info, listener, compression_ratio, index, target_dpi, target_size_mb, data
+            )
+        listener = listener or NULL_PROGRESS
+        input_path = str(getattr(file_info, "path", file_info))
+        listener.item_started(index, os.path.basename(input_path))
+        submitted = time.perf_counter()
+        future = asyncio.get_running_loop().run_in_executor(
+            self._get_file_executor(), _compress_file,
+            input_path, compression_ratio, target_dpi, max(1, self.image_workers // self.file_workers),
+            self.low_memory, self.memory_budget_mb, self.metrics.enabled, target_size_mb,
+            self.min_savings_ratio, data, self.save_profile,
+        )
+        try:
+            await asyncio.wait([future])
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        result = self._worker_result(future, input_path, submitted, submitted)
+        listener.item_finished(index, result)
+        return result
@@ -0,0 +1,171 @@
+import asyncio
+import contextlib
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from application.conversion_service import ConversionResult, ConversionService
+from application.pdf_compression_service import CompressionResult, CompressionSummary, PDFCompressionService
+from application.progress import NULL_PROGRESS, ProgressListener
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PipelineResult:
+    """1ファイル分の圧縮とMarkdown変換の結果"""
+    source: str
+    compression: CompressionResult = None
+    conversion: ConversionResult = None
+    input_bytes: int = 0
+    read_seconds: float = 0.0
+    duration_seconds: float = 0.0
+    error: str = None  # 読み込み、またはいずれかの処理に失敗した場合の内容
+
+    @property
+    def state(self) -> str:
+        return "error" if self.error else "done"
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "state": self.state}
+
+
+@dataclass
+class PipelineSummary:
+    """複数ファイルの圧縮・変換の結果"""
+    results: list = field(default_factory=list)
+    duration_seconds: float = 0.0
+
+    @property
+    def failed(self) -> int:
+        return sum(r.error is not None for r in self.results)
+
+    @property
+    def compression(self) -> CompressionSummary:
+        """圧縮の結果だけを集めた集計（読み込めなかったファイルは含まない）"""
+        return CompressionSummary(
+            results=[r.compression for r in self.results if r.compression is not None],
+            duration_seconds=self.duration_seconds,
+        )
+
+    def to_dict(self) -> dict:
+        compression = self.compression
+        return {
+            "duration_seconds": self.duration_seconds,
+            "files": len(self.results),
+            "failed": self.failed,
+            "input_bytes": sum(r.input_bytes for r in self.results),
+            "compressed_bytes": compression.compressed_bytes,
+            "markdown_bytes": sum(r.conversion.output_bytes for r in self.results if r.conversion is not None),
+            "read_seconds": sum(r.read_seconds for r in self.results),
+            "results": [r.to_dict() for r in self.results],
+        }
+
+
+class _StageProgress(ProgressListener):
+    """圧縮・変換の一方の進捗を受け取り、両方の平均を1件分の進捗として通知するリスナー
+
+    各サービスからの開始・完了の通知は転送せず、パイプラインが1回だけ通知します。
+    """
+
+    def __init__(self, listener: ProgressListener, index: int, name: str, fractions: dict):
+        self.listener = listener
+        self.index = index
+        self.name = name
+        self.fractions = fractions
+        fractions[name] = 0.0
+
+    def item_progress(self, index, fraction):
+        self.fractions[self.name] = fraction
+        self.listener.item_progress(self.index, sum(self.fractions.values()) / len(self.fractions))
+
+
+class PdfPipeline:
+    """PDFの圧縮とMarkdownへの変換を1つのジョブとして実行するクラス
+
+    入力は1回だけ読み込み、その内容を両方の処理に渡します。
+    圧縮はPDFCompressionServiceの、変換はConversionServiceのワーカープロセスで
+    同時に実行するため、1件の中でも2つの処理が別々のCPUコアで進みます。
+    """
+
+    def __init__(self, compression_service: PDFCompressionService, conversion_service: ConversionService,
+                 max_pending: int = None):
+        """
+        Args:
+            compression_service: 圧縮に使うサービス
+            conversion_service: Markdownへの変換に使うサービス
+            max_pending: 同時に処理するファイル数（Noneの場合は圧縮のfile_workers、0の場合は1）。
+                読み込んだ内容はこの件数分だけメモリに保持します
+        """
+        self.compression_service = compression_service
+        self.conversion_service = conversion_service
+        self.max_pending = max_pending or max(1, compression_service.file_workers)
+
+    async def process_file(self, file_path, index: int = 0, listener: ProgressListener = None,
+                           compression_ratio: float = 75.0, target_dpi: float = None,
+                           target_size_mb: float = None, slots: asyncio.Semaphore = None) -> PipelineResult:
+        """1ファイルを読み込み、圧縮と変換を同時に実行する（例外は送出せず結果のerrorに格納する）"""
+        listener = listener or NULL_PROGRESS
+        file_path = Path(getattr(file_path, "path", file_path))
+        result = PipelineResult(source=str(file_path))
+        async with slots or contextlib.nullcontext():
+            started = time.perf_counter()
+            listener.item_started(index, file_path.name)
+            try:
+                data = await asyncio.to_thread(file_path.read_bytes)
+            except OSError as e:
+                result.error = str(e)
+            else:
+                result.input_bytes = len(data)
+                result.read_seconds = time.perf_counter() - started
+                fractions = {}
+                result.compression, result.conversion = await asyncio.gather(
+                    self.compression_service.compress_pdf_in_worker(
+                        file_path, _StageProgress(listener, index, "compress", fractions), compression_ratio,
+                        index, target_dpi, target_size_mb, data,
+                    ),
+                    self.conversion_service.convert_file(
+                        file_path, index, _StageProgress(listener, index, "convert", fractions), data=data,
+                    ),
+                )
+                # ワーカーに渡し終えた内容は、結果を待つ他のファイルのためにすぐ手放す
+                data = None
+                errors = []
+                if result.compression.error is not None:
+                    errors.append(f"圧縮: {result.compression.error}")
+                if result.conversion.state == "error":
+                    errors.append(f"変換: {result.conversion.error}")
+                result.error = " / ".join(errors) or None
+            result.duration_seconds = time.perf_counter() - started
+        listener.item_finished(index, result)
+        return result
+
+    async def process_files(self, files, listener: ProgressListener = None, compression_ratio: float = 75.0,
+                            target_dpi: float = None, target_size_mb: float = None) -> PipelineSummary:
+        """複数のPDFを圧縮し、Markdownに変換する
+
+        Args:
+            files: 処理するPDF（パス、またはpath属性を持つオブジェクト）の一覧
+            listener: 進捗の通知先（1ファイルにつき開始・完了を1回ずつ通知する）
+            compression_ratio: 圧縮率（0-100）
+            target_dpi: 画像をこの実効解像度まで縮小する（Noneの場合は縮小しない）
+            target_size_mb: ファイルごとの出力の目標サイズ（MB）
+        """
+        listener = listener or NULL_PROGRESS
+        paths = [Path(getattr(file, "path", file)) for file in files]
+        started = time.perf_counter()
+        listener.batch_started([path.name for path in paths])
+
+        slots = asyncio.Semaphore(self.max_pending)
+        results = await asyncio.gather(*[
+            self.process_file(path, i, listener, compression_ratio, target_dpi, target_size_mb, slots)
+            for i, path in enumerate(paths)
+        ])
+
+        summary = PipelineSummary(results=list(results), duration_seconds=time.perf_counter() - started)
+        listener.batch_finished(summary)
+        logger.info(
+            "圧縮・変換: %d件 / 失敗 %d件 / %.2f秒",
+            len(results), summary.failed, summary.duration_seconds
+        )
+        return summary
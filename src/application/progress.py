@@ -0,0 +1,70 @@
+import time
+
+
+class ProgressListener:
+    """サービスから進捗を受け取るためのインターフェース
+
+    サービスはFletなどのUIに依存せず、このインターフェースを通じて進捗を通知します。
+    既定の実装は何もしないため、必要なメソッドだけを上書きして使います。
+    indexはbatch_startedで渡した一覧の中での位置です。
+    """
+
+    def batch_started(self, names: list) -> None:
+        pass
+
+    def item_started(self, index: int, name: str) -> None:
+        pass
+
+    def item_progress(self, index: int, fraction: float) -> None:
+        pass
+
+    def item_finished(self, index: int, result) -> None:
+        pass
+
+    def batch_finished(self, summary) -> None:
+        pass
+
+
+NULL_PROGRESS = ProgressListener()
+
+
+class ThrottledProgress(ProgressListener):
+    """item_progressの通知を間引いて転送するリスナー
+
+    進捗率がmin_step以上進み、かつ前回の通知から1/fps秒以上経った場合だけ転送します。
+    完了（1.0）とitem_progress以外の通知は常にそのまま転送します。
+    fpsまたはmin_stepに0を指定すると、その条件は使いません。
+    """
+
+    def __init__(self, listener: ProgressListener, fps: float = 10.0, min_step: float = 0.01,
+                 clock=time.monotonic):
+        self.listener = listener
+        self.interval = 1.0 / fps if fps else 0.0
+        self.min_step = min_step
+        self.clock = clock
+        self._reported = {}
+
+    def batch_started(self, names):
+        self._reported.clear()
+        self.listener.batch_started(names)
+
+    def item_started(self, index, name):
+        self._reported.pop(index, None)
+        self.listener.item_started(index, name)
+
+    def item_progress(self, index, fraction):
+        now = self.clock()
+        last = self._reported.get(index)
+        if last is not None and fraction < 1.0:
+            last_fraction, last_time = last
+            if fraction - last_fraction < self.min_step or now - last_time < self.interval:
+                return
+        self._reported[index] = (fraction, now)
+        self.listener.item_progress(index, fraction)
+
+    def item_finished(self, index, result):
+        self._reported.pop(index, None)
+        self.listener.item_finished(index, result)
+
+    def batch_finished(self, summary):
+        self.listener.batch_finished(summary)
@@ -0,0 +1,368 @@
+"""Fletを使わずにMarkdown変換・PDF圧縮を実行するコマンドラインツール
+
+使い方:
+    python src/cli.py convert docs/ "reports/**/*.docx" --workers 8 --json results.json
+    python src/cli.py compress scans/ --ratio 60 --json results.json
+    python src/cli.py analyze scans/ --ratio 60
+    python src/cli.py pipeline archive/ --ratio 60
+    python src/cli.py watch //share/inbox --compress --interval 5
+    python src/cli.py startup --json startup.json
+    python src/cli.py --metrics-log metrics.jsonl compress scans/
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+from application.conversion_service import ConversionService
+from application.folder_watcher import FolderWatcher
+from application.pdf_compression_service import (
+    DEFAULT_MIN_SAVINGS_RATIO, DEFAULT_SAVE_PROFILE, SAVE_PROFILES, PDFCompressionService,
+)
+from application.pdf_pipeline import PdfPipeline
+from application.progress import ProgressListener
+from infrastructure.conversion_cache import ConversionCache
+from infrastructure.metrics import MetricsRecorder
+from infrastructure.startup_timer import HEAVY_MODULES, cold_import_times
+from infrastructure.watch_index import WatchIndex
+
+# startupコマンドで読み込み時間を測るモジュール（アプリ本体と、遅延読み込みしている重いモジュール）
+STARTUP_MODULES = (
+    "flet", "application.conversion_service", "application.pdf_compression_service", "main", *HEAVY_MODULES,
+)
+
+# ディレクトリを指定した場合に変換対象とする拡張子
+CONVERTIBLE_EXTENSIONS = {
+    ".pdf", ".docx", ".xlsx", ".pptx", ".html", ".htm",
+    ".txt", ".csv", ".json", ".xml", ".zip",
+}
+
+PROFILE_HELP = "圧縮したPDFの保存プロファイル（fast: 速度優先、balanced: 標準、maximum: サイズ優先）"
+
+
+def expand_inputs(patterns, extensions) -> list:
+    """ファイル・ディレクトリ・globパターンを重複のないファイル一覧に展開する
+
+    Args:
+        patterns: コマンドラインで指定されたパスまたはパターン
+        extensions: ディレクトリ内から拾う拡張子
+    """
+    found = {}
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            candidates = [Path(p) for p in sorted(glob.glob(pattern, recursive=True))]
+        else:
+            candidates = [Path(pattern)]
+        for candidate in candidates:
+            if candidate.is_dir():
+                for path in sorted(candidate.rglob("*")):
+                    if path.is_file() and path.suffix.lower() in extensions:
+                        found.setdefault(path.resolve(), path)
+            elif candidate.is_file():
+                found.setdefault(candidate.resolve(), candidate)
+            else:
+                raise FileNotFoundError(f"入力が見つかりません: {candidate}")
+    return list(found.values())
+
+
+class CliProgress(ProgressListener):
+    """進捗を標準エラー出力に1行ずつ表示するリスナー"""
+
+    def __init__(self, quiet: bool = False):
+        self.quiet = quiet
+        self.total = 0
+        self.finished = 0
+
+    def batch_started(self, names):
+        self.total = len(names)
+
+    def item_finished(self, index, result):
+        self.finished += 1
+        if self.quiet:
+            return
+        error = getattr(result, "error", None)
+        state = getattr(result, "state", "error" if error else "done")
+        if getattr(result, "skipped", False):
+            state = "skipped"
+        name = os.path.basename(getattr(result, "source", None) or result.input_path)
+        line = f"[{self.finished}/{self.total or '?'}] {name}: {state} ({result.duration_seconds:.2f}s)"
+        if error:
+            line += f" {error}"
+        print(line, file=sys.stderr, flush=True)
+
+
+async def run_convert(args) -> dict:
+    paths = expand_inputs(args.inputs, CONVERTIBLE_EXTENSIONS)
+    cache = None if args.no_cache else ConversionCache(args.cache_dir)
+    service = ConversionService(
+        max_workers=args.workers, max_pending=args.max_pending, cache=cache, metrics=args.recorder
+    )
+    try:
+        summary = await service.process_files(paths, CliProgress(args.quiet))
+    finally:
+        service.shutdown()
+    return summary.to_dict()
+
+
+async def run_compress(args) -> dict:
+    paths = expand_inputs(args.inputs, {".pdf"})
+    service = PDFCompressionService(
+        image_workers=args.image_workers,
+        image_executor=args.image_executor,
+        file_workers=args.file_workers,
+        memory_limit_mb=args.memory_limit_mb,
+        low_memory=args.low_memory,
+        memory_budget_mb=args.memory_budget_mb,
+        metrics=args.recorder,
+        min_savings_ratio=None if args.always else args.min_savings,
+        save_profile=args.profile,
+    )
+    try:
+        summary = await service.compress_files(
+            paths, CliProgress(args.quiet), compression_ratio=args.ratio, target_dpi=args.target_dpi,
+            target_size_mb=args.target_size_mb,
+        )
+    finally:
+        service.shutdown()
+    return summary.to_dict()
+
+
+async def run_pipeline(args) -> dict:
+    paths = expand_inputs(args.inputs, {".pdf"})
+    cache = None if args.no_cache else ConversionCache(args.cache_dir)
+    compression_service = PDFCompressionService(
+        file_workers=args.file_workers, metrics=args.recorder,
+        min_savings_ratio=None if args.always else args.min_savings, save_profile=args.profile,
+    )
+    conversion_service = ConversionService(max_workers=args.workers, cache=cache, metrics=args.recorder)
+    try:
+        summary = await PdfPipeline(compression_service, conversion_service).process_files(
+            paths, CliProgress(args.quiet), compression_ratio=args.ratio, target_dpi=args.target_dpi,
+            target_size_mb=args.target_size_mb,
+        )
+    finally:
+        compression_service.shutdown()
+        conversion_service.shutdown()
+    return summary.to_dict()
+
+
+async def run_analyze(args) -> dict:
+    paths = expand_inputs(args.inputs, {".pdf"})
+    service = PDFCompressionService()
+    results = []
+    for path in paths:
+        analysis = await service.analyze_pdf(path, compression_ratio=args.ratio, target_dpi=args.target_dpi)
+        if not args.quiet:
+            print(
+                f"{os.path.basename(path)}: 画像 {len(analysis.images)}件 / "
+                f"削減見込み {analysis.estimated_savings}B ({analysis.duration_seconds:.3f}s)",
+                file=sys.stderr, flush=True,
+            )
+        results.append(analysis.to_dict())
+    return {
+        "files": len(results),
+        "failed": sum(1 for r in results if r["error"]),
+        "file_size": sum(r["file_size"] for r in results),
+        "estimated_savings": sum(r["estimated_savings"] for r in results),
+        "results": results,
+    }
+
+
+def print_watch_status(stats, last_state: tuple = None, quiet: bool = False) -> tuple:
+    """待ち行列の長さと処理速度を、前回の状態から変化があった時だけ標準エラー出力に表示する
+
+    Returns:
+        今回の状態（次回の呼び出しでlast_stateに渡す）
+    """
+    state = (stats.queued, stats.processed, stats.failed)
+    if not quiet and state != last_state:
+        print(
+            f"[watch] 待機中: {stats.queued}件 / 処理済み: {stats.processed}件 / 失敗: {stats.failed}件 / "
+            f"{stats.files_per_minute:.1f} ファイル/分 / {stats.mb_per_second:.2f} MB/秒",
+            file=sys.stderr, flush=True,
+        )
+    return state
+
+
+async def run_watch(args) -> dict:
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"ディレクトリが見つかりません: {directory}")
+    conversion_service = compression_service = None
+    if not args.no_convert:
+        cache = None if args.no_cache else ConversionCache(args.cache_dir)
+        conversion_service = ConversionService(max_workers=args.workers, cache=cache, metrics=args.recorder)
+    if args.compress:
+        compression_service = PDFCompressionService(
+            file_workers=args.file_workers, metrics=args.recorder, min_savings_ratio=DEFAULT_MIN_SAVINGS_RATIO,
+            save_profile=args.profile,
+        )
+    index = WatchIndex(args.index)
+    watcher = FolderWatcher(
+        args.directories,
+        conversion_service=conversion_service,
+        compression_service=compression_service,
+        index=index,
+        convert_extensions=CONVERTIBLE_EXTENSIONS,
+        # 1回だけ走査する場合は、見つかったファイルをすぐに処理する
+        debounce_seconds=0 if args.once else args.debounce,
+        compression_ratio=args.ratio,
+        target_dpi=args.target_dpi,
+        listener=CliProgress(args.quiet),
+    )
+    last_state = None
+
+    def on_poll(stats):
+        nonlocal last_state
+        last_state = print_watch_status(stats, last_state, args.quiet)
+
+    try:
+        if args.once:
+            await watcher.poll()
+        else:
+            await watcher.run(args.interval, on_poll=on_poll)
+    except asyncio.CancelledError:
+        # Ctrl+Cで止めた場合も、それまでの集計を出力する
+        pass
+    finally:
+        for service in (conversion_service, compression_service):
+            if service is not None:
+                service.shutdown()
+        index.close()
+    return {
+        "directories": [str(d) for d in args.directories],
+        "failed": watcher.stats.failed,
+        "stats": watcher.stats.to_dict(),
+    }
+
+
+async def run_startup(args) -> dict:
+    modules = args.modules or STARTUP_MODULES
+    times = await asyncio.to_thread(cold_import_times, modules, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return {
+        "failed": sum(1 for seconds in times.values() if seconds is None),
+        "imports": times,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Markdown変換・PDF圧縮をコマンドラインから実行します")
+    parser.add_argument("--json", dest="json_path", help="結果のJSONを書き出すファイル（省略時は標準出力）")
+    parser.add_argument("--quiet", action="store_true", help="ファイルごとの進捗を表示しない")
+    parser.add_argument("--log-level", default="WARNING", help="ログレベル（DEBUG, INFO, WARNING...）")
+    parser.add_argument("--metrics", action="store_true",
+                        help="ステージごとの時間とカウンタを計測し、ファイルごとの結果と集計をJSONに含める")
+    parser.add_argument("--metrics-log", default=None,
+                        help="ファイルごとの計測結果をJSON Linesで追記するファイル（--metricsを含む）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="ファイルをMarkdownに変換する")
+    convert.add_argument("inputs", nargs="+", help="ファイル・ディレクトリ・globパターン")
+    convert.add_argument("--workers", type=int, default=None,
+                         help="変換プロセス数（省略時はCPUコア数、0でプロセスを使わない）")
+    convert.add_argument("--max-pending", type=int, default=None, help="同時に投入する変換の上限")
+    convert.add_argument("--no-cache", action="store_true", help="変換キャッシュを使わない")
+    convert.add_argument("--cache-dir", default=None, help="変換キャッシュの保存先")
+    convert.set_defaults(handler=run_convert)
+
+    compress = subparsers.add_parser("compress", help="PDFファイルを圧縮する")
+    compress.add_argument("inputs", nargs="+", help="ファイル・ディレクトリ・globパターン")
+    compress.add_argument("--ratio", type=float, default=75.0, help="圧縮率（0-100）")
+    compress.add_argument("--target-size-mb", type=float, default=None,
+                          help="出力の目標サイズ（MB）。指定すると--ratioの代わりに、収まる最も高い品質を推定して使う")
+    compress.add_argument("--target-dpi", type=float, default=None,
+                          help="画像をこの実効解像度まで縮小する（省略時は縮小しない）")
+    compress.add_argument("--image-workers", type=int, default=None,
+                          help="画像の再エンコードに使うワーカー数（省略時はCPUコア数、1で逐次処理）")
+    compress.add_argument("--image-executor", choices=["thread", "process"], default="thread",
+                          help="画像の再エンコードに使うワーカーの種類")
+    compress.add_argument("--file-workers", type=int, default=None,
+                          help="同時に圧縮するファイル数（省略時はCPUコア数、0でプロセスを使わず1件ずつ）")
+    compress.add_argument("--memory-limit-mb", type=float, default=None,
+                          help="同時に圧縮するファイルの見積もりメモリ量の上限（MB）")
+    compress.add_argument("--low-memory", action="store_true",
+                          help="巨大なPDF向けに、入力をメモリマップで開き画像を少しずつ処理する")
+    compress.add_argument("--memory-budget-mb", type=float, default=None,
+                          help="1プロセスの常駐メモリ量の目安（MB）。超えている間は新しい画像の処理を始めない")
+    compress.add_argument("--min-savings", type=float, default=DEFAULT_MIN_SAVINGS_RATIO,
+                          help="削減見込みがファイルサイズのこの割合に満たないPDFは圧縮しない（0.01で1%%）")
+    compress.add_argument("--always", action="store_true", help="削減見込みにかかわらず必ず圧縮する")
+    compress.add_argument("--profile", choices=SAVE_PROFILES, default=DEFAULT_SAVE_PROFILE,
+                          help=PROFILE_HELP)
+    compress.set_defaults(handler=run_compress)
+
+    pipeline = subparsers.add_parser("pipeline", help="PDFを1回だけ読み込み、圧縮とMarkdownへの変換を同時に行う")
+    pipeline.add_argument("inputs", nargs="+", help="ファイル・ディレクトリ・globパターン")
+    pipeline.add_argument("--ratio", type=float, default=75.0, help="圧縮率（0-100）")
+    pipeline.add_argument("--target-size-mb", type=float, default=None, help="圧縮後の目標サイズ（MB）")
+    pipeline.add_argument("--target-dpi", type=float, default=None, help="画像をこの実効解像度まで縮小する")
+    pipeline.add_argument("--min-savings", type=float, default=DEFAULT_MIN_SAVINGS_RATIO,
+                          help="削減見込みがファイルサイズのこの割合に満たないPDFは圧縮しない")
+    pipeline.add_argument("--always", action="store_true", help="削減見込みにかかわらず必ず圧縮する")
+    pipeline.add_argument("--profile", choices=SAVE_PROFILES, default=DEFAULT_SAVE_PROFILE, help=PROFILE_HELP)
+    pipeline.add_argument("--file-workers", type=int, default=None,
+                          help="圧縮に使うプロセス数（同時に処理するファイル数）")
+    pipeline.add_argument("--workers", type=int, default=None, help="変換に使うプロセス数")
+    pipeline.add_argument("--no-cache", action="store_true", help="変換キャッシュを使わない")
+    pipeline.add_argument("--cache-dir", default=None, help="変換キャッシュの保存先")
+    pipeline.set_defaults(handler=run_pipeline)
+
+    analyze = subparsers.add_parser("analyze", help="PDFの画像の一覧と、圧縮した場合の削減量の見積もりを出力する")
+    analyze.add_argument("inputs", nargs="+", help="ファイル・ディレクトリ・globパターン")
+    analyze.add_argument("--ratio", type=float, default=75.0, help="見積もりに使う圧縮率（0-100）")
+    analyze.add_argument("--target-dpi", type=float, default=None,
+                         help="画像をこの実効解像度まで縮小する前提で見積もる")
+    analyze.set_defaults(handler=run_analyze)
+
+    watch = subparsers.add_parser("watch", help="フォルダを監視し、新規・変更されたファイルを処理する")
+    watch.add_argument("directories", nargs="+", help="監視するディレクトリ")
+    watch.add_argument("--interval", type=float, default=2.0, help="走査の間隔（秒）")
+    watch.add_argument("--debounce", type=float, default=3.0,
+                       help="ファイルの変更が止まってから処理するまでの秒数")
+    watch.add_argument("--once", action="store_true", help="1回だけ走査して終了する")
+    watch.add_argument("--index", default=None, help="処理済みファイルのインデックスの保存先")
+    watch.add_argument("--no-convert", action="store_true", help="Markdownに変換しない")
+    watch.add_argument("--compress", action="store_true", help="PDFを圧縮する")
+    watch.add_argument("--workers", type=int, default=None, help="変換プロセス数")
+    watch.add_argument("--file-workers", type=int, default=None, help="同時に圧縮するファイル数")
+    watch.add_argument("--ratio", type=float, default=75.0, help="圧縮率（0-100）")
+    watch.add_argument("--target-dpi", type=float, default=None, help="画像をこの実効解像度まで縮小する")
+    watch.add_argument("--profile", choices=SAVE_PROFILES, default=DEFAULT_SAVE_PROFILE, help=PROFILE_HELP)
+    watch.add_argument("--no-cache", action="store_true", help="変換キャッシュを使わない")
+    watch.add_argument("--cache-dir", default=None, help="変換キャッシュの保存先")
+    watch.set_defaults(handler=run_watch)
+
+    startup = subparsers.add_parser("startup", help="モジュールごとの読み込み時間（コールドスタート）を測る")
+    startup.add_argument("modules", nargs="*", help="測るモジュール（省略時はアプリの主要なモジュール）")
+    startup.set_defaults(handler=run_startup)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+    args.recorder = MetricsRecorder(args.metrics_log) if args.metrics or args.metrics_log else None
+
+    try:
+        report = asyncio.run(args.handler(args))
+    except FileNotFoundError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 2
+    report = {"command": args.command, **report}
+    if args.recorder is not None:
+        report["metrics"] = args.recorder.summary()
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        Path(args.json_path).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import io
+import time
+import zlib
+from dataclasses import dataclass
+from PIL import Image, ImageChops
+
+# IJG（libjpeg）の標準輝度量子化テーブル。JPEGの品質を推定するために使う
+_STANDARD_LUMINANCE_TABLE = (
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99,
+)
+
+
+@dataclass
+class ImageSource:
+    """ワーカーに渡す再圧縮前の画像
+
+    JPEG（DCTDecode）の画像はencodedにそのままのデータを、
+    それ以外の画像はpikepdfでデコードしたPIL画像をimageに入れます。
+    pikepdfのオブジェクトを含まないため、ワーカープロセスにも渡せます。
+    """
+    original_size: int
+    encoded: bytes = None
+    image: Image.Image = None
+
+    def open(self) -> Image.Image:
+        if self.image is not None:
+            return self.image
+        return Image.open(io.BytesIO(self.encoded))
+
+
+# 画像の分類
+BILEVEL = "bilevel"      # 白黒2値（スキャンした文書など）
+PALETTE = "palette"      # 色数の少ない図・線画
+GRAYSCALE = "grayscale"  # グレースケールの写真
+PHOTO = "photo"          # カラー写真
+
+IMAGE_CLASSES = (BILEVEL, PALETTE, GRAYSCALE, PHOTO)
+
+# 線画として扱う最大色数（これを超える画像は写真として扱う）
+MAX_PALETTE_COLORS = 256
+# グレースケールの線画として扱う最大階調数
+MAX_GRAY_PALETTE_LEVELS = 16
+# RGBの各チャンネル間の差がこれ以下であればグレースケールとみなす
+GRAY_TOLERANCE = 8
+
+
+@dataclass
+class EncodedImage:
+    """再エンコードした画像と、XObjectに書き戻すための属性"""
+    data: bytes
+    width: int
+    height: int
+    color_space: str = "/DeviceRGB"
+    bits_per_component: int = 8
+    filter: str = "/DCTDecode"
+    palette: bytes = None       # Indexed色空間のパレット（RGBの並び）
+    decode_parms: dict = None
+
+
+@dataclass
+class RecompressionResult:
+    """1枚の画像の分類と、置き換える場合の再エンコード結果"""
+    image_class: str
+    encoded: EncodedImage = None  # Noneの場合は元の画像を残す
+    decode_seconds: float = 0.0
+    encode_seconds: float = 0.0  # 分類・縮小を含む
+
+
+def estimate_jpeg_quality(img: Image.Image):
+    """JPEGの量子化テーブルから、エンコード時の品質（1-100）を推定する
+
+    量子化テーブルを持たない画像の場合はNoneを返します。
+    """
+    tables = getattr(img, "quantization", None)
+    if not tables:
+        return None
+    luminance = tables[min(tables)]
+    scale = sum(luminance) * 100 / sum(_STANDARD_LUMINANCE_TABLE)
+    if scale <= 100:
+        quality = (200 - scale) / 2
+    else:
+        quality = 5000 / scale
+    return max(1, min(100, round(quality)))
+
+
+def classify_image(img: Image.Image) -> str:
+    """画像を白黒2値・線画・グレースケール写真・カラー写真に分類する"""
+    if img.mode == '1':
+        return BILEVEL
+    if img.mode == 'P':
+        return PALETTE
+    if img.mode == 'RGB':
+        # 縮小版でチャンネル間の差を調べ、実質グレーの画像はグレースケールとして分類する
+        sample = img.copy()
+        sample.thumbnail((256, 256))
+        r, g, b = sample.split()
+        if max(ImageChops.difference(r, g).getextrema()[1],
+               ImageChops.difference(g, b).getextrema()[1]) > GRAY_TOLERANCE:
+            return PALETTE if img.getcolors(MAX_PALETTE_COLORS) is not None else PHOTO
+        img = img.convert('L')
+    colors = img.getcolors(MAX_GRAY_PALETTE_LEVELS)
+    if colors is not None and len(colors) <= 2 and all(v in (0, 255) for _, v in colors):
+        return BILEVEL
+    return PALETTE if colors is not None else GRAYSCALE
+
+
+def _resize(img: Image.Image, scale: float, image_class: str) -> Image.Image:
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    if image_class == BILEVEL:
+        # 2値画像は階調を持たせて縮小してから2値に戻し、細い線が消えないようにする
+        gray = img.convert('L').resize(size, Image.Resampling.LANCZOS)
+        return gray.point(lambda v: 255 if v >= 128 else 0).convert('1', dither=Image.Dither.NONE)
+    if image_class == PALETTE:
+        # パレットの色を増やさないよう最近傍で縮小する
+        return img.resize(size, Image.Resampling.NEAREST)
+    return img.resize(size, Image.Resampling.LANCZOS)
+
+
+def _encode_bilevel(img: Image.Image) -> EncodedImage:
+    """CCITT G4で符号化する"""
+    img = img if img.mode == '1' else img.convert('1', dither=Image.Dither.NONE)
+    tiff = io.BytesIO()
+    img.save(tiff, format='TIFF', compression='group4', tiffinfo={278: img.height})
+    parsed = Image.open(io.BytesIO(tiff.getvalue()))
+    offset = parsed.tag_v2[273][0]
+    length = parsed.tag_v2[279][0]
+    return EncodedImage(
+        data=tiff.getvalue()[offset:offset + length],
+        width=img.width,
+        height=img.height,
+        color_space="/DeviceGray",
+        bits_per_component=1,
+        filter="/CCITTFaxDecode",
+        # PILの2値画像は1が白（MinIsBlack）のまま符号化されるため、PDF側ではBlackIs1で解釈させる
+        decode_parms={"/K": -1, "/Columns": img.width, "/Rows": img.height, "/BlackIs1": True},
+    )
+
+
+def _encode_palette(img: Image.Image) -> EncodedImage:
+    """色数を減らしたパレット画像としてFlateで符号化する"""
+    rgb = img.convert('RGB')
+    # 実際に使われている色だけでパレットを作り直す
+    # （メディアンカットは色数が上限以内であれば元の色をそのまま残す）
+    used = len(rgb.getcolors(MAX_PALETTE_COLORS) or []) or MAX_PALETTE_COLORS
+    indexed = rgb.quantize(colors=used, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+
+    # 色数に応じてピクセルあたりのビット数を減らす
+    bits = next(b for b in (1, 2, 4, 8) if used <= 2 ** b)
+    raw = indexed.tobytes() if bits == 8 else indexed.tobytes('raw', f'P;{bits}')
+    palette_bytes = bytes((indexed.getpalette('RGB') or [])[:used * 3]).ljust(used * 3, b'\0')
+    return EncodedImage(
+        data=zlib.compress(raw, 9),
+        width=indexed.width,
+        height=indexed.height,
+        color_space="/Indexed",
+        bits_per_component=bits,
+        filter="/FlateDecode",
+        palette=palette_bytes,
+    )
+
+
+def _encode_jpeg(img: Image.Image, quality: int, mode: str) -> EncodedImage:
+    if img.mode != mode:
+        img = img.convert(mode)
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=int(quality), optimize=True)
+    return EncodedImage(
+        data=output.getvalue(),
+        width=img.width,
+        height=img.height,
+        color_space="/DeviceGray" if mode == 'L' else "/DeviceRGB",
+    )
+
+
+def recompress_image(source: ImageSource, quality: int, scale: float = 1.0) -> RecompressionResult:
+    """画像を分類し、種類に合った形式で（必要なら縮小して）再エンコードする
+
+    - 白黒2値: CCITT G4
+    - 線画: 色数を減らしたパレット + Flate
+    - グレースケール写真: グレースケールJPEG
+    - カラー写真: RGB JPEG
+
+    pikepdfのオブジェクトには触れないため、
+    ワーカースレッド・ワーカープロセスのどちらからでも呼び出せます。
+
+    Args:
+        source: 再圧縮前の画像
+        quality: JPEGの品質（1-100）
+        scale: 縮小率（1.0の場合は縮小しない）
+
+    Returns:
+        分類と、元のデータより小さくなった場合のみ再エンコード結果
+    """
+    started = time.perf_counter()
+    img = source.open()
+
+    # 既存のJPEGが要求より低い品質でエンコード済みなら、縮小しない限り得るものはない
+    if source.encoded is not None and scale >= 1.0:
+        original_quality = estimate_jpeg_quality(img)
+        if original_quality is not None and original_quality <= quality:
+            return RecompressionResult(
+                GRAYSCALE if img.mode == 'L' else PHOTO, decode_seconds=time.perf_counter() - started
+            )
+
+    img.load()
+    decoded = time.perf_counter()
+    if img.mode not in ('1', 'L', 'P', 'RGB'):
+        img = img.convert('RGB')
+    image_class = classify_image(img)
+    if scale < 1.0:
+        img = _resize(img, scale, image_class)
+
+    if image_class == BILEVEL:
+        encoded = _encode_bilevel(img)
+    elif image_class == PALETTE:
+        encoded = _encode_palette(img)
+    elif image_class == GRAYSCALE:
+        encoded = _encode_jpeg(img, quality, 'L')
+    else:
+        encoded = _encode_jpeg(img, quality, 'RGB')
+
+    timings = {"decode_seconds": decoded - started, "encode_seconds": time.perf_counter() - decoded}
+    # 元より大きくなる場合は置き換えない
+    if len(encoded.data) >= source.original_size:
+        return RecompressionResult(image_class, **timings)
+    return RecompressionResult(image_class, encoded, **timings)
@@ -1,6 +1,309 @@
-from markitdown import MarkItDown
+import functools
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from importlib.metadata import version
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def _create_engine():
+    from markitdown import MarkItDown
+    return MarkItDown()
+
+
+@dataclass
+class EnginePoolStats:
+    """エンジンプールの利用統計"""
+    engines_created: int = 0
+    init_seconds: float = 0.0
+    conversions: int = 0
+
+    @property
+    def saved_seconds(self) -> float:
+        """エンジンを使い回したことで省略できた初期化時間（推定）"""
+        if self.engines_created == 0:
+            return 0.0
+        average_init = self.init_seconds / self.engines_created
+        return average_init * max(0, self.conversions - self.engines_created)
+
+
+class MarkItDownEnginePool:
+    """MarkItDownエンジンを使い回すための小さなプール
+
+    エンジンは貸し出し中は1スレッドだけが使用するため、
+    ワーカースレッドから同時に利用しても安全です。
+    プロセスをまたぐ場合（fork・pickle）はエンジンを共有せず、
+    各プロセスで作り直します。
+    """
+
+    def __init__(self, size: int = 1, factory=None):
+        self.size = max(1, size)
+        self._factory = factory or _create_engine
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._stats = EnginePoolStats()
+
+    def __getstate__(self):
+        return {"size": self.size, "_factory": self._factory}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def _ensure_process(self):
+        # fork後の子プロセスでは親のエンジンやロックを引き継がない
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _build(self):
+        """_reserveで確保した枠でエンジンを生成する（失敗した場合は枠を返して例外を送出する）"""
+        started = time.perf_counter()
+        try:
+            engine = self._factory()
+        except BaseException:
+            with self._lock:
+                self._stats.engines_created -= 1
+            # 空きを待っている貸し出しがあれば、代わりに生成し直せるよう起こす
+            self._idle.put(None)
+            raise
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats.init_seconds += elapsed
+        return engine
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._stats.engines_created >= self.size:
+                return False
+            self._stats.engines_created += 1
+            return True
+
+    def warm_up(self, count: int = 1):
+        """エンジンを事前に生成しておく
+
+        Args:
+            count: 生成しておくエンジン数（プールサイズが上限）
+        """
+        self._ensure_process()
+        for _ in range(min(count, self.size)):
+            if not self._reserve():
+                break
+            self._idle.put(self._build())
+
+    @contextmanager
+    def engine(self):
+        """エンジンを1つ貸し出すコンテキストマネージャ"""
+        self._ensure_process()
+        engine = None
+        while engine is None:
+            # Noneは生成に失敗して枠が空いた知らせのため、もう一度確保を試みる
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                engine = self._build() if self._reserve() else self._idle.get()
+        try:
+            yield engine
+        finally:
+            with self._lock:
+                self._stats.conversions += 1
+            self._idle.put(engine)
+
+    def stats(self) -> EnginePoolStats:
+        with self._lock:
+            return EnginePoolStats(**vars(self._stats))
+
+
+@dataclass
+class MarkdownChunk:
+    """変換結果の一部（PDFの1ページ、XLSXの1シートなど）
+
+    doneは何個目の区切りまで変換したか、totalは区切りの総数です（不明な場合はNone）。
+    """
+    text: str
+    done: int
+    total: int = None
+
+
+def _open_source(file_path, data: bytes = None):
+    """読み込み済みのデータがあればそれを、なければファイルを開く"""
+    return io.BytesIO(data) if data is not None else open(file_path, "rb")
+
+
+def _iter_pdf_pages(file_path, data: bytes = None):
+    """PDFを1ページずつテキストに変換する
+
+    MarkItDownのPDF変換（pdfminerのextract_text）と同じ処理をページ単位で行うため、
+    つなげた結果は一括変換と一致します。dataを渡した場合はファイルを読みません。
+    """
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    with _open_source(file_path, data) as fp, io.StringIO() as output:
+        document = PDFDocument(PDFParser(fp))
+        try:
+            total = int(resolve1(resolve1(document.catalog["Pages"])["Count"]))
+        except Exception:
+            total = None
+        resources = PDFResourceManager(caching=True)
+        device = TextConverter(resources, output, codec="utf-8", laparams=LAParams())
+        interpreter = PDFPageInterpreter(resources, device)
+        for done, page in enumerate(PDFPage.create_pages(document), start=1):
+            interpreter.process_page(page)
+            text = output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+            yield MarkdownChunk(text, done, total)
+
+
+@functools.lru_cache(maxsize=None)
+def _html_converter_class():
+    """MarkItDownがXLSXの表の変換に使うHTML変換器のクラスを返す（使えない場合はNone）
+
+    markitdownの非公開APIのため、バージョンによっては存在しないことがあります。
+    """
+    try:
+        from markitdown._markitdown import HtmlConverter
+    except ImportError:
+        HtmlConverter = None
+    if HtmlConverter is None or not hasattr(HtmlConverter, "_convert"):
+        logger.warning("markitdown %s ではXLSXをシートごとに変換できないため、一括で変換します",
+                       version("markitdown"))
+        return None
+    return HtmlConverter
+
+
+def _iter_xlsx_sheets(file_path, data: bytes = None):
+    """XLSXを1シートずつMarkdownの表に変換する（MarkItDownのXLSX変換と同じ出力）"""
+    import pandas as pd
+
+    html_converter = _html_converter_class()()
+    with _open_source(file_path, data) as fp, pd.ExcelFile(fp) as workbook:
+        names = workbook.sheet_names
+        for done, name in enumerate(names, start=1):
+            table = workbook.parse(name).to_html(index=False)
+            text = f"## {name}\n" + html_converter._convert(table).text_content.strip()
+            # 一括変換では全体の末尾の空白を取り除くため、最後のシートには区切りを付けない
+            if done < len(names):
+                text += "\n\n"
+            yield MarkdownChunk(text, done, len(names))
+
+
+class _StreamingNormalizer:
+    """MarkItDownが変換結果に行う正規化（行末の空白の除去と3行以上の改行の圧縮）を、
+    区切りごとに届くテキストに対して行う"""
+
+    def __init__(self):
+        self._carry = ""
+        self._newlines = 0
+
+    def _emit(self, line: str) -> str:
+        text = "\n" * min(self._newlines, 2) + line
+        self._newlines = 0
+        return text
+
+    def feed(self, text: str) -> str:
+        lines = (self._carry + text).split("\n")
+        # 最後の行は次のチャンクに続く可能性があるため持ち越す
+        self._carry = lines.pop()
+        output = []
+        for line in lines:
+            line = line.rstrip()
+            if line:
+                output.append(self._emit(line))
+            self._newlines += 1
+        return "".join(output)
+
+    def finish(self) -> str:
+        line = self._carry.rstrip()
+        self._carry = ""
+        return self._emit(line)
+
+
+# 区切りごとに変換できる形式
+_CHUNKED_CONVERTERS = {
+    ".pdf": _iter_pdf_pages,
+    ".xlsx": _iter_xlsx_sheets,
+}
+
+
+def _chunked_converter(suffix: str):
+    """区切りごとに変換する関数を返す（一括で変換する形式ではNone）"""
+    if suffix == ".xlsx" and _html_converter_class() is None:
+        return None
+    return _CHUNKED_CONVERTERS.get(suffix)
+
+
+DEFAULT_POOL_SIZE = min(4, os.cpu_count() or 1)
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_engine_pool() -> MarkItDownEnginePool:
+    """プロセス内で共有するエンジンプールを返す"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = MarkItDownEnginePool(size=DEFAULT_POOL_SIZE)
+        return _shared_pool
+
 
 class MarkdownConverter:
+    def __init__(self, pool: MarkItDownEnginePool = None):
+        self.pool = pool or get_engine_pool()
+
+    def warm_up(self):
+        self.pool.warm_up()
+
     def convert(self, file_path):
-        md_converter = MarkItDown()
-        return md_converter.convert(file_path)
\ No newline at end of file
+        with self.pool.engine() as engine:
+            return engine.convert(str(file_path))
+
+    def iter_chunks(self, file_path, data: bytes = None):
+        """ファイルをMarkdownに変換し、区切りごとにMarkdownChunkを返すジェネレータ
+
+        PDFはページごと、XLSXはシートごとに返すため、巨大なファイルでも
+        変換結果全体をメモリに持たずに書き出せます。
+        それ以外の形式は一括で変換し、1つのチャンクとして返します。
+        dataにファイルの内容を渡すと、PDF・XLSXはファイルを読み直さずに変換します
+        （それ以外の形式はMarkItDownがパスから読むため、dataは使いません）。
+        """
+        iter_converter = _chunked_converter(Path(file_path).suffix.lower())
+        if iter_converter is None:
+            yield MarkdownChunk(self.convert(file_path).text_content, 1, 1)
+            return
+        normalizer = _StreamingNormalizer()
+        previous = None
+        for chunk in iter_converter(file_path, data):
+            chunk.text = normalizer.feed(chunk.text)
+            # 正規化で持ち越した末尾は最後のチャンクに付けるため、1つ遅らせて返す
+            if previous is not None:
+                yield previous
+            previous = chunk
+        if previous is None:
+            previous = MarkdownChunk("", 0, 0)
+        previous.text += normalizer.finish()
+        yield previous
+
+    def stats(self) -> EnginePoolStats:
+        return self.pool.stats()
+
+    def fingerprint(self) -> str:
+        """変換結果に影響する変換器のバージョン・オプションを表す文字列"""
+        return f"markitdown={version('markitdown')}"
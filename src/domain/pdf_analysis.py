@@ -0,0 +1,176 @@
+import io
+import logging
+from dataclasses import asdict, dataclass, field
+import pikepdf
+from PIL import Image
+
+from domain.image_recompressor import estimate_jpeg_quality
+
+logger = logging.getLogger(__name__)
+
+# JPEG（optimize=True）の品質ごとの、写真1画素あたりのおおよそのビット数
+_JPEG_BITS_PER_PIXEL = ((5, 0.2), (25, 0.5), (50, 0.8), (75, 1.2), (85, 1.6), (95, 2.8), (100, 5.0))
+# CCITT G4で符号化した白黒2値画像の、非圧縮（1ビット/画素）に対するおおよその比率
+_CCITT_RATIO = 0.1
+# Flateで元の大きさのこの割合未満に縮んでいる画像は線画とみなす（JPEGにはならない）
+_LINE_ART_RATIO = 0.25
+# 圧縮されていないストリーム（テキストのコンテンツなど）をFlateで圧縮した場合に減るおおよその割合
+_FLATE_SAVINGS = 0.6
+
+_COMPONENTS = {"/DeviceGray": 1, "/DeviceRGB": 3, "/DeviceCMYK": 4, "/Indexed": 1}
+
+
+def jpeg_bits_per_pixel(quality: float) -> float:
+    """品質に対する1画素あたりのビット数を、表の値から線形補間で求める"""
+    points = _JPEG_BITS_PER_PIXEL
+    if quality <= points[0][0]:
+        return points[0][1]
+    for (q0, b0), (q1, b1) in zip(points, points[1:]):
+        if quality <= q1:
+            return b0 + (b1 - b0) * (quality - q0) / (q1 - q0)
+    return points[-1][1]
+
+
+def _color_space(xobj):
+    """画像の色空間名と成分数を返す（不明な場合の成分数は3）"""
+    color_space = xobj.get('/ColorSpace')
+    if isinstance(color_space, pikepdf.Array) and len(color_space) > 0:
+        name = str(color_space[0])
+        if name == '/ICCBased':
+            return name, int(color_space[1].get('/N', 3))
+        return name, _COMPONENTS.get(name, 3)
+    name = None if color_space is None else str(color_space)
+    return name, _COMPONENTS.get(name, 3)
+
+
+@dataclass
+class ImageInfo:
+    """PDF内の画像1件の情報と、再圧縮後のサイズの見積もり"""
+    name: str
+    filter: str
+    width: int
+    height: int
+    bits_per_component: int
+    color_space: str
+    components: int
+    bytes: int
+    pages: list = field(default_factory=list)
+    recompressible: bool = True
+    jpeg_quality: int = None  # DCT画像の場合、量子化テーブルから推定した元の品質
+    effective_dpi: float = None
+    estimated_bytes: int = 0  # 再圧縮後の推定サイズ（置き換えない画像は元のサイズ）
+
+    @property
+    def estimated_savings(self) -> int:
+        return self.bytes - self.estimated_bytes
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "estimated_savings": self.estimated_savings}
+
+
+def describe_image(job, filter_name: str, recompressible: bool) -> ImageInfo:
+    """画像XObjectの辞書から情報を集める（画像はデコードせず、JPEGはヘッダーだけを読む）"""
+    xobj = job.xobj
+    color_space, components = _color_space(xobj)
+    info = ImageInfo(
+        name=job.name,
+        filter=filter_name,
+        width=int(xobj.get('/Width', 0)),
+        height=int(xobj.get('/Height', 0)),
+        bits_per_component=1 if xobj.get('/ImageMask') else int(xobj.get('/BitsPerComponent', 8)),
+        color_space=color_space,
+        components=components,
+        bytes=job.original_size,
+        pages=list(job.pages),
+        recompressible=recompressible,
+        effective_dpi=job.effective_dpi(),
+    )
+    if recompressible and filter_name == '/DCTDecode':
+        try:
+            with Image.open(io.BytesIO(xobj.read_raw_bytes())) as img:
+                info.jpeg_quality = estimate_jpeg_quality(img)
+        except Exception as e:
+            logger.debug("JPEGのヘッダーを読めません: %s (%s)", job.name, e)
+    return info
+
+
+def estimate_recompressed_size(info: ImageInfo, quality: int, scale: float = 1.0) -> int:
+    """recompress_imageで再エンコードした場合のサイズを、画像をデコードせずに見積もる
+
+    recompress_imageと同じく、元より小さくならない画像は元のサイズとします。
+    """
+    if not info.recompressible or not (info.width and info.height):
+        return info.bytes
+    pixels = info.width * info.height * scale * scale
+    if info.bits_per_component == 1:
+        if info.filter == '/CCITTFaxDecode' and scale >= 1.0:
+            return info.bytes
+        estimate = pixels / 8 * _CCITT_RATIO
+    elif info.filter == '/DCTDecode':
+        if info.jpeg_quality is None or (scale >= 1.0 and info.jpeg_quality <= quality):
+            return info.bytes
+        estimate = info.bytes * scale * scale * jpeg_bits_per_pixel(quality) / jpeg_bits_per_pixel(info.jpeg_quality)
+    else:
+        raw = info.width * info.height * info.components * info.bits_per_component / 8
+        if info.color_space == '/Indexed' or info.bytes < raw * _LINE_ART_RATIO:
+            # 線画はパレット + Flateのまま。縮小した場合は画素数に比例して小さくなる
+            estimate = info.bytes * scale * scale
+        else:
+            estimate = pixels * jpeg_bits_per_pixel(quality) / 8
+    return min(info.bytes, int(estimate))
+
+
+def estimate_stream_savings(pdf) -> int:
+    """圧縮されていない画像以外のストリームを、保存時にFlateで圧縮することで減るバイト数を見積もる
+
+    XMPメタデータはほかのツールが読めるよう、保存時にも圧縮されないため含めません。
+    """
+    savings = 0
+    for obj in pdf.objects:
+        if not isinstance(obj, pikepdf.Stream) or '/Filter' in obj or obj.get('/Subtype') == '/Image':
+            continue
+        if obj.get('/Type') == '/Metadata':
+            continue
+        savings += int(int(obj.get('/Length', 0)) * _FLATE_SAVINGS)
+    return savings
+
+
+@dataclass
+class PdfAnalysis:
+    """PDFの画像の一覧と、再圧縮した場合の削減量の見積もり"""
+    input_path: str
+    file_size: int = 0
+    pages: int = 0
+    quality: int = None  # 見積もりに使ったJPEGの品質
+    image_references: int = 0
+    images: list = field(default_factory=list)
+    stream_savings: int = 0
+    optimize_savings: int = 0  # 最大圧縮の保存で、重複フォントとメタデータを取り除いて減るバイト数
+    duration_seconds: float = 0.0
+    error: str = None
+
+    @property
+    def image_bytes(self) -> int:
+        return sum(image.bytes for image in self.images)
+
+    @property
+    def estimated_savings(self) -> int:
+        return sum(image.estimated_savings for image in self.images) + self.stream_savings + self.optimize_savings
+
+    @property
+    def estimated_size(self) -> int:
+        return max(0, self.file_size - self.estimated_savings)
+
+    def worth_compressing(self, min_savings_ratio: float) -> bool:
+        """見積もった削減量が、ファイルサイズのmin_savings_ratio倍を超えるか"""
+        return self.estimated_savings > 0 and self.estimated_savings >= self.file_size * min_savings_ratio
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["images"] = [image.to_dict() for image in self.images]
+        data.update(
+            image_bytes=self.image_bytes,
+            estimated_savings=self.estimated_savings,
+            estimated_size=self.estimated_size,
+        )
+        return data
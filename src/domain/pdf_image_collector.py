@@ -0,0 +1,150 @@
+import logging
+import math
+from dataclasses import dataclass, field
+import pikepdf
+
+logger = logging.getLogger(__name__)
+
+_IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def _multiply(m, n):
+    """PDFの変換行列 m × n を計算する"""
+    return (
+        m[0] * n[0] + m[1] * n[2],
+        m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2],
+        m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4],
+        m[4] * n[1] + m[5] * n[3] + n[5],
+    )
+
+
+@dataclass
+class ImageJob:
+    """PDF内の画像1件（再圧縮の単位）
+
+    複数のページ（やForm XObject）から参照される画像も1件にまとめ、
+    参照しているページ番号（1始まり）をpagesに保持します。
+    placed_width・placed_heightはページ上に配置された最大の大きさ（ポイント）です。
+    """
+    name: str
+    xobj: object
+    objgen: tuple
+    pages: list = field(default_factory=list)
+    original_size: int = 0
+    placed_width: float = 0.0
+    placed_height: float = 0.0
+
+    def effective_dpi(self):
+        """最も大きく配置された箇所での実効解像度（配置が不明な場合はNone）"""
+        if not (self.placed_width and self.placed_height):
+            return None
+        return min(
+            int(self.xobj.Width) / (self.placed_width / 72),
+            int(self.xobj.Height) / (self.placed_height / 72),
+        )
+
+
+class PdfImageCollector:
+    """PDFのページから画像XObjectを重複なく収集するクラス
+
+    画像はオブジェクト番号・世代番号（objgen）で識別するため、
+    共有されたロゴや背景画像は何ページから参照されていても1回だけ処理されます。
+    Form XObjectの中に置かれた画像もたどります。
+    """
+
+    def __init__(self, accept=None):
+        """
+        Args:
+            accept: 画像XObjectを受け取り、再圧縮の対象にするかを返す関数（Noneの場合はすべて対象）
+        """
+        self.accept = accept or (lambda xobj: True)
+        self.images = []
+        self.jobs = []
+        self.references = 0
+        self._seen = {}
+
+    @property
+    def unique_images(self) -> int:
+        return len(self.images)
+
+    def add_page(self, page, page_number: int, track_placement: bool = False):
+        """ページから参照されている画像を収集する
+
+        Args:
+            page: pikepdfのページ
+            page_number: ページ番号（1始まり）
+            track_placement: コンテンツストリームを解析して画像の配置サイズを記録するか
+        """
+        resources = getattr(page, 'Resources', None)
+        self._walk(resources, page_number, set())
+        if track_placement and resources is not None:
+            try:
+                self._track_placements(page, resources, _IDENTITY, set())
+            except Exception as e:
+                logger.warning("ページ %d の画像配置の解析をスキップ: %s", page_number, e)
+
+    def _track_placements(self, content, resources, ctm, forms_in_path: set):
+        """コンテンツストリームの q/Q/cm/Do を追い、画像の配置サイズを記録する"""
+        stack = []
+        for operands, operator in pikepdf.parse_content_stream(content, "q Q cm Do"):
+            op = str(operator)
+            if op == "q":
+                stack.append(ctm)
+            elif op == "Q":
+                ctm = stack.pop() if stack else ctm
+            elif op == "cm":
+                ctm = _multiply([float(x) for x in operands], ctm)
+            elif op == "Do" and '/XObject' in resources:
+                xobj = resources.XObject.get(operands[0])
+                if xobj is None:
+                    continue
+                subtype = xobj.get('/Subtype')
+                if subtype == '/Image':
+                    image = self._seen.get(xobj.objgen)
+                    if image is not None:
+                        image.placed_width = max(image.placed_width, math.hypot(ctm[0], ctm[1]))
+                        image.placed_height = max(image.placed_height, math.hypot(ctm[2], ctm[3]))
+                elif subtype == '/Form' and xobj.objgen not in forms_in_path:
+                    matrix = [float(x) for x in xobj.get('/Matrix', _IDENTITY)]
+                    self._track_placements(
+                        xobj,
+                        xobj.get('/Resources', resources),
+                        _multiply(matrix, ctm),
+                        forms_in_path | {xobj.objgen},
+                    )
+
+    def _walk(self, resources, page_number: int, forms_in_path: set):
+        if resources is None or '/XObject' not in resources:
+            return
+        for name, xobj in resources.XObject.items():
+            try:
+                subtype = xobj.get('/Subtype')
+                if subtype == '/Image':
+                    self._add_image(str(name), xobj, page_number)
+                elif subtype == '/Form':
+                    # 自分自身を参照するFormで無限に再帰しないようにする
+                    if xobj.objgen in forms_in_path:
+                        continue
+                    self._walk(xobj.get('/Resources'), page_number, forms_in_path | {xobj.objgen})
+            except Exception as e:
+                logger.warning("XObjectの処理をスキップ: %s", e)
+
+    def _add_image(self, name: str, xobj, page_number: int):
+        self.references += 1
+        key = xobj.objgen
+        if key in self._seen:
+            image = self._seen[key]
+            if page_number not in image.pages:
+                image.pages.append(page_number)
+            return
+
+        logger.debug("画像を検出: %s %s", name, key)
+        # 圧縮済みデータの長さは/Lengthから取り、ストリームの読み込みを避ける
+        size = int(xobj.get('/Length', 0)) or len(xobj.read_raw_bytes())
+        image = ImageJob(name=name, xobj=xobj, objgen=key, pages=[page_number], original_size=size)
+        self._seen[key] = image
+        self.images.append(image)
+        if self.accept(xobj):
+            self.jobs.append(image)
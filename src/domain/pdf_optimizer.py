@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import pikepdf
+
+logger = logging.getLogger(__name__)
+
+# フォントプログラムを格納するFontDescriptorのキー（Type1・TrueType・CFF/OpenType）
+FONT_FILE_KEYS = ('/FontFile', '/FontFile2', '/FontFile3')
+
+
+def _iter_resources(pdf):
+    """ページと、そこから参照されるForm XObjectのリソース辞書を重複なく返す"""
+    seen = set()
+    stack = [page.obj.get('/Resources') for page in pdf.pages]
+    while stack:
+        resources = stack.pop()
+        if not isinstance(resources, pikepdf.Dictionary):
+            continue
+        if resources.is_indirect:
+            if resources.objgen in seen:
+                continue
+            seen.add(resources.objgen)
+        yield resources
+        xobjects = resources.get('/XObject')
+        if isinstance(xobjects, pikepdf.Dictionary):
+            for _, xobj in xobjects.items():
+                if isinstance(xobj, pikepdf.Stream) and xobj.get('/Subtype') == '/Form':
+                    stack.append(xobj.get('/Resources'))
+
+
+def iter_font_descriptors(pdf):
+    """使われているフォントのFontDescriptorを重複なく返す（Type0の子孫フォントも含む）"""
+    seen = set()
+    for resources in _iter_resources(pdf):
+        fonts = resources.get('/Font')
+        if not isinstance(fonts, pikepdf.Dictionary):
+            continue
+        stack = [font for _, font in fonts.items()]
+        while stack:
+            font = stack.pop()
+            if not isinstance(font, pikepdf.Dictionary):
+                continue
+            stack.extend(font.get('/DescendantFonts') or [])
+            descriptor = font.get('/FontDescriptor')
+            if not isinstance(descriptor, pikepdf.Dictionary):
+                continue
+            key = descriptor.objgen if descriptor.is_indirect else id(descriptor)
+            if key not in seen:
+                seen.add(key)
+                yield descriptor
+
+
+def _iter_font_programs(pdf):
+    """使われている埋め込みフォントプログラムを、(FontDescriptor, キー, ストリーム, 内容のダイジェスト)として返す"""
+    for descriptor in iter_font_descriptors(pdf):
+        for key in FONT_FILE_KEYS:
+            stream = descriptor.get(key)
+            if not isinstance(stream, pikepdf.Stream):
+                continue
+            digest = hashlib.sha256()
+            digest.update(key.encode())
+            # 長さ以外の辞書（フィルタ・Length1などの指定）も同じものだけをまとめる
+            for name in sorted(k for k in stream.keys() if k != '/Length'):
+                digest.update(name.encode() + pikepdf.Array([stream.stream_dict[name]]).unparse(resolved=True))
+            digest.update(stream.read_raw_bytes())
+            yield descriptor, key, stream, digest.digest()
+
+
+def duplicate_font_bytes(pdf) -> int:
+    """dedupe_font_programsでまとめられる重複したフォントプログラムのバイト数を、PDFを変更せずに求める"""
+    seen = {}
+    duplicate = 0
+    for _, _, stream, digest in _iter_font_programs(pdf):
+        if seen.setdefault(digest, stream.objgen) != stream.objgen:
+            duplicate += len(stream.read_raw_bytes())
+    return duplicate
+
+
+def metadata_bytes(pdf) -> int:
+    """strip_metadataで取り除かれるXMPメタデータのストリームのバイト数"""
+    total = 0
+    for obj in [pdf.Root] + [page.obj for page in pdf.pages]:
+        metadata = obj.get('/Metadata')
+        if isinstance(metadata, pikepdf.Stream):
+            total += len(metadata.read_raw_bytes())
+    return total
+
+
+def dedupe_font_programs(pdf) -> int:
+    """同じ内容の埋め込みフォントプログラムを1つのストリームにまとめる
+
+    結合した複数のPDFに同じフォントが何度も埋め込まれている場合に効果があります。
+    FontDescriptorの参照先を最初に見つかった同じ内容のストリームに付け替えるだけのため、
+    フォントの辞書や表示は変わりません。参照されなくなったストリームは保存時に書き出されません。
+
+    Returns:
+        付け替えたフォントプログラムの数
+    """
+    canonical = {}
+    merged = 0
+    # 付け替えで辞書が変わるため、先にすべてのフォントプログラムを集めておく
+    for descriptor, key, stream, digest in list(_iter_font_programs(pdf)):
+        original = canonical.setdefault(digest, stream)
+        if original.objgen != stream.objgen:
+            descriptor[key] = original
+            merged += 1
+    if merged:
+        logger.info("重複したフォントプログラムをまとめました: %d件", merged)
+    return merged
+
+
+def strip_metadata(pdf) -> bool:
+    """文書情報辞書・XMPメタデータ・アプリ固有のデータ（PieceInfo）を取り除く
+
+    Returns:
+        取り除いたものがあればTrue
+    """
+    removed = False
+    if '/Info' in pdf.trailer:
+        del pdf.trailer['/Info']
+        removed = True
+    for obj in [pdf.Root] + [page.obj for page in pdf.pages]:
+        for key in ('/Metadata', '/PieceInfo'):
+            if key in obj:
+                del obj[key]
+                removed = True
+    return removed
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "markdown-flet-app" / "conversions"
+
+
+class ConversionCache:
+    """変換結果をディスクに保存するコンテンツアドレス型キャッシュ
+
+    キーは入力ファイルの内容と変換器のバージョン・オプション（namespace）のハッシュです。
+    ファイルパスごとにmtimeとサイズも記録しておき、変更のないファイルは
+    内容を読まずにキャッシュを引けるようにしています。
+    合計サイズがmax_bytesを超えると、最後に使われた時刻が古いものから削除します。
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache_dir=None, max_bytes: int = 512 * 1024 * 1024, namespace: str = ""):
+        """
+        Args:
+            cache_dir: キャッシュの保存先（Noneの場合はユーザーのキャッシュディレクトリ）
+            max_bytes: キャッシュ全体の上限サイズ（バイト）
+            namespace: キーに含める変換器のバージョン・オプション
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.cache_dir / "index.sqlite3", check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sources "
+                "(path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, key TEXT NOT NULL)"
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _blob_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.md"
+
+    def _digest(self):
+        digest = hashlib.sha256(self.namespace.encode("utf-8"))
+        digest.update(b"\0")
+        return digest
+
+    def key_for_file(self, file_path) -> str:
+        """ファイル内容とnamespaceからキャッシュキーを計算する"""
+        digest = self._digest()
+        with open(file_path, "rb") as f:
+            while chunk := f.read(self.CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def key_for_bytes(self, data: bytes) -> str:
+        """読み込み済みのファイル内容からキャッシュキーを計算する（key_for_fileと同じキーになる）"""
+        digest = self._digest()
+        digest.update(data)
+        return digest.hexdigest()
+
+    def lookup_by_stat(self, file_path, stat: os.stat_result = None):
+        """mtimeとサイズが前回と同じであれば、内容を読まずにキーを返す"""
+        stat = stat or os.stat(file_path)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT s.key FROM sources s JOIN entries e ON e.key = s.key "
+                "WHERE s.path = ? AND s.mtime_ns = ? AND s.size = ?",
+                (str(Path(file_path).resolve()), stat.st_mtime_ns, stat.st_size),
+            ).fetchone()
+        return row[0] if row else None
+
+    def get(self, key: str):
+        """キャッシュされたMarkdownを返す（存在しない場合はNone）"""
+        try:
+            content = self._blob_path(key).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            with self._lock, self._db:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        with self._lock, self._db:
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return content
+
+    def put(self, key: str, content: str):
+        """変換結果を保存し、上限を超えた分を古い順に削除する"""
+        data = content.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        self._store(key, len(data), lambda temp_path: temp_path.write_bytes(data))
+
+    def put_file(self, key: str, file_path):
+        """書き出し済みの変換結果のファイルを、内容をメモリに読み込まずに保存する"""
+        size = os.path.getsize(file_path)
+        if size > self.max_bytes:
+            return
+        self._store(key, size, lambda temp_path: shutil.copyfile(file_path, temp_path))
+
+    def _store(self, key: str, size: int, write):
+        blob_path = self._blob_path(key)
+        blob_path.parent.mkdir(exist_ok=True)
+        temp_path = blob_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        write(temp_path)
+        os.replace(temp_path, blob_path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                (key, size, time.time()),
+            )
+            self._evict()
+
+    def remember_source(self, file_path, key: str, stat: os.stat_result = None):
+        """ファイルパスとキーの対応をmtime・サイズと共に記録する"""
+        stat = stat or os.stat(file_path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sources (path, mtime_ns, size, key) VALUES (?, ?, ?, ?)",
+                (str(Path(file_path).resolve()), stat.st_mtime_ns, stat.st_size, key),
+            )
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.execute("DELETE FROM sources WHERE key = ?", (key,))
+            self._blob_path(key).unlink(missing_ok=True)
+            total -= size
+            if total <= self.max_bytes:
+                break
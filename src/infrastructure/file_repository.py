@@ -1,6 +1,59 @@
+import os
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+
 import aiofiles
 
+
+def _temp_path(file_path: Path) -> Path:
+    # 同じディレクトリに作り、置き換えがアトミックに行えるようにする
+    # （同じスレッドの複数のコルーチンが同じ出力先に書いても衝突しないよう、書き込みごとに名前を変える）
+    return file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.tmp")
+
+
 class FileRepository:
+    """変換結果をファイルに書き出すクラス
+
+    書き込みは同じディレクトリの一時ファイルに行い、すべて書き終えてから
+    出力先に置き換えます。途中で失敗しても出力先に書きかけのファイルは残りません。
+    """
+
     async def write_content(self, file_path, content):
-        async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
-            await f.write(content)
\ No newline at end of file
+        async with self.open_atomic(file_path) as f:
+            await f.write(content)
+
+    async def write_chunks(self, file_path, chunks) -> int:
+        """非同期イテレータから届く文字列を順に書き出し、書き込んだバイト数を返す"""
+        written = 0
+        async with self.open_atomic(file_path) as f:
+            async for chunk in chunks:
+                await f.write(chunk)
+                written += len(chunk.encode('utf-8'))
+        return written
+
+    @asynccontextmanager
+    async def open_atomic(self, file_path):
+        """一時ファイルを開き、正常に閉じた場合だけ出力先に置き換える"""
+        file_path = Path(file_path)
+        temp_path = _temp_path(file_path)
+        try:
+            async with aiofiles.open(temp_path, 'w', encoding='utf-8') as f:
+                yield f
+            os.replace(temp_path, file_path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    @contextmanager
+    def open_atomic_sync(self, file_path):
+        """open_atomicの同期版（ワーカープロセス内など、イベントループのない場所で使う）"""
+        file_path = Path(file_path)
+        temp_path = _temp_path(file_path)
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                yield f
+            os.replace(temp_path, file_path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
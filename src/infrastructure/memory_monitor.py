@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def current_rss():
+    """このプロセスの現在の常駐メモリ量（バイト）を返す（取得できない場合はNone）
+
+    Linuxでは/procから現在値を読みます。
+    それ以外のOSではこれまでの最大値で代用します。
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    return peak_rss()
+
+
+def peak_rss():
+    """このプロセスの常駐メモリ量の最大値（バイト）を返す（取得できない場合はNone）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト、Linuxはキロバイト単位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryMonitor:
+    """処理中の常駐メモリ量を一定間隔で計測し、最大値を記録するクラス
+
+    with文で囲んだ区間の最大値がpeak_bytesに入ります。
+    計測できない環境ではpeak_bytesはNoneのままです。
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_bytes = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        """現在の値を計測して最大値を更新し、現在の値を返す"""
+        rss = current_rss()
+        if rss is not None and (self.peak_bytes is None or rss > self.peak_bytes):
+            self.peak_bytes = rss
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+        return False
@@ -0,0 +1,140 @@
+import contextlib
+import json
+import threading
+import time
+from collections import deque
+
+
+class JobMetrics:
+    """1件の処理（1ファイルの変換・圧縮）のステージごとの時間とカウンタ
+
+    ワーカーで並列に処理するステージ（画像のデコード・エンコードなど）は
+    各画像の時間の合計のため、ファイル全体の経過時間を超えることがあります。
+    """
+    enabled = True
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.stages = {}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """with文で囲んだ区間の時間をステージに加算する"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "name": self.name, "stages": dict(self.stages), "counters": dict(self.counters)}
+
+
+class _NullJobMetrics(JobMetrics):
+    """計測しない場合のJobMetrics（何も記録せず、ほとんど時間を使わない）"""
+    enabled = False
+    _stage = contextlib.nullcontext()
+
+    def __init__(self):
+        super().__init__("", "")
+
+    def stage(self, name: str):
+        return self._stage
+
+    def add_time(self, name: str, seconds: float):
+        pass
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def to_dict(self):
+        return None
+
+
+NULL_METRICS = _NullJobMetrics()
+
+
+class MetricsRecorder:
+    """ジョブごとの計測結果を集め、JSON Linesへの書き出しと直近の集計を行うクラス"""
+    enabled = True
+
+    def __init__(self, path=None, window: int = 500):
+        """
+        Args:
+            path: ジョブごとの計測結果を1行ずつ追記するファイル（Noneの場合は書き出さない）
+            window: 集計に使う直近のジョブ数
+        """
+        self.path = path
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def job(self, kind: str, name: str) -> JobMetrics:
+        """1件分の計測を始める"""
+        return JobMetrics(kind, name)
+
+    def record(self, metrics):
+        """1件分の計測結果（JobMetrics、またはワーカーから届いたその辞書）を記録する"""
+        data = metrics.to_dict() if isinstance(metrics, JobMetrics) else metrics
+        if data is None:
+            return
+        with self._lock:
+            self._recent.append(data)
+            if self.path is not None:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+    def recent(self) -> list:
+        with self._lock:
+            return list(self._recent)
+
+    def summary(self) -> dict:
+        """直近のジョブを種類ごとに集計する
+
+        Returns:
+            種類 -> {"jobs": 件数, "stages": {ステージ: {"total", "mean", "share"}}, "counters": 合計}
+            shareはステージ時間の合計に占める割合で、どのステージが支配的かを示します。
+        """
+        by_kind = {}
+        for data in self.recent():
+            kind = by_kind.setdefault(data["kind"], {"jobs": 0, "stages": {}, "counters": {}})
+            kind["jobs"] += 1
+            for name, seconds in data["stages"].items():
+                kind["stages"][name] = kind["stages"].get(name, 0.0) + seconds
+            for name, value in data["counters"].items():
+                kind["counters"][name] = kind["counters"].get(name, 0) + value
+        for kind in by_kind.values():
+            total = sum(kind["stages"].values())
+            kind["stages"] = {
+                name: {
+                    "total": seconds,
+                    "mean": seconds / kind["jobs"],
+                    "share": seconds / total if total else 0.0,
+                }
+                for name, seconds in sorted(kind["stages"].items(), key=lambda item: -item[1])
+            }
+        return by_kind
+
+
+class _NullRecorder(MetricsRecorder):
+    """計測しない場合のMetricsRecorder"""
+    enabled = False
+
+    def __init__(self):
+        super().__init__(window=0)
+
+    def job(self, kind: str, name: str) -> JobMetrics:
+        return NULL_METRICS
+
+    def record(self, metrics):
+        pass
+
+
+NULL_RECORDER = _NullRecorder()
@@ -0,0 +1,91 @@
+import importlib
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ウィンドウの表示後にバックグラウンドで読み込む重いモジュール
+HEAVY_MODULES = ("markitdown", "pikepdf", "PIL.Image")
+
+
+class StartupTimer:
+    """起動の各段階までの経過時間と、モジュールごとの読み込み時間を記録するクラス
+
+    markには開始からの経過秒数、importsにはimport_moduleで読み込んだモジュールの
+    読み込み秒数が入ります（すでに読み込まれていたモジュールは記録しません）。
+    """
+
+    def __init__(self, started: float = None, clock=time.perf_counter):
+        """
+        Args:
+            started: 計測の起点（clockの値）。Noneの場合は作成した時点
+            clock: 時刻の取得に使う関数
+        """
+        self.clock = clock
+        self.started = clock() if started is None else started
+        self.marks = {}
+        self.imports = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name: str) -> float:
+        """起点からの経過時間を名前を付けて記録し、その秒数を返す"""
+        elapsed = self.clock() - self.started
+        with self._lock:
+            self.marks[name] = elapsed
+        logger.info("起動: %s %.3f秒", name, elapsed)
+        return elapsed
+
+    def import_module(self, name: str):
+        """モジュールを読み込み、初めて読み込んだ場合はかかった時間を記録する"""
+        loaded = name in sys.modules
+        started = self.clock()
+        module = importlib.import_module(name)
+        if not loaded:
+            with self._lock:
+                self.imports[name] = self.clock() - started
+        return module
+
+    def warm_up(self, modules=HEAVY_MODULES):
+        """重いモジュールを読み込んでおく（ウィンドウの表示後に別スレッドで呼ぶ）"""
+        for name in modules:
+            try:
+                self.import_module(name)
+            except ImportError as e:
+                logger.warning("モジュールの事前読み込みをスキップ: %s (%s)", name, e)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"marks": dict(self.marks), "imports": dict(self.imports)}
+
+    def write(self, path):
+        """計測結果をJSONの1行として追記する（起動ごとの推移を追えるようにする）"""
+        record = {"timestamp": time.time(), **self.to_dict()}
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def cold_import_times(modules, python: str = None, cwd=None) -> dict:
+    """各モジュールを新しいプロセスで読み込み、他のモジュールの影響を受けない読み込み時間を測る
+
+    Returns:
+        モジュール名 -> 読み込み秒数（読み込めなかったモジュールはNone）
+    """
+    code = (
+        "import importlib, sys, time; started = time.perf_counter(); "
+        "importlib.import_module(sys.argv[1]); print(time.perf_counter() - started)"
+    )
+    times = {}
+    for name in modules:
+        completed = subprocess.run(
+            [python or sys.executable, "-c", code, name], cwd=cwd, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            logger.warning("モジュールを読み込めません: %s", name)
+            times[name] = None
+            continue
+        times[name] = float(completed.stdout.strip().splitlines()[-1])
+    return times
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from infrastructure.conversion_cache import default_cache_dir
+
+
+def default_index_path() -> Path:
+    return default_cache_dir().parent / "watch.sqlite3"
+
+
+def file_digest(file_path, chunk_size: int = 1024 * 1024) -> str:
+    """ファイル内容のSHA-256を返す"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class WatchIndex:
+    """監視フォルダで処理済みのファイルを記録するインデックス
+
+    ファイルごとにmtime・サイズ・内容のハッシュと処理結果を保存し、
+    再起動後も変更のないファイルを処理し直さないようにします。
+    """
+
+    def __init__(self, index_path=None):
+        """
+        Args:
+            index_path: インデックスの保存先（Noneの場合はユーザーのキャッシュディレクトリ）
+        """
+        self.index_path = Path(index_path) if index_path else default_index_path()
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files "
+                "(path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, "
+                "digest TEXT NOT NULL, state TEXT NOT NULL, processed_at REAL NOT NULL)"
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _row(self, file_path):
+        with self._lock:
+            return self._db.execute(
+                "SELECT mtime_ns, size, digest, state FROM files WHERE path = ?",
+                (str(Path(file_path).resolve()),),
+            ).fetchone()
+
+    def is_current(self, file_path, stat: os.stat_result) -> bool:
+        """mtimeとサイズが前回処理した時と同じか"""
+        row = self._row(file_path)
+        return row is not None and (row[0], row[1]) == (stat.st_mtime_ns, stat.st_size)
+
+    def digest_matches(self, file_path, digest: str) -> bool:
+        """内容が前回処理した時と同じか（mtimeだけが変わった場合の判定に使う）"""
+        row = self._row(file_path)
+        return row is not None and row[2] == digest
+
+    def record(self, file_path, stat: os.stat_result, digest: str, state: str):
+        """処理したファイルの状態と結果を記録する"""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (path, mtime_ns, size, digest, state, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(Path(file_path).resolve()), stat.st_mtime_ns, stat.st_size, digest, state, time.time()),
+            )
+
+    def touch(self, file_path, stat: os.stat_result):
+        """内容が変わっていないファイルのmtime・サイズだけを更新する"""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                (stat.st_mtime_ns, stat.st_size, str(Path(file_path).resolve())),
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
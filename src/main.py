@@ -1,9 +1,35 @@
+import time
+
+# 起動時間の起点（Fletや各モジュールの読み込み時間も含めて計測する）
+STARTED = time.perf_counter()
+
 import flet as ft
-import asyncio
+import logging
+import multiprocessing
+import os
+import threading
 from application.conversion_service import ConversionService
-from application.pdf_compression_service import PDFCompressionService
+from application.job_scheduler import JobScheduler
+from application.progress import ThrottledProgress
+from application.pdf_compression_service import (
+    DEFAULT_MIN_SAVINGS_RATIO, DEFAULT_SAVE_PROFILE, PDFCompressionService,
+)
+from application.pdf_pipeline import PdfPipeline
+from infrastructure.conversion_cache import ConversionCache
+from infrastructure.metrics import MetricsRecorder
+from infrastructure.startup_timer import StartupTimer
+from presentation.compression_status import FletCompressionProgress
+from presentation.control_updater import ControlUpdater
+from presentation.conversion_status import FletConversionProgress
+from presentation.job_status import FletJobStatus
+
+logger = logging.getLogger(__name__)
+startup = StartupTimer(started=STARTED)
+startup.mark("imports")
+
 
 def main(page: ft.Page):
+    startup.mark("page_ready")
     page.title = "Markdown & PDF Converter"
     page.theme_mode = "light"
     page.padding = 0
@@ -16,13 +42,18 @@ def main(page: ft.Page):
     total_progress = ft.ProgressBar(width=400, color="#1a73e8", visible=False)
     total_status = ft.Text(color="#1a73e8")
 
-    conversion_service = ConversionService()
+    # PIPELINE_METRICSにファイルを指定すると、ファイルごとのステージ別の計測結果を追記する
+    metrics = MetricsRecorder(os.environ["PIPELINE_METRICS"]) if os.environ.get("PIPELINE_METRICS") else None
+
+    conversion_service = ConversionService(cache=ConversionCache(), metrics=metrics)
 
     pdf_file_picker = ft.FilePicker()
     page.overlay.append(pdf_file_picker)
     
     pdf_status = ft.Text(color="#1a73e8")
     pdf_progress = ft.ProgressBar(width=400, color="#1a73e8", visible=False)
+    # 複数のPDFを圧縮する場合のファイルごとの状態
+    pdf_status_container = ft.Column([], scroll=ft.ScrollMode.AUTO, height=200, visible=False)
     
     compression_value_text = ft.Text(
         value="75%",
@@ -46,25 +77,126 @@ def main(page: ft.Page):
         on_change=on_slider_change
     )
 
-    pdf_compression_service = PDFCompressionService()
+    # 入力した場合は圧縮率の代わりに、このサイズに収まる最も高い品質で圧縮する
+    pdf_target_size = ft.TextField(
+        label="目標サイズ（MB）",
+        hint_text="例: 10",
+        width=200,
+        keyboard_type=ft.KeyboardType.NUMBER,
+    )
+
+    pdf_low_memory = ft.Checkbox(label="省メモリモード（数GBのPDF向け）", value=False)
+    pdf_also_convert = ft.Checkbox(label="Markdownにも変換する（PDFの読み込みは1回）", value=False)
+
+    pdf_target_dpi = ft.Dropdown(
+        label="画像の解像度上限",
+        width=200,
+        value="none",
+        options=[
+            ft.dropdown.Option("none", "縮小しない"),
+            ft.dropdown.Option("300", "300 dpi"),
+            ft.dropdown.Option("150", "150 dpi"),
+            ft.dropdown.Option("96", "96 dpi"),
+        ],
+    )
+
+    pdf_save_profile = ft.Dropdown(
+        label="保存方法",
+        width=200,
+        value=DEFAULT_SAVE_PROFILE,
+        options=[
+            ft.dropdown.Option("fast", "速度優先"),
+            ft.dropdown.Option("balanced", "標準"),
+            ft.dropdown.Option("maximum", "サイズ優先"),
+        ],
+    )
+
+    # 複数のPDFはファイルごとにプロセスで並列に圧縮し、大きなPDFが重なる場合は同時実行数を抑える
+    pdf_compression_service = PDFCompressionService(
+        memory_limit_mb=2048, metrics=metrics, min_savings_ratio=DEFAULT_MIN_SAVINGS_RATIO
+    )
+
+    # 圧縮と変換の両方を行う場合は、PDFを1回だけ読み込んで2つの処理を同時に実行する
+    pdf_pipeline = PdfPipeline(pdf_compression_service, conversion_service)
+
+    # 進捗の表示はまとめて最大10回/秒だけクライアントに送る
+    updater = ControlUpdater(fps=10)
+
+    # 変換・圧縮はスケジューラのスレッドで実行し、イベントハンドラはすぐに戻す
+    # 同じ種類のジョブは表示欄を共有するため1件ずつ実行し、後から選んだものは待ち行列に入れる
+    scheduler = JobScheduler(max_concurrent=2, limits={"convert": 1, "compress": 1})
+    job_status = ft.Text(color="#757575", size=14)
+    cancel_button = ft.TextButton(
+        "キャンセル",
+        icon=ft.Icons.CANCEL,
+        visible=False,
+        on_click=lambda _: scheduler.cancel_all()
+    )
+    scheduler.listener = FletJobStatus(scheduler, job_status, cancel_button, updater)
 
     def pick_files_result(e: ft.FilePickerResultEvent):
         if e.files:
-            asyncio.run(conversion_service.process_files(e.files, status_container, total_progress, total_status))
+            files = list(e.files)
+            scheduler.submit(
+                "convert",
+                f"{len(files)}件のファイル",
+                lambda listener: conversion_service.process_files(files, listener),
+                ThrottledProgress(FletConversionProgress(status_container, total_progress, total_status, updater))
+            )
 
     file_picker.on_result = pick_files_result
 
     def pick_pdf_result(e: ft.FilePickerResultEvent):
         if e.files:
-            asyncio.run(pdf_compression_service.compress_pdf(
-                e.files[0], 
-                pdf_status, 
-                pdf_progress,
-                compression_ratio=pdf_compression_ratio.value
-            ))
+            files = list(e.files)
+            # 設定は投入した時点の値を使う
+            compression_ratio = pdf_compression_ratio.value
+            target_dpi = None if pdf_target_dpi.value == "none" else float(pdf_target_dpi.value)
+            low_memory = bool(pdf_low_memory.value)
+            save_profile = pdf_save_profile.value or DEFAULT_SAVE_PROFILE
+            also_convert = bool(pdf_also_convert.value)
+            try:
+                target_size_mb = float(pdf_target_size.value) if pdf_target_size.value else None
+            except ValueError:
+                target_size_mb = None
+            if target_size_mb is not None and target_size_mb <= 0:
+                target_size_mb = None
+
+            def run(listener):
+                # 圧縮のジョブは1件ずつ実行されるため、開始時にサービスの設定を切り替えてよい
+                pdf_compression_service.low_memory = low_memory
+                pdf_compression_service.save_profile = save_profile
+                run_files = pdf_pipeline.process_files if also_convert else pdf_compression_service.compress_files
+                return run_files(
+                    files,
+                    listener,
+                    compression_ratio=compression_ratio,
+                    target_dpi=target_dpi,
+                    target_size_mb=target_size_mb
+                )
+
+            scheduler.submit(
+                "compress",
+                files[0].name if len(files) == 1 else f"{len(files)}件のPDF",
+                run,
+                # 数千ページのPDFでも進捗の通知は1%刻みに抑える
+                ThrottledProgress(
+                    FletCompressionProgress(pdf_status, pdf_progress, updater, pdf_status_container),
+                    min_step=0.01
+                )
+            )
 
     pdf_file_picker.on_result = pick_pdf_result
 
+    def on_close(e):
+        scheduler.shutdown(timeout=10)
+        conversion_service.shutdown()
+        pdf_compression_service.shutdown()
+        if metrics is not None:
+            logger.info("ステージ別の集計: %s", metrics.summary())
+
+    page.on_close = on_close
+
     page.add(
         ft.Container(
             content=ft.Column([
@@ -110,12 +242,16 @@ def main(page: ft.Page):
                             elevation=5,
                         ),
                         on_click=lambda _: pdf_file_picker.pick_files(
-                            allow_multiple=False,
+                            allow_multiple=True,
                             allowed_extensions=["pdf"]
                         )
                     ),
                     margin=ft.margin.only(bottom=20)
                 ),
+                ft.Container(
+                    content=ft.Row([job_status, cancel_button]),
+                    margin=ft.margin.only(bottom=10)
+                ),
                 ft.Container(
                     content=total_progress,
                     margin=ft.margin.only(bottom=10)
@@ -132,6 +268,7 @@ def main(page: ft.Page):
                     content=pdf_status,
                     margin=ft.margin.only(bottom=20)
                 ),
+                pdf_status_container,
                 ft.Container(
                     content=ft.Column([
                         ft.Text("PDF圧縮設定", size=16, color="#4a4a4a"),
@@ -141,7 +278,10 @@ def main(page: ft.Page):
                                 compression_value_text
                             ],
                             alignment=ft.MainAxisAlignment.CENTER
-                        )
+                        ),
+                        ft.Row([pdf_target_dpi, pdf_target_size, pdf_save_profile]),
+                        pdf_low_memory,
+                        pdf_also_convert
                     ]),
                     margin=ft.margin.only(bottom=20)
                 ),
@@ -164,5 +304,23 @@ def main(page: ft.Page):
             )
         )
     )
+    startup.mark("first_frame")
+
+    def warm_up():
+        # markitdown・pikepdf・Pillowはウィンドウの表示後に読み込み、最初の描画を妨げないようにする
+        startup.warm_up()
+        conversion_service.converter.warm_up()
+        startup.mark("warm_up")
+        logger.info("起動時間の内訳: %s", startup.to_dict())
+        # STARTUP_PROFILEにファイルを指定すると、起動ごとの計測結果を追記する
+        if os.environ.get("STARTUP_PROFILE"):
+            startup.write(os.environ["STARTUP_PROFILE"])
+
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
-ft.app(target=main)
\ No newline at end of file
+if __name__ == "__main__":
+    # 変換用ワーカープロセスはspawnで起動するため、再インポート時にアプリを起動しない
+    multiprocessing.freeze_support()
+    # ログの設定 - デバッグレベルで詳細なログを出力
+    logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+    ft.app(target=main)
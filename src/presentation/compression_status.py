@@ -0,0 +1,148 @@
+import flet as ft
+from application.progress import ProgressListener
+from presentation.control_updater import ControlUpdater
+from presentation.status_list import DONE, ERROR, RUNNING, VirtualStatusList
+
+
+# 保存プロファイルの表示名
+SAVE_PROFILE_LABELS = {"fast": "速度優先", "balanced": "標準", "maximum": "サイズ優先"}
+
+
+def format_size(size):
+    """ファイルサイズを読みやすい単位に変換する"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0:
+            return f"{size:.1f}{unit}"
+        size /= 1024.0
+    return f"{size:.1f}GB"
+
+
+class FletCompressionProgress(ProgressListener):
+    """PDF圧縮の進捗をFletのコントロールに表示するリスナー
+
+    1ファイルの場合は結果の詳細をstatusに表示します。
+    複数ファイルの場合はファイルごとの状態をstatus_containerのリストに表示し、
+    全体の削減量と処理速度をstatusに表示します。
+    """
+
+    def __init__(self, status: ft.Text, progress: ft.ProgressBar, updater: ControlUpdater = None,
+                 status_container: ft.Column = None):
+        self.status = status
+        self.progress = progress
+        self.updater = updater or ControlUpdater()
+        self.status_container = status_container
+        self.file_list = None
+        self.total = 1
+        self.fractions = {}
+
+    @property
+    def is_batch(self) -> bool:
+        return self.file_list is not None
+
+    def batch_started(self, names):
+        self.total = max(1, len(names))
+        self.fractions = {}
+        if len(names) > 1 and self.status_container is not None:
+            self.file_list = VirtualStatusList(self.status_container, self.updater, running_label="圧縮中...")
+            self.file_list.reset(names)
+            self.status_container.visible = True
+            self.updater.update(self.status_container)
+
+    def _set_fraction(self, index, fraction):
+        self.fractions[index] = fraction
+        self.progress.value = sum(self.fractions.values()) / self.total
+        if self.is_batch:
+            done = sum(f >= 1.0 for f in self.fractions.values())
+            self.status.value = f"PDFを圧縮中... ({done}/{self.total})"
+
+    def item_started(self, index, name):
+        self.progress.visible = True
+        if self.is_batch:
+            self.file_list.set_state(index, RUNNING)
+            self._set_fraction(index, 0)
+        else:
+            self.status.value = "PDFを圧縮中..."
+            self.progress.value = 0
+        self.updater.update(self.progress, self.status, force=True)
+
+    def item_progress(self, index, fraction):
+        self._set_fraction(index, fraction)
+        if self.is_batch:
+            self.file_list.set_progress(index, fraction)
+        self.updater.update(self.progress)
+
+    def item_finished(self, index, result):
+        self._set_fraction(index, 1.0)
+        # 圧縮とMarkdown変換をまとめて実行した場合（PipelineResult）は、圧縮の結果にMarkdownの出力先を添える
+        conversion = getattr(result, "conversion", None)
+        if result.error is None and getattr(result, "compression", None) is not None:
+            result = result.compression
+        if self.is_batch:
+            markdown = f" / Markdown {format_size(conversion.output_bytes)}" if conversion is not None else ""
+            if result.error is not None:
+                self.file_list.set_state(index, ERROR, result.error)
+            elif result.skipped:
+                self.file_list.set_state(
+                    index, DONE, f"{format_size(result.original_size)}（削減見込みなし・スキップ）{markdown}"
+                )
+            else:
+                self.file_list.set_state(index, DONE, (
+                    f"{format_size(result.original_size)} → {format_size(result.compressed_size)}"
+                    f"（{result.ratio:.1f}%）{markdown}"
+                ))
+            self.updater.update(self.progress, self.status)
+            return
+
+        if result.error is not None:
+            self.status.value = f"エラーが発生しました: {result.error}"
+        elif result.skipped:
+            self.status.value = (
+                f"圧縮しても小さくならないため、スキップしました\n"
+                f"サイズ: {format_size(result.original_size)}\n"
+                f"画像: {result.images_unique}件"
+            )
+            self.progress.value = 1
+        else:
+            self.status.value = (
+                f"圧縮完了！\n"
+                f"元のサイズ: {format_size(result.original_size)}\n"
+                f"圧縮後のサイズ: {format_size(result.compressed_size)}\n"
+                f"圧縮率: {result.ratio:.1f}%\n"
+                f"画像: {result.images_unique}件中 {result.images_replaced}件を再圧縮\n"
+                f"保存: {SAVE_PROFILE_LABELS.get(result.save_profile, result.save_profile)}"
+                f"（{result.save_seconds:.2f}秒）\n"
+                f"保存先: {result.output_path}"
+            )
+            if result.target_size is not None:
+                self.status.value += (
+                    f"\n目標サイズ: {format_size(result.target_size)}（画像品質 {result.quality} を選択）"
+                )
+                if result.compressed_size > result.target_size:
+                    over = result.compressed_size - result.target_size
+                    self.status.value += f"\n目標サイズを {format_size(over)} 超えました"
+            if result.peak_memory_bytes is not None:
+                self.status.value += f"\n最大メモリ使用量: {format_size(result.peak_memory_bytes)}"
+            self.progress.value = 1
+        if result.error is None and conversion is not None:
+            self.status.value += f"\nMarkdown: {conversion.output}"
+        self.updater.update(self.status, self.progress, force=True)
+
+    def batch_finished(self, summary):
+        if not self.is_batch:
+            return
+        failed = summary.failed
+        # PipelineSummaryの場合は圧縮の結果だけを集計して表示する
+        summary = getattr(summary, "compression", summary)
+        self.status.value = (
+            f"圧縮完了！ {len(summary.results)}件\n"
+            f"元のサイズ: {format_size(summary.original_bytes)}\n"
+            f"圧縮後のサイズ: {format_size(summary.compressed_bytes)}\n"
+            f"削減量: {format_size(summary.bytes_saved)}\n"
+            f"処理速度: {summary.mb_per_second:.2f} MB/秒 / {summary.pages_per_second:.1f} ページ/秒"
+        )
+        if summary.peak_memory_bytes is not None:
+            self.status.value += f"\n最大メモリ使用量（1ファイルあたり）: {format_size(summary.peak_memory_bytes)}"
+        if failed:
+            self.status.value += f"\n失敗: {failed}件"
+        self.progress.value = 1
+        self.updater.update(self.status, self.progress, force=True)
@@ -0,0 +1,60 @@
+import threading
+import time
+import flet as ft
+
+
+class ControlUpdater:
+    """Fletのコントロールの更新をまとめて送るクラス
+
+    コントロールごとにupdate()を呼ぶとその都度クライアントとの通信が発生するため、
+    変更したコントロールを記録しておき、最大でfps回/秒の page.update(*controls) にまとめて送ります。
+    間引いた変更は次の更新か、少し遅れて送るタイマーで必ず反映されます。
+    """
+
+    def __init__(self, fps: float = 10.0, clock=time.monotonic):
+        """
+        Args:
+            fps: 1秒あたりの最大更新回数（0の場合は間引かない）
+        """
+        self.interval = 1.0 / fps if fps else 0.0
+        self.clock = clock
+        self._dirty = {}
+        self._last_flush = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def update(self, *controls: ft.Control, force: bool = False):
+        """コントロールを更新対象に加え、間隔が空いていれば送信する
+
+        Args:
+            controls: 値を変更したコントロール
+            force: Trueの場合は間隔に関係なくすぐに送信する（完了時など）
+        """
+        with self._lock:
+            for control in controls:
+                self._dirty[id(control)] = control
+            wait = 0.0
+            if not force and self._last_flush is not None:
+                wait = self.interval - (self.clock() - self._last_flush)
+            if wait > 0:
+                # 後続の更新がなくても最後の状態が表示されるよう、遅れて送るタイマーを用意する
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self.flush()
+
+    def flush(self):
+        """記録しているコントロールの変更をまとめて送信する"""
+        with self._lock:
+            controls = list(self._dirty.values())
+            self._dirty.clear()
+            self._last_flush = self.clock()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        # まだページに追加されていないコントロールは送らない（追加時に親の更新と一緒に送られる）
+        controls = [c for c in controls if c.page is not None]
+        if controls:
+            controls[0].page.update(*controls)
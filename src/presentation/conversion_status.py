@@ -1,15 +1,68 @@
 import flet as ft
+from application.progress import ProgressListener
+from presentation.control_updater import ControlUpdater
+from presentation.status_list import CACHED, DONE, ERROR, QUEUED, RUNNING, VirtualStatusList
 
-class FileConversionStatus:
-    def __init__(self, filename: str):
-        self.filename = filename
-        self.progress = ft.ProgressBar(width=300, color="#1a73e8", value=0)
-        self.status = ft.Text(color="#1a73e8", size=14)
-        self.container = ft.Container(
-            content=ft.Column([
-                ft.Text(filename, size=14, color="#4a4a4a"),
-                self.progress,
-                self.status
-            ]),
-            margin=ft.margin.only(bottom=10)
-        )
\ No newline at end of file
+
+class FletConversionProgress(ProgressListener):
+    """変換の進捗をFletのコントロールに表示するリスナー
+
+    ファイルごとの行は仮想化したリストに表示し、全体の件数は状態ごとに集計して表示します。
+    """
+
+    def __init__(self, status_container: ft.Column, total_progress: ft.ProgressBar, total_status: ft.Text,
+                 updater: ControlUpdater = None):
+        self.status_container = status_container
+        self.total_progress = total_progress
+        self.total_status = total_status
+        self.updater = updater or ControlUpdater()
+        self.file_list = VirtualStatusList(status_container, self.updater)
+        self.counts = {}
+        self.finished = 0
+
+    def _count_text(self) -> str:
+        c = self.counts
+        return (
+            f"待機中: {c[QUEUED]} / 変換中: {c[RUNNING]} / 完了: {c[DONE]} / "
+            f"キャッシュ: {c[CACHED]} / 失敗: {c[ERROR]}"
+        )
+
+    def _move(self, index: int, state: str, error: str = None):
+        self.counts[self.file_list.states[index]] -= 1
+        self.counts[state] += 1
+        self.file_list.set_state(index, state, error)
+
+    def batch_started(self, names):
+        self.total_progress.visible = True
+        self.total_progress.value = 0
+        self.file_list.reset(names)
+        self.counts = {QUEUED: len(names), RUNNING: 0, DONE: 0, CACHED: 0, ERROR: 0}
+        self.finished = 0
+        self.total_status.value = f"変換中... {self._count_text()}"
+
+        self.updater.update(self.status_container, self.total_progress, self.total_status, force=True)
+
+    def item_started(self, index, name):
+        self._move(index, RUNNING)
+        self.total_status.value = f"変換中... {self._count_text()}"
+        self.updater.update(self.total_status)
+
+    def item_progress(self, index, fraction):
+        self.file_list.set_progress(index, fraction)
+
+    def item_finished(self, index, result):
+        self._move(index, result.state if result.state in (CACHED, ERROR) else DONE, result.error)
+
+        self.finished += 1
+        self.total_progress.value = self.finished / len(self.file_list.names)
+        self.total_status.value = f"変換中... {self._count_text()}"
+        # 大量のファイルでも通信が増えないよう、まとめて送る
+        self.updater.update(self.total_progress, self.total_status)
+
+    def batch_finished(self, summary):
+        self.total_status.value = "すべての変換が完了しました 🎉"
+        if summary.cache_hits is not None:
+            self.total_status.value += f"（キャッシュ ヒット: {summary.cache_hits} / ミス: {summary.cache_misses}）"
+        if self.counts[ERROR]:
+            self.total_status.value += f"（失敗: {self.counts[ERROR]}件）"
+        self.updater.update(self.total_status, force=True)
@@ -0,0 +1,28 @@
+import flet as ft
+from application.job_scheduler import CANCELLED, QUEUED, RUNNING, JobListener
+from presentation.control_updater import ControlUpdater
+
+
+class FletJobStatus(JobListener):
+    """スケジューラのジョブの状況（実行中・待機中の件数）をFletに表示するリスナー"""
+
+    def __init__(self, scheduler, status: ft.Text, cancel_button: ft.Control, updater: ControlUpdater = None):
+        self.scheduler = scheduler
+        self.status = status
+        self.cancel_button = cancel_button
+        self.updater = updater or ControlUpdater()
+
+    def job_changed(self, job):
+        if job.finished:
+            # 表示するのは実行中・待機中の件数だけのため、完了したジョブは一覧に残さない
+            self.scheduler.forget_finished()
+        counts = self.scheduler.counts()
+        active = counts[RUNNING] + counts[QUEUED]
+        if active:
+            self.status.value = f"実行中: {counts[RUNNING]}件 / 待機中: {counts[QUEUED]}件"
+        elif job.state == CANCELLED:
+            self.status.value = "処理をキャンセルしました"
+        else:
+            self.status.value = ""
+        self.cancel_button.visible = bool(active)
+        self.updater.update(self.status, self.cancel_button, force=True)
@@ -0,0 +1,147 @@
+import flet as ft
+from presentation.control_updater import ControlUpdater
+
+# 1ファイル分の行の高さ（スクロール位置から表示する行を求めるため固定にする）
+ROW_HEIGHT = 72
+# 作っておく行の数（表示領域に収まる行数＋スクロール中の余白）
+ROW_POOL_SIZE = 8
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CACHED = "cached"
+ERROR = "error"
+
+
+class StatusRow:
+    """1ファイル分の進捗を表示する行
+
+    行はファイルごとには作らず、スクロール位置に応じて表示するファイルを入れ替えて再利用します。
+    """
+
+    def __init__(self, running_label: str = "変換中..."):
+        self.running_label = running_label
+        self.filename = ft.Text(size=14, color="#4a4a4a", no_wrap=True)
+        self.progress = ft.ProgressBar(width=300, color="#1a73e8", value=0)
+        self.status = ft.Text(color="#1a73e8", size=14, no_wrap=True)
+        self.container = ft.Container(
+            content=ft.Column([
+                self.filename,
+                self.progress,
+                self.status
+            ], spacing=4),
+            height=ROW_HEIGHT,
+            visible=False
+        )
+
+    def show(self, filename: str, state: str, detail: str = None, fraction: float = None):
+        """ファイルの状態を表示する
+
+        Args:
+            detail: エラー内容、または完了時に添える説明
+            fraction: 処理中の進捗率（Noneの場合は不確定のバーを表示する）
+        """
+        self.container.visible = True
+        self.filename.value = filename
+        self.progress.color = "#1a73e8"
+        if state == QUEUED:
+            self.progress.value = 0
+            self.status.value = "待機中"
+        elif state == RUNNING:
+            self.progress.value = fraction
+            self.status.value = self.running_label
+        elif state == CACHED:
+            # キャッシュから復元した場合は変換済みと区別して表示する
+            self.progress.value = 1.0
+            self.progress.color = "#4caf50"
+            self.status.value = "キャッシュから復元 ⚡"
+        elif state == ERROR:
+            self.progress.value = 0
+            self.status.value = f"エラー: {detail} ❌"
+        else:
+            self.progress.value = 1.0
+            self.status.value = "完了 ✅" if detail is None else f"完了 ✅ {detail}"
+
+    def hide(self):
+        self.container.visible = False
+
+
+class VirtualStatusList:
+    """大量のファイルの状態を、表示されている分の行だけで描画するリスト
+
+    状態はファイル名と状態の配列だけで持ち、コントロールは固定数の行と
+    前後の余白（スクロール量を合わせるための空のContainer）だけを使います。
+    バッチの件数によらず、クライアントに送るコントロールの数は一定です。
+    """
+
+    def __init__(self, view: ft.Column, updater: ControlUpdater, pool_size: int = ROW_POOL_SIZE,
+                 running_label: str = "変換中..."):
+        self.view = view
+        self.updater = updater
+        self.rows = [StatusRow(running_label) for _ in range(pool_size)]
+        self.top = ft.Container(height=0)
+        self.bottom = ft.Container(height=0)
+        self.names = []
+        self.states = []
+        self.details = {}
+        self.fractions = {}
+        self.first = 0
+
+    def reset(self, names: list):
+        """表示するファイルの一覧を入れ替え、リストの行をviewに配置する"""
+        view = self.view
+        view.spacing = 0
+        view.controls = [self.top, *(row.container for row in self.rows), self.bottom]
+        view.on_scroll_interval = 50
+        view.on_scroll = self._on_scroll
+        self.names = list(names)
+        self.states = [QUEUED] * len(self.names)
+        self.details = {}
+        self.fractions = {}
+        self.first = 0
+        self._bind()
+
+    def set_state(self, index: int, state: str, detail: str = None):
+        """ファイルの状態を変更し、表示中の行であれば更新対象にする"""
+        self.states[index] = state
+        if detail is not None:
+            self.details[index] = detail
+        self.fractions.pop(index, None)
+        self._refresh(index)
+
+    def set_progress(self, index: int, fraction: float):
+        """処理中のファイルの進捗率を変更する"""
+        self.fractions[index] = fraction
+        self._refresh(index)
+
+    def _refresh(self, index: int):
+        # 表示中の行だけを更新対象にする
+        row = index - self.first
+        if 0 <= row < len(self.rows):
+            self.rows[row].show(self.names[index], self.states[index], self.details.get(index),
+                                self.fractions.get(index))
+            self.updater.update(self.rows[row].container)
+
+    def _bind(self):
+        """先頭の行の位置に合わせて余白の高さと各行の内容を設定する"""
+        self.top.height = self.first * ROW_HEIGHT
+        self.bottom.height = max(0, len(self.names) - self.first - len(self.rows)) * ROW_HEIGHT
+        for offset, row in enumerate(self.rows):
+            index = self.first + offset
+            if index < len(self.names):
+                row.show(self.names[index], self.states[index], self.details.get(index), self.fractions.get(index))
+            else:
+                row.hide()
+
+    def scroll_to(self, pixels: float):
+        """スクロール位置（ピクセル）に合わせて表示する行を入れ替える"""
+        last_first = max(0, len(self.names) - len(self.rows))
+        first = min(last_first, max(0, int(pixels // ROW_HEIGHT)))
+        if first == self.first:
+            return
+        self.first = first
+        self._bind()
+        self.updater.update(self.view)
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        self.scroll_to(e.pixels or 0)
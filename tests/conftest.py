@@ -0,0 +1,131 @@
+import io
+import zlib
+
+import pytest
+
+import pikepdf
+from PIL import Image
+
+
+def _image_xobject(pdf, data, size, filter_):
+    """RGB8ビットの画像XObjectを作成する"""
+    image = pikepdf.Stream(pdf, data)
+    image.Type = pikepdf.Name.XObject
+    image.Subtype = pikepdf.Name.Image
+    image.Width, image.Height = size
+    image.ColorSpace = pikepdf.Name.DeviceRGB
+    image.BitsPerComponent = 8
+    image.Filter = filter_
+    return image
+
+
+def _helvetica():
+    return pikepdf.Dictionary(Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1, BaseFont=pikepdf.Name.Helvetica)
+
+
+def _image_pdf(path, pages=4):
+    pdf = pikepdf.new()
+    for i in range(pages):
+        img = Image.effect_noise((64, 48), 20 + i * 10).convert('RGB')
+        image = _image_xobject(pdf, zlib.compress(img.tobytes()), img.size, pikepdf.Name.FlateDecode)
+        page = pdf.add_blank_page()
+        page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=image))
+        page.Contents = pdf.make_stream(b"q 64 0 0 48 0 0 cm /Im0 Do Q")
+    pdf.save(path)
+
+
+def _jpeg_pdf(path, quality, pages=3):
+    buffer = io.BytesIO()
+    Image.effect_noise((80, 60), 40).convert('RGB').save(buffer, format='JPEG', quality=quality)
+    pdf = pikepdf.new()
+    image = _image_xobject(pdf, buffer.getvalue(), (80, 60), pikepdf.Name.DCTDecode)
+    for _ in range(pages):
+        page = pdf.add_blank_page()
+        page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=image))
+        page.Contents = pdf.make_stream(b"q 80 0 0 60 0 0 cm /Im0 Do Q")
+    pdf.save(path)
+
+
+def _text_pdf(path, pages):
+    pdf = pikepdf.new()
+    font = pdf.make_indirect(_helvetica())
+    for i in range(pages):
+        page = pdf.add_blank_page()
+        page.Resources = pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=font))
+        page.Contents = pdf.make_stream(f"BT /F1 12 Tf 72 720 Td (Page {i + 1}) Tj ET".encode())
+    pdf.save(path)
+
+
+def _report_pdf(path, text="Pipeline report"):
+    pdf = pikepdf.new()
+    img = Image.effect_noise((64, 48), 40).convert('RGB')
+    image = _image_xobject(pdf, zlib.compress(img.tobytes()), img.size, pikepdf.Name.FlateDecode)
+    page = pdf.add_blank_page()
+    page.Resources = pikepdf.Dictionary(
+        XObject=pikepdf.Dictionary(Im0=image), Font=pikepdf.Dictionary(F1=_helvetica())
+    )
+    page.Contents = pdf.make_stream(
+        f"q 64 0 0 48 72 600 cm /Im0 Do Q BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    )
+    pdf.save(path)
+
+
+def _font_pdf(path, pages=3):
+    pdf = pikepdf.new()
+    font_program = bytes(range(256)) * 64
+    for i in range(pages):
+        font_file = pikepdf.Stream(pdf, zlib.compress(font_program, 1))
+        font_file.Filter = pikepdf.Name.FlateDecode
+        font_file.Length1 = len(font_program)
+        descriptor = pdf.make_indirect(pikepdf.Dictionary(
+            Type=pikepdf.Name.FontDescriptor, FontName=pikepdf.Name("/Sample"), FontFile2=font_file,
+        ))
+        font = pdf.make_indirect(pikepdf.Dictionary(
+            Type=pikepdf.Name.Font, Subtype=pikepdf.Name.TrueType, BaseFont=pikepdf.Name("/Sample"),
+            FontDescriptor=descriptor,
+        ))
+        page = pdf.add_blank_page()
+        unused = pikepdf.Stream(pdf, b"0" * 4096)
+        page.Resources = pikepdf.Dictionary(
+            Font=pikepdf.Dictionary(F1=font), XObject=pikepdf.Dictionary(Unused=unused),
+        )
+        text = f"BT /F1 12 Tf 72 720 Td (Page {i}) Tj ET ".encode() * 50
+        page.Contents = pikepdf.Stream(pdf, zlib.compress(text, 1))
+        page.Contents.Filter = pikepdf.Name.FlateDecode
+    pdf.docinfo["/Title"] = "Sample"
+    pdf.Root.Metadata = pikepdf.Stream(pdf, b"<x:xmpmeta xmlns:x='adobe:ns:meta/'/>")
+    pdf.Root.Metadata.Type = pikepdf.Name.Metadata
+    pdf.save(path)
+
+
+@pytest.fixture
+def make_image_pdf():
+    """Flate圧縮したRGB画像（64x48）を各ページに持つPDFを作成する関数: (path, pages=4)"""
+    return _image_pdf
+
+
+@pytest.fixture
+def make_jpeg_pdf():
+    """同じJPEG画像（80x60）をすべてのページから参照するPDFを作成する関数: (path, quality, pages=3)"""
+    return _jpeg_pdf
+
+
+@pytest.fixture
+def make_text_pdf():
+    """各ページに1行のテキスト（"Page 1"...）を持つPDFを作成する関数: (path, pages)"""
+    return _text_pdf
+
+
+@pytest.fixture
+def make_report_pdf():
+    """テキストとFlate圧縮した画像を1ページに持つPDFを作成する関数: (path, text="Pipeline report")"""
+    return _report_pdf
+
+
+@pytest.fixture
+def make_font_pdf():
+    """同じ内容のフォントプログラムをページごとに別々に埋め込み、メタデータを持つPDFを作成する関数: (path, pages=3)
+
+    各ページには使われていないXObjectもあり、保存プロファイルごとの違いを確かめられます。
+    """
+    return _font_pdf
@@ -0,0 +1,49 @@
+import json
+
+from benchmarks.corpus import Scale, build_corpus
+from benchmarks.run import compare, main
+
+TINY = Scale(pdf_pages=3, pdf_images=2, image_size=120, shared_pages=4,
+             text_pages=2, paragraphs=10, rows=10, sheets=1)
+
+
+def test_corpus_is_reproducible(tmp_path):
+    """同じシードからは同じコーパスが生成されることのテスト"""
+    first = build_corpus(tmp_path / "a", TINY, seed=1)
+    second = build_corpus(tmp_path / "b", TINY, seed=1)
+
+    for name, case in first.items():
+        for a, b in zip(case["files"], second[name]["files"]):
+            assert a.read_bytes() == b.read_bytes(), name
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    """許容範囲を超えて悪化した指標だけが退行になることのテスト"""
+    baseline = {"cases": {"convert_pdf": {"wall_seconds": 1.0, "peak_memory_bytes": 100, "output_bytes": 10}}}
+    cases = {
+        "convert_pdf": {"wall_seconds": 1.5, "peak_memory_bytes": 110, "output_bytes": 10},
+        "convert_new": {"wall_seconds": 9.0},
+    }
+
+    comparison = compare(cases, baseline, tolerance=0.2)
+
+    assert [(c["metric"], c["regression"]) for c in comparison] == [
+        ("wall_seconds", True), ("peak_memory_bytes", False), ("output_bytes", False),
+    ]
+
+
+def test_run_writes_results_and_compares_with_baseline(tmp_path):
+    """ベンチマークの結果をJSONに保存し、ベースラインと比較できることのテスト"""
+    baseline_path = tmp_path / "baseline.json"
+    output_path = tmp_path / "bench.json"
+    args = ["--cases", "compress_shared", "convert_html", "--repeat", "1", "--corpus-dir", str(tmp_path / "corpus")]
+
+    assert main([*args, "--output", str(tmp_path / "first.json"), "--save-baseline", str(baseline_path)]) == 0
+    # 小さなコーパスでは時間がばらつくため、ここでは比較の仕組みだけを確かめる
+    assert main([*args, "--output", str(output_path), "--baseline", str(baseline_path), "--tolerance", "100"]) == 0
+
+    report = json.loads(output_path.read_text(encoding="utf-8"))
+    case = report["cases"]["compress_shared"]
+    assert case["pages"] == 60 and case["output_bytes"] < case["input_bytes"]
+    assert case["pages_per_second"] > 0 and case["mb_per_second"] > 0
+    assert {c["case"] for c in report["comparison"]} == {"compress_shared", "convert_html"}
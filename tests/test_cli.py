@@ -0,0 +1,113 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from application.folder_watcher import WatchStats
+from cli import expand_inputs, main, print_watch_status
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+
+@pytest.fixture
+def documents(tmp_path):
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "a.txt").write_text("alpha", encoding="utf-8")
+    (tmp_path / "nested" / "b.txt").write_text("beta", encoding="utf-8")
+    (tmp_path / "nested" / "c.pdf").write_bytes(b"%PDF-1.4")
+    (tmp_path / "skip.md").write_text("skip", encoding="utf-8")
+    return tmp_path
+
+
+def test_expand_inputs_handles_files_directories_and_globs(documents):
+    """ファイル・ディレクトリ・globの展開と重複除去のテスト"""
+    paths = expand_inputs(
+        [str(documents), str(documents / "*.txt"), str(documents / "a.txt")],
+        {".txt", ".pdf"},
+    )
+
+    assert sorted(p.name for p in paths) == ["a.txt", "b.txt", "c.pdf"]
+
+
+def test_expand_inputs_rejects_missing_paths(tmp_path):
+    """存在しない入力はエラーになることのテスト"""
+    with pytest.raises(FileNotFoundError):
+        expand_inputs([str(tmp_path / "missing.pdf")], {".pdf"})
+
+
+def test_convert_writes_json_report(documents, tmp_path):
+    """convertコマンドが結果をJSONで書き出すことのテスト"""
+    report_path = tmp_path / "report.json"
+
+    exit_code = main([
+        "--json", str(report_path), "--quiet",
+        "convert", str(documents / "**" / "*.txt"), "--workers", "0", "--no-cache",
+    ])
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert exit_code == 0
+    assert report["command"] == "convert"
+    assert report["files"] == 2
+    assert all(r["state"] == "done" for r in report["results"])
+    assert (documents / "a.md").read_text(encoding="utf-8") == "alpha"
+
+
+def test_analyze_reports_unreadable_pdfs_as_failed(documents, tmp_path):
+    """analyzeコマンドが読めないPDFを失敗として数え、終了コード1を返すことのテスト"""
+    report_path = tmp_path / "report.json"
+
+    exit_code = main(["--json", str(report_path), "--quiet", "analyze", str(documents)])
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert exit_code == 1
+    assert report["command"] == "analyze"
+    assert report["files"] == 1
+    assert report["failed"] == 1
+    assert report["results"][0]["images"] == []
+
+
+def test_cli_does_not_import_flet():
+    """CLIの起動時にFletを読み込まないことのテスト"""
+    code = "import sys, cli; sys.exit('flet' in sys.modules)"
+    completed = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR)
+
+    assert completed.returncode == 0
+
+
+def test_watch_once_processes_new_files_only_once(documents, tmp_path_factory):
+    """watch --onceが新しいファイルだけを処理し、失敗したファイルも含めて再処理しないことのテスト"""
+    out = tmp_path_factory.mktemp("out")
+    report_path = out / "report.json"
+    args = [
+        "--json", str(report_path), "--quiet",
+        "watch", str(documents), "--once", "--workers", "0", "--no-cache",
+        "--index", str(out / "watch.sqlite3"),
+    ]
+
+    # c.pdfは壊れたPDFなので失敗する
+    assert main(args) == 1
+    first = json.loads(report_path.read_text(encoding="utf-8"))
+    assert main(args) == 0
+    second = json.loads(report_path.read_text(encoding="utf-8"))
+
+    assert first["command"] == "watch"
+    assert first["stats"]["processed"] == 3
+    assert first["stats"]["failed"] == 1
+    assert second["stats"]["processed"] == 0
+    assert (documents / "nested" / "b.md").read_text(encoding="utf-8") == "beta"
+
+
+def test_watch_status_is_printed_only_when_it_changes(capsys):
+    """監視の状態は、渡された前回の状態から変化した時だけ表示されることのテスト"""
+    stats = WatchStats(queued=2)
+
+    state = print_watch_status(stats)
+    assert print_watch_status(stats, state) == state
+    stats.processed = 1
+    print_watch_status(stats, state)
+    # 呼び出し側が状態を持つため、別の監視は前回の表示に影響されない
+    print_watch_status(WatchStats(queued=2))
+
+    assert capsys.readouterr().err.count("[watch]") == 3
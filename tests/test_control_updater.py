@@ -0,0 +1,68 @@
+from unittest.mock import MagicMock
+
+import flet as ft
+
+from presentation.control_updater import ControlUpdater
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_updates_are_batched_into_one_page_update():
+    """複数のコントロールの変更が1回のpage.updateにまとめられることのテスト"""
+    clock = FakeClock()
+    updater = ControlUpdater(fps=10, clock=clock)
+    page = MagicMock()
+    progress, status = MagicMock(page=page), MagicMock(page=page)
+
+    updater.update(progress)
+    for _ in range(100):
+        updater.update(progress, status)
+    updater.flush()
+
+    assert page.update.call_count == 2
+    page.update.assert_called_with(progress, status)
+
+
+def test_forced_update_is_sent_immediately():
+    """force=Trueの更新は間隔に関係なく送られることのテスト"""
+    clock = FakeClock()
+    updater = ControlUpdater(fps=1, clock=clock)
+    page = MagicMock()
+    status = MagicMock(page=page)
+
+    updater.update(status)
+    updater.update(status, force=True)
+
+    assert page.update.call_count == 2
+
+
+def test_controls_not_on_a_page_are_skipped():
+    """ページに追加されていないコントロールは送らず、例外にもならないことのテスト"""
+    updater = ControlUpdater(fps=0)
+    page = MagicMock()
+    attached, detached = MagicMock(page=page), ft.Text()
+
+    updater.update(detached)
+    updater.update(attached, detached)
+
+    page.update.assert_called_once_with(attached)
+
+
+def test_throttled_update_is_sent_by_timer():
+    """間引いた変更も後から送られることのテスト"""
+    updater = ControlUpdater(fps=5)
+    page = MagicMock()
+    progress = MagicMock(page=page)
+
+    updater.update(progress)
+    updater.update(progress)
+    timer = updater._timer
+    timer.join(2)
+
+    assert page.update.call_count == 2
@@ -0,0 +1,47 @@
+import os
+
+from infrastructure.conversion_cache import ConversionCache
+
+
+def test_stat_lookup_skips_reading_unchanged_files(tmp_path):
+    """mtimeとサイズが同じファイルは内容を読まずにヒットすることのテスト"""
+    source = tmp_path / "doc.txt"
+    source.write_text("hello", encoding="utf-8")
+    cache = ConversionCache(tmp_path / "cache", namespace="v1")
+
+    key = cache.key_for_file(source)
+    cache.put(key, "# hello")
+    cache.remember_source(source, key)
+
+    assert cache.lookup_by_stat(source) == key
+    assert cache.get(key) == "# hello"
+
+    source.write_text("changed", encoding="utf-8")
+    assert cache.lookup_by_stat(source) is None
+
+
+def test_namespace_changes_key(tmp_path):
+    """変換器のバージョンが変わるとキーも変わることのテスト"""
+    source = tmp_path / "doc.txt"
+    source.write_text("hello", encoding="utf-8")
+
+    old = ConversionCache(tmp_path / "cache", namespace="v1").key_for_file(source)
+    new = ConversionCache(tmp_path / "cache", namespace="v2").key_for_file(source)
+
+    assert old != new
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    """上限を超えると最も古く使われたエントリが削除されることのテスト"""
+    cache = ConversionCache(tmp_path / "cache", max_bytes=10)
+
+    cache.put("a" * 64, "12345")
+    cache.put("b" * 64, "12345")
+    cache.get("a" * 64)
+    cache.put("c" * 64, "12345")
+
+    assert cache.get("a" * 64) == "12345"
+    assert cache.get("b" * 64) is None
+    assert cache.get("c" * 64) == "12345"
+    assert cache.total_bytes() <= 10
+    assert not os.path.exists(cache._blob_path("b" * 64))
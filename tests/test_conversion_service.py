@@ -0,0 +1,171 @@
+import logging
+from unittest.mock import MagicMock
+
+import pytest
+
+from application.conversion_service import ConversionService
+from domain.markdown_converter import MarkdownConverter, MarkItDownEnginePool
+from infrastructure.conversion_cache import ConversionCache
+from infrastructure.metrics import MetricsRecorder
+
+
+def fake_converter(text="# converted", error=None):
+    """MarkItDownの代わりにモックのエンジンを使う変換器を作る"""
+    engine = MagicMock()
+    if error is not None:
+        engine.convert.side_effect = error
+    else:
+        engine.convert.return_value.text_content = text
+    return MarkdownConverter(pool=MarkItDownEnginePool(factory=lambda: engine)), engine
+
+
+@pytest.fixture
+def text_files(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text(f"line {i}", encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+async def test_convert_file_in_process(tmp_path):
+    """プロセスを使わないモードでの変換テスト"""
+    service = ConversionService(max_workers=0)
+    service.converter, _ = fake_converter()
+    listener = MagicMock()
+    source = tmp_path / "input.txt"
+    source.write_text("input", encoding="utf-8")
+
+    result = await service.convert_file(source, 3, listener)
+
+    assert (tmp_path / "input.md").read_text(encoding="utf-8") == "# converted"
+    assert result.state == "done"
+    assert result.output_bytes == len("# converted")
+    listener.item_finished.assert_called_once_with(3, result)
+
+
+async def test_convert_file_reports_errors(text_files):
+    """変換エラーが結果に反映されることのテスト"""
+    service = ConversionService(max_workers=0)
+    service.converter, _ = fake_converter(error=ValueError("壊れたファイル"))
+
+    result = await service.convert_file(text_files[0])
+
+    assert result.state == "error"
+    assert result.error == "壊れたファイル"
+
+
+async def test_convert_files_on_process_pool(tmp_path, caplog):
+    """プロセスプールでの並列変換で、同時に処理する件数がmax_pendingを超えないことのテスト"""
+    files = []
+    for i in range(8):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text(f"line {i}", encoding="utf-8")
+        files.append(path)
+    in_flight = []
+    peak = 0
+
+    def started(index, name):
+        nonlocal peak
+        in_flight.append(index)
+        peak = max(peak, len(in_flight))
+
+    listener = MagicMock()
+    listener.item_started.side_effect = started
+    listener.item_finished.side_effect = lambda index, result: in_flight.remove(index)
+
+    service = ConversionService(max_workers=2, max_pending=3)
+    try:
+        with caplog.at_level(logging.INFO, logger="application.conversion_service"):
+            summary = await service.process_files(files, listener)
+    finally:
+        service.shutdown()
+
+    for i, path in enumerate(files):
+        assert path.with_suffix(".md").read_text(encoding="utf-8") == f"line {i}"
+    assert [r.state for r in summary.results] == ["done"] * len(files)
+    assert 1 < peak <= 3
+    # エンジンはワーカーにあるため、常に0件になる親プロセスの統計は出さない
+    assert "エンジン再利用" not in caplog.text
+    assert listener.item_finished.call_count == len(files)
+    listener.batch_finished.assert_called_once_with(summary)
+
+
+async def test_unchanged_file_is_served_from_cache(tmp_path, text_files):
+    """変更のないファイルはキャッシュから復元されることのテスト"""
+    cache = ConversionCache(tmp_path / "cache")
+    service = ConversionService(max_workers=0, cache=cache)
+    service.converter, engine = fake_converter()
+
+    first = await service.process_files(text_files[:1])
+    second = await service.process_files(text_files[:1])
+
+    assert first.results[0].state == "done"
+    assert second.results[0].state == "cached"
+    assert (second.cache_hits, second.cache_misses) == (1, 0)
+    assert engine.convert.call_count == 1
+
+
+async def test_failed_conversion_leaves_no_partial_output(text_files):
+    """変換に失敗した場合、出力先にも一時ファイルにも何も残らないことのテスト"""
+    service = ConversionService(max_workers=0)
+    service.converter, _ = fake_converter(error=ValueError("壊れたファイル"))
+
+    await service.convert_file(text_files[0])
+
+    assert sorted(p.name for p in text_files[0].parent.iterdir()) == ["doc0.txt", "doc1.txt", "doc2.txt"]
+
+
+async def test_markdown_inputs_are_not_overwritten(tmp_path):
+    """Markdownの入力を変換しても元のファイルを上書きしないことのテスト"""
+    source = tmp_path / "notes.md"
+    source.write_text("# notes", encoding="utf-8")
+    service = ConversionService(max_workers=0)
+    service.converter, _ = fake_converter("# converted")
+
+    result = await service.convert_file(source)
+
+    assert source.read_text(encoding="utf-8") == "# notes"
+    assert result.output == str(tmp_path / "converted_notes.md")
+    assert (tmp_path / "converted_notes.md").read_text(encoding="utf-8") == "# converted"
+
+
+@pytest.mark.parametrize("max_workers", [0, 1])
+async def test_pdf_is_converted_page_by_page(tmp_path, max_workers, make_text_pdf):
+    """PDFはページごとに変換され、進捗がページ単位で通知されることのテスト"""
+    source = tmp_path / "report.pdf"
+    make_text_pdf(source, pages=4)
+    progress = []
+    listener = MagicMock()
+    listener.item_progress.side_effect = lambda index, fraction: progress.append(fraction)
+
+    service = ConversionService(max_workers=max_workers)
+    try:
+        result = await service.convert_file(source, 0, listener)
+    finally:
+        service.shutdown()
+
+    assert result.state == "done"
+    assert result.pages == 4
+    assert progress == [0.25, 0.5, 0.75, 1.0]
+    text = (tmp_path / "report.md").read_text(encoding="utf-8")
+    assert [line for line in text.splitlines() if line.strip("\x0c")] == [f"Page {i}" for i in range(1, 5)]
+    assert text == MarkdownConverter().convert(source).text_content
+
+
+async def test_conversion_stages_are_recorded(tmp_path, text_files):
+    """変換・書き出し・キャッシュの各ステージが計測されることのテスト"""
+    recorder = MetricsRecorder()
+    service = ConversionService(max_workers=0, cache=ConversionCache(tmp_path / "cache"), metrics=recorder)
+
+    await service.process_files(text_files[:1])
+    summary = await service.process_files(text_files[:1])
+
+    first, second = recorder.recent()
+    assert {"queue_wait", "cache_lookup", "convert", "write", "cache_store"} <= set(first["stages"])
+    assert first["counters"] == {"pages": 1, "bytes_in": 6, "bytes_out": 6, "cache_hits": 0}
+    assert "convert" not in second["stages"]
+    assert second["counters"]["cache_hits"] == 1
+    assert summary.results[0].metrics == second
+
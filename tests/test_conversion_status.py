@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import flet as ft
+
+from presentation.conversion_status import FletConversionProgress
+from presentation.status_list import ROW_HEIGHT, ROW_POOL_SIZE
+
+
+def make_progress():
+    view = ft.Column()
+    listener = FletConversionProgress(view, ft.ProgressBar(), ft.Text(), updater=MagicMock())
+    return view, listener
+
+
+def test_row_count_does_not_depend_on_batch_size():
+    """バッチの件数によらず行のコントロール数が一定であることのテスト"""
+    view, listener = make_progress()
+
+    listener.batch_started([f"file{i}.docx" for i in range(5000)])
+
+    # 行のプールと前後の余白だけが配置される
+    assert len(view.controls) == ROW_POOL_SIZE + 2
+    assert view.controls[-1].height == (5000 - ROW_POOL_SIZE) * ROW_HEIGHT
+
+
+def test_scrolling_rebinds_rows_to_visible_files():
+    """スクロール位置に応じて行の内容が入れ替わることのテスト"""
+    view, listener = make_progress()
+    listener.batch_started([f"file{i}.docx" for i in range(100)])
+    listener.item_finished(50, SimpleNamespace(state="error", error="壊れたファイル"))
+
+    listener.file_list.scroll_to(50 * ROW_HEIGHT + 10)
+
+    first_row = listener.file_list.rows[0]
+    assert view.controls[0].height == 50 * ROW_HEIGHT
+    assert first_row.filename.value == "file50.docx"
+    assert "壊れたファイル" in first_row.status.value
+
+
+def test_counters_follow_item_states():
+    """状態ごとの件数が集計されることのテスト"""
+    _, listener = make_progress()
+    listener.batch_started(["a", "b", "c", "d"])
+
+    listener.item_started(0, "a")
+    listener.item_started(1, "b")
+    listener.item_finished(0, SimpleNamespace(state="done", error=None))
+    listener.item_finished(1, SimpleNamespace(state="cached", error=None))
+    listener.item_started(2, "c")
+
+    assert listener.counts == {"queued": 1, "running": 1, "done": 1, "cached": 1, "error": 0}
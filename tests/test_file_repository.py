@@ -0,0 +1,23 @@
+import asyncio
+
+from infrastructure.file_repository import FileRepository
+
+
+async def test_concurrent_writes_to_the_same_path_do_not_mix(tmp_path):
+    """同じスレッドの2つのコルーチンが同じ出力先に書いても、内容が混ざらないことのテスト"""
+    repository = FileRepository()
+    output = tmp_path / "report.md"
+
+    async def chunks(text):
+        for _ in range(20):
+            yield text
+            # もう一方のコルーチンの書き込みと交互に進める
+            await asyncio.sleep(0)
+
+    await asyncio.gather(
+        repository.write_chunks(output, chunks("a")),
+        repository.write_chunks(output, chunks("b")),
+    )
+
+    assert output.read_text(encoding="utf-8") in ("a" * 20, "b" * 20)
+    assert [path.name for path in tmp_path.iterdir()] == ["report.md"]
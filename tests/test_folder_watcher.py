@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from application.conversion_service import ConversionService
+from application.folder_watcher import FolderWatcher
+from infrastructure.watch_index import WatchIndex
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def inbox(tmp_path):
+    path = tmp_path / "inbox"
+    path.mkdir()
+    return path
+
+
+def make_watcher(inbox, index_path, clock, debounce=3.0):
+    return FolderWatcher(
+        [inbox],
+        conversion_service=ConversionService(max_workers=0),
+        index=WatchIndex(index_path),
+        convert_extensions={".txt"},
+        debounce_seconds=debounce,
+        clock=clock,
+    )
+
+
+async def test_files_are_processed_after_they_stop_changing(inbox, tmp_path):
+    """変更が続いている間は処理せず、安定してから1回だけ処理することのテスト"""
+    clock = FakeClock()
+    watcher = make_watcher(inbox, tmp_path / "watch.sqlite3", clock)
+    source = inbox / "a.txt"
+    source.write_text("first", encoding="utf-8")
+
+    assert await watcher.poll() == []
+    assert watcher.stats.queued == 1
+
+    clock.now = 2.0
+    source.write_text("first and second", encoding="utf-8")
+    assert await watcher.poll() == []
+
+    clock.now = 4.0
+    assert await watcher.poll() == []
+
+    clock.now = 5.0
+    assert await watcher.poll() == [source]
+    assert (inbox / "a.md").read_text(encoding="utf-8") == "first and second"
+    assert watcher.stats.processed == 1
+    assert watcher.stats.queued == 0
+
+    # 出力したMarkdownや処理済みのファイルは再び処理しない
+    clock.now = 10.0
+    assert await watcher.poll() == []
+    assert watcher.stats.processed == 1
+
+
+async def test_restart_does_not_reprocess_files(inbox, tmp_path):
+    """インデックスを引き継いだ再起動後は、処理済みのファイルを処理し直さないことのテスト"""
+    index_path = tmp_path / "watch.sqlite3"
+    (inbox / "a.txt").write_text("alpha", encoding="utf-8")
+    first = make_watcher(inbox, index_path, FakeClock(), debounce=0)
+    assert len(await first.poll()) == 1
+    first.index.close()
+
+    (inbox / "b.txt").write_text("beta", encoding="utf-8")
+    second = make_watcher(inbox, index_path, FakeClock(), debounce=0)
+
+    assert await second.poll() == [inbox / "b.txt"]
+
+
+async def test_touched_file_with_same_content_is_skipped(inbox, tmp_path):
+    """mtimeだけが変わり内容が同じファイルは処理し直さないことのテスト"""
+    source = inbox / "a.txt"
+    source.write_text("alpha", encoding="utf-8")
+    watcher = make_watcher(inbox, tmp_path / "watch.sqlite3", FakeClock(), debounce=0)
+    await watcher.poll()
+    (inbox / "a.md").unlink()
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert await watcher.poll() == []
+    assert watcher.stats.unchanged == 1
+    assert not (inbox / "a.md").exists()
+    # インデックスのmtimeも更新され、次の走査ではハッシュを計算し直さない
+    assert watcher.index.is_current(source, source.stat())
@@ -0,0 +1,106 @@
+import io
+
+from PIL import Image
+
+import pikepdf
+
+from domain.image_recompressor import (
+    BILEVEL, GRAYSCALE, PALETTE, PHOTO, ImageSource, classify_image, estimate_jpeg_quality, recompress_image,
+)
+
+
+def jpeg_bytes(quality, size=(64, 48)):
+    output = io.BytesIO()
+    Image.effect_noise(size, 40).convert('RGB').save(output, format='JPEG', quality=quality)
+    return output.getvalue()
+
+
+def test_estimate_jpeg_quality():
+    """量子化テーブルからJPEG品質を推定できることのテスト"""
+    for quality in (20, 50, 85):
+        estimated = estimate_jpeg_quality(Image.open(io.BytesIO(jpeg_bytes(quality))))
+        assert abs(estimated - quality) <= 2
+
+
+def test_jpeg_already_below_requested_quality_is_skipped():
+    """要求より低い品質のJPEGは再エンコードしないことのテスト"""
+    data = jpeg_bytes(30)
+
+    assert recompress_image(ImageSource(original_size=len(data), encoded=data), quality=60).encoded is None
+
+
+def test_jpeg_is_recompressed_at_lower_quality():
+    """要求より高い品質のJPEGは小さく再エンコードされることのテスト"""
+    data = jpeg_bytes(95)
+
+    encoded = recompress_image(ImageSource(original_size=len(data), encoded=data), quality=40).encoded
+
+    assert encoded is not None
+    assert len(encoded.data) < len(data)
+    assert (encoded.width, encoded.height) == (64, 48)
+
+
+def line_art():
+    img = Image.new('RGB', (120, 80), (255, 255, 255))
+    for x in range(120):
+        img.putpixel((x, 40), (200, 0, 0))
+        img.putpixel((x, 20), (0, 0, 200))
+    return img
+
+
+def decode(encoded):
+    """EncodedImageをPDFの画像として読み戻す"""
+    pdf = pikepdf.new()
+    image = pikepdf.Stream(pdf, encoded.data)
+    image.Type = pikepdf.Name.XObject
+    image.Subtype = pikepdf.Name.Image
+    image.Width, image.Height = encoded.width, encoded.height
+    image.BitsPerComponent = encoded.bits_per_component
+    image.Filter = pikepdf.Name(encoded.filter)
+    if encoded.decode_parms:
+        image.DecodeParms = pikepdf.Dictionary(encoded.decode_parms)
+    if encoded.palette:
+        image.ColorSpace = pikepdf.Array([
+            pikepdf.Name.Indexed, pikepdf.Name.DeviceRGB, len(encoded.palette) // 3 - 1, pikepdf.String(encoded.palette),
+        ])
+    else:
+        image.ColorSpace = pikepdf.Name(encoded.color_space)
+    return pikepdf.PdfImage(image).as_pil_image()
+
+
+def test_classify_image():
+    """画像の種類ごとの分類テスト"""
+    photo = Image.merge('RGB', [Image.effect_noise((64, 48), sigma) for sigma in (20, 40, 60)])
+    gray_photo = Image.merge('RGB', [Image.effect_noise((64, 48), 40)] * 3)
+
+    assert classify_image(Image.new('1', (8, 8))) == BILEVEL
+    assert classify_image(Image.new('L', (8, 8), 255)) == BILEVEL
+    assert classify_image(line_art()) == PALETTE
+    assert classify_image(gray_photo) == GRAYSCALE
+    assert classify_image(photo) == PHOTO
+
+
+def test_bilevel_scan_is_encoded_as_ccitt_g4():
+    """白黒2値の画像がCCITT G4で可逆に符号化されることのテスト"""
+    scan = Image.new('1', (200, 100), 255)
+    for x in range(20, 180):
+        scan.putpixel((x, 50), 0)
+    raw_size = len(scan.convert('RGB').tobytes())
+
+    result = recompress_image(ImageSource(original_size=raw_size, image=scan), quality=50)
+
+    assert result.image_class == BILEVEL
+    assert result.encoded.filter == "/CCITTFaxDecode"
+    assert list(decode(result.encoded).convert('L').getdata()) == list(scan.convert('L').getdata())
+
+
+def test_line_art_is_encoded_with_reduced_palette():
+    """線画が少ないビット数のパレット画像として可逆に符号化されることのテスト"""
+    art = line_art()
+
+    result = recompress_image(ImageSource(original_size=len(art.tobytes()), image=art), quality=50)
+
+    assert result.image_class == PALETTE
+    assert result.encoded.filter == "/FlateDecode"
+    assert result.encoded.bits_per_component == 2
+    assert list(decode(result.encoded).convert('RGB').getdata()) == list(art.getdata())
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import flet as ft
+import pytest
+
+from application.job_scheduler import CANCELLED, DONE, ERROR, JobListener, JobScheduler
+from application.progress import ProgressListener
+from presentation.job_status import FletJobStatus
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = JobScheduler(max_concurrent=2, limits={"compress": 1})
+    yield scheduler
+    scheduler.shutdown(timeout=5)
+
+
+def test_submit_returns_immediately_and_runs_in_background(scheduler):
+    """投入はすぐに戻り、ジョブは別スレッドで実行されることのテスト"""
+    release = threading.Event()
+    threads = []
+
+    async def run(listener):
+        threads.append(threading.current_thread())
+        await asyncio.to_thread(release.wait, 5)
+        return "ok"
+
+    job = scheduler.submit("convert", "batch", run)
+    assert not job.finished
+
+    release.set()
+    assert scheduler.wait(job, timeout=5) == "ok"
+    assert job.state == DONE
+    assert threads[0] is not threading.current_thread()
+
+
+def test_limits_run_same_kind_jobs_one_at_a_time(scheduler):
+    """種類ごとの上限を超えたジョブは待ち行列で待つことのテスト"""
+    running = []
+    peak = []
+
+    async def run(listener):
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.pop()
+
+    jobs = [scheduler.submit("compress", f"file{i}.pdf", run) for i in range(3)]
+    for job in jobs:
+        scheduler.wait(job, timeout=5)
+
+    assert max(peak) == 1
+    assert all(job.state == DONE for job in jobs)
+    assert jobs[2].queue_seconds > 0
+
+
+def test_cancel_running_and_queued_jobs(scheduler):
+    """実行中・待機中のジョブを取り消せることのテスト"""
+    started = threading.Event()
+    changes = []
+
+    class Recorder(JobListener):
+        def job_changed(self, job):
+            changes.append((job.name, job.state))
+
+    scheduler.listener = Recorder()
+
+    async def run(listener):
+        started.set()
+        await asyncio.sleep(30)
+
+    running = scheduler.submit("compress", "running.pdf", run)
+    queued = scheduler.submit("compress", "queued.pdf", run)
+    assert started.wait(5)
+
+    assert scheduler.cancel_all() == 2
+    scheduler.wait(running, timeout=5)
+    scheduler.wait(queued, timeout=5)
+
+    assert running.state == CANCELLED
+    assert queued.state == CANCELLED
+    assert ("queued.pdf", CANCELLED) in changes
+    assert scheduler.cancel(running) is False
+
+
+def test_errors_and_progress_are_recorded(scheduler):
+    """失敗したジョブの記録と、サービスの進捗が転送されることのテスト"""
+    received = []
+
+    class Recorder(ProgressListener):
+        def item_progress(self, index, fraction):
+            received.append(fraction)
+
+    async def ok(listener):
+        listener.batch_started(["a", "b"])
+        listener.item_progress(0, 0.5)
+        listener.item_finished(0, None)
+
+    async def broken(listener):
+        raise ValueError("broken file")
+
+    job = scheduler.submit("convert", "batch", ok, Recorder())
+    failed = scheduler.submit("convert", "broken", broken)
+    scheduler.wait(failed, timeout=5)
+    scheduler.wait(job, timeout=5)
+
+    assert received == [0.5]
+    assert job.state == DONE and job.progress == 1.0
+    assert failed.state == ERROR and failed.error == "broken file"
+
+
+def test_job_status_forgets_finished_jobs(scheduler):
+    """画面の状況表示を通知先にした場合、完了したジョブがスケジューラに残らないことのテスト"""
+    status = ft.Text()
+    scheduler.listener = FletJobStatus(scheduler, status, ft.TextButton(), MagicMock())
+    release = threading.Event()
+
+    async def run(listener):
+        await asyncio.to_thread(release.wait, 5)
+
+    async def fail(listener):
+        raise ValueError("失敗")
+
+    jobs = [scheduler.submit("convert", "batch", run), scheduler.submit("compress", "broken.pdf", fail)]
+    scheduler.wait(jobs[1], timeout=5)
+    # 失敗したジョブは取り除かれ、実行中のジョブは残る
+    assert scheduler.jobs() == [jobs[0]]
+
+    release.set()
+    for job in jobs:
+        scheduler.wait(job, timeout=5)
+
+    assert scheduler.jobs() == []
+    assert scheduler.counts()[DONE] == 0
+    assert status.value == ""
@@ -0,0 +1,154 @@
+import pickle
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from domain.markdown_converter import MarkdownConverter, MarkItDownEnginePool
+
+
+def make_pool(size=1):
+    created = []
+
+    def factory():
+        engine = MagicMock()
+        engine.convert.side_effect = lambda path: f"converted:{path}"
+        created.append(engine)
+        return engine
+
+    return MarkItDownEnginePool(size=size, factory=factory), created
+
+
+def test_engine_is_reused_across_conversions():
+    """エンジンが変換ごとに作り直されないことのテスト"""
+    pool, created = make_pool()
+    converter = MarkdownConverter(pool)
+
+    converter.warm_up()
+    for i in range(5):
+        assert converter.convert(f"file{i}.txt") == f"converted:file{i}.txt"
+
+    stats = converter.stats()
+    assert len(created) == 1
+    assert stats.engines_created == 1
+    assert stats.conversions == 5
+
+
+def test_pool_never_exceeds_size_under_threads():
+    """複数スレッドから利用してもプールサイズを超えないことのテスト"""
+    pool, created = make_pool(size=2)
+    converter = MarkdownConverter(pool)
+
+    threads = [
+        threading.Thread(target=converter.convert, args=(f"file{i}.txt",))
+        for i in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(created) <= 2
+    assert pool.stats().conversions == 20
+
+
+def test_failed_engine_creation_frees_its_slot():
+    """エンジンの生成に失敗しても枠が返され、次の貸し出しで生成し直せることのテスト"""
+    failures = [RuntimeError("import failed")]
+
+    def factory():
+        if failures:
+            raise failures.pop()
+        return MagicMock()
+
+    pool = MarkItDownEnginePool(size=1, factory=factory)
+
+    with pytest.raises(RuntimeError):
+        pool.warm_up()
+    with pool.engine() as engine:
+        assert engine is not None
+
+    assert pool.stats().engines_created == 1
+
+
+def test_waiting_borrower_builds_after_a_failed_creation():
+    """生成中に空きを待っていた貸し出しが、生成の失敗後に自分でエンジンを作れることのテスト"""
+    building = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def factory():
+        calls.append(None)
+        if len(calls) == 1:
+            building.set()
+            release.wait(5)
+            raise RuntimeError("import failed")
+        return MagicMock()
+
+    pool = MarkItDownEnginePool(size=1, factory=factory)
+    errors, borrowed = [], []
+
+    def first():
+        try:
+            with pool.engine():
+                pass
+        except RuntimeError as e:
+            errors.append(e)
+
+    def second():
+        with pool.engine() as engine:
+            borrowed.append(engine)
+
+    failing = threading.Thread(target=first)
+    failing.start()
+    building.wait(5)
+    waiting = threading.Thread(target=second)
+    waiting.start()
+    release.set()
+    failing.join(5)
+    waiting.join(5)
+
+    assert not waiting.is_alive()
+    assert len(errors) == 1 and len(borrowed) == 1
+    assert pool.stats().engines_created == 1
+
+
+def test_pickled_pool_does_not_share_engines():
+    """プロセス間で受け渡したプールはエンジンを持ち越さないことのテスト"""
+    pool = MarkItDownEnginePool(size=3)
+    pool._idle.put(object())
+
+    restored = pickle.loads(pickle.dumps(pool))
+
+    assert restored.size == 3
+    assert restored._idle.empty()
+    assert restored.stats().engines_created == 0
+
+
+def test_xlsx_chunks_match_full_conversion(tmp_path):
+    """シートごとの変換結果をつなげると一括変換と一致することのテスト"""
+    pd = pytest.importorskip("pandas")
+    path = tmp_path / "book.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"name": ["a", "b"], "value": [1, 2]}).to_excel(writer, sheet_name="First", index=False)
+        pd.DataFrame({"total": [3]}).to_excel(writer, sheet_name="Second", index=False)
+    converter = MarkdownConverter()
+
+    chunks = list(converter.iter_chunks(path))
+
+    assert [(c.done, c.total) for c in chunks] == [(1, 2), (2, 2)]
+    assert "".join(c.text for c in chunks) == converter.convert(path).text_content
+
+
+def test_xlsx_falls_back_to_full_conversion_without_html_converter(tmp_path):
+    """markitdownの非公開APIが使えない場合、XLSXを一括で変換することのテスト"""
+    path = tmp_path / "book.xlsx"
+    engine = MagicMock()
+    engine.convert.return_value.text_content = "## Sheet1"
+    converter = MarkdownConverter(MarkItDownEnginePool(factory=lambda: engine))
+
+    with patch("domain.markdown_converter._html_converter_class", return_value=None):
+        chunks = list(converter.iter_chunks(path))
+
+    engine.convert.assert_called_once_with(str(path))
+    assert [(c.text, c.done, c.total) for c in chunks] == [("## Sheet1", 1, 1)]
@@ -0,0 +1,17 @@
+import sys
+
+import pytest
+
+from infrastructure.memory_monitor import MemoryMonitor, current_rss
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="現在の常駐メモリ量は/procから読む")
+def test_monitor_records_peak_of_allocations():
+    """区間内で確保したメモリが最大値に反映されることのテスト"""
+    before = current_rss()
+    with MemoryMonitor(interval=0.01) as monitor:
+        block = b"\x01" * (64 * 1024 * 1024)
+        monitor.sample()
+        del block
+
+    assert monitor.peak_bytes >= before + 32 * 1024 * 1024
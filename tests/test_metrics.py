@@ -0,0 +1,38 @@
+import json
+
+from infrastructure.metrics import NULL_RECORDER, MetricsRecorder
+
+
+def test_null_recorder_records_nothing():
+    """計測しない場合は何も記録しないことのテスト"""
+    metrics = NULL_RECORDER.job("compress", "a.pdf")
+    with metrics.stage("open"):
+        pass
+    metrics.count("pages", 3)
+    NULL_RECORDER.record(metrics)
+
+    assert metrics.to_dict() is None
+    assert NULL_RECORDER.summary() == {}
+
+
+def test_summary_aggregates_recent_jobs(tmp_path):
+    """直近のジョブだけをステージごとに集計し、JSON Linesに追記することのテスト"""
+    log_path = tmp_path / "metrics.jsonl"
+    recorder = MetricsRecorder(log_path, window=2)
+    for seconds in (10.0, 1.0, 3.0):
+        metrics = recorder.job("convert", "a.txt")
+        metrics.add_time("convert", seconds)
+        metrics.add_time("write", 1.0)
+        metrics.count("pages")
+        recorder.record(metrics)
+    # ワーカープロセスから届いた辞書もそのまま記録できる
+    recorder.record({"kind": "compress", "name": "b.pdf", "stages": {"save": 2.0}, "counters": {}})
+
+    summary = recorder.summary()
+
+    assert summary["convert"]["jobs"] == 1
+    assert summary["convert"]["stages"]["convert"] == {"total": 3.0, "mean": 3.0, "share": 0.75}
+    assert summary["convert"]["counters"] == {"pages": 1}
+    assert summary["compress"]["stages"]["save"]["share"] == 1.0
+    lines = [json.loads(line) for line in log_path.read_text(encoding="utf-8").splitlines()]
+    assert [line["kind"] for line in lines] == ["convert", "convert", "convert", "compress"]
@@ -2,11 +2,16 @@ import pytest
 from pathlib import Path
 import flet as ft
 import os
-from application.pdf_compression_service import PDFCompressionService
+from application.pdf_compression_service import DEFAULT_MIN_SAVINGS_RATIO, PDFCompressionService
+from domain.image_recompressor import ImageSource, recompress_image
+from infrastructure.metrics import MetricsRecorder
+from presentation.compression_status import FletCompressionProgress
 from unittest.mock import MagicMock, patch
 import pikepdf
 from PIL import Image
 import io
+import sys
+import zlib
 
 @pytest.fixture
 def mock_pdf_file():
@@ -21,9 +26,11 @@ def compression_service():
 
 @pytest.fixture
 def ui_components():
-    # UI要素のモック作成
+    # UI要素のモック作成（ページに追加していないため更新処理は差し替える）
     status = ft.Text()
     progress = ft.ProgressBar()
+    status.update = MagicMock()
+    progress.update = MagicMock()
     return status, progress
 
 async def test_pdf_compression_initialization(compression_service, mock_pdf_file, ui_components):
@@ -35,7 +42,9 @@ async def test_pdf_compression_initialization(compression_service, mock_pdf_file
         mock_pdf.pages = []
         mock_open.return_value.__enter__.return_value = mock_pdf
         
-        await compression_service.compress_pdf(mock_pdf_file, status, progress)
+        listener = FletCompressionProgress(status, progress)
+        listener.item_finished = MagicMock()
+        await compression_service.compress_pdf(mock_pdf_file, listener)
         
         assert progress.visible == True
         assert status.value.startswith("PDFを圧縮中")
@@ -73,8 +82,9 @@ async def test_pdf_compression_with_images(compression_service, mock_pdf_file, u
         # ファイルサイズのモック
         mock_getsize.side_effect = lambda x: 1000 if 'compressed' in x else 2000
         
-        await compression_service.compress_pdf(mock_pdf_file, status, progress)
+        result = await compression_service.compress_pdf(mock_pdf_file, FletCompressionProgress(status, progress))
         
+        assert result.ratio == 50.0
         assert progress.value == 1
         assert "圧縮完了" in status.value
         assert "50.0%" in status.value  # 圧縮率の確認
@@ -84,6 +94,332 @@ async def test_pdf_compression_error_handling(compression_service, mock_pdf_file
     status, progress = ui_components
     
     with patch('pikepdf.open', side_effect=Exception("テストエラー")):
-        await compression_service.compress_pdf(mock_pdf_file, status, progress)
+        result = await compression_service.compress_pdf(mock_pdf_file, FletCompressionProgress(status, progress))
         
-        assert "エラーが発生しました" in status.value 
\ No newline at end of file
+        assert result.error == "テストエラー"
+        assert "エラーが発生しました" in status.value 
+
+def image_streams(path):
+    with pikepdf.open(path) as pdf:
+        return [
+            (page.Resources.XObject.Im0.Filter, page.Resources.XObject.Im0.read_raw_bytes())
+            for page in pdf.pages
+        ]
+
+
+async def test_parallel_image_recompression_matches_sequential(tmp_path, make_image_pdf):
+    """並列での画像再圧縮が逐次処理と同じ結果になることのテスト"""
+    original = tmp_path / "original.pdf"
+    make_image_pdf(original)
+    outputs = []
+    for workers in (1, 4):
+        source = tmp_path / f"workers{workers}.pdf"
+        source.write_bytes(original.read_bytes())
+        service = PDFCompressionService(image_workers=workers)
+        try:
+            result = await service.compress_pdf(source, compression_ratio=50)
+        finally:
+            service.shutdown()
+        assert result.error is None
+        outputs.append(image_streams(result.output_path))
+
+    assert outputs[0] == outputs[1]
+    assert all(flt == '/DCTDecode' for flt, _ in outputs[0])
+
+
+async def test_images_are_downsampled_to_target_dpi(tmp_path, make_image_pdf):
+    """配置サイズから求めた実効解像度が目標まで下がることのテスト"""
+    source = tmp_path / "scan.pdf"
+    make_image_pdf(source, pages=1)  # 64x48ピクセルを64x48ポイントに配置 = 72dpi
+
+    service = PDFCompressionService(image_workers=1)
+    result = await service.compress_pdf(source, compression_ratio=25, target_dpi=36)
+
+    with pikepdf.open(result.output_path) as pdf:
+        image = pdf.pages[0].Resources.XObject.Im0
+        assert (int(image.Width), int(image.Height)) == (32, 24)
+    assert result.images_replaced == 1
+    assert result.image_bytes_after < result.image_bytes_before
+
+
+async def test_larger_encodings_are_not_written_back(tmp_path):
+    """再エンコードで小さくならない画像は元のまま残すことのテスト"""
+    art = Image.new('RGB', (64, 48), (255, 255, 255))
+    for x in range(64):
+        art.putpixel((x, 10), (200, 30, 30))
+    # 同じ符号化器で作った画像は、再圧縮しても小さくならない
+    encoded = recompress_image(ImageSource(original_size=len(art.tobytes()), image=art), quality=50).encoded
+    pdf = pikepdf.new()
+    image = pikepdf.Stream(pdf, encoded.data)
+    image.Type = pikepdf.Name.XObject
+    image.Subtype = pikepdf.Name.Image
+    image.Width, image.Height = encoded.width, encoded.height
+    image.ColorSpace = pikepdf.Array([
+        pikepdf.Name.Indexed, pikepdf.Name.DeviceRGB, len(encoded.palette) // 3 - 1, pikepdf.String(encoded.palette),
+    ])
+    image.BitsPerComponent = encoded.bits_per_component
+    image.Filter = pikepdf.Name.FlateDecode
+    page = pdf.add_blank_page()
+    page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=image))
+    source = tmp_path / "art.pdf"
+    pdf.save(source)
+
+    result = await PDFCompressionService(image_workers=1).compress_pdf(source, compression_ratio=50)
+
+    with pikepdf.open(result.output_path) as out:
+        assert out.pages[0].Resources.XObject.Im0.read_bytes() == zlib.decompress(encoded.data)
+    assert result.images_replaced == 0
+    assert result.image_classes == {
+        "palette": {"count": 1, "replaced": 0, "bytes_before": 0, "bytes_after": 0}
+    }
+
+
+async def test_compress_files_on_process_pool(tmp_path, make_image_pdf):
+    """複数のPDFをプロセスプールで圧縮し、全体の集計を返すことのテスト"""
+    sources = []
+    for i in range(3):
+        source = tmp_path / f"scan{i}.pdf"
+        make_image_pdf(source, pages=2)
+        sources.append(source)
+    listener = MagicMock()
+
+    service = PDFCompressionService(file_workers=2)
+    try:
+        summary = await service.compress_files(sources, listener, compression_ratio=50)
+    finally:
+        service.shutdown()
+
+    assert summary.failed == 0
+    assert [r.input_path for r in summary.results] == [str(s) for s in sources]
+    assert all(os.path.exists(r.output_path) for r in summary.results)
+    assert summary.pages == 6
+    assert summary.bytes_saved == summary.original_bytes - summary.compressed_bytes > 0
+    assert summary.mb_per_second > 0 and summary.pages_per_second > 0
+    assert listener.item_finished.call_count == 3
+    listener.batch_finished.assert_called_once_with(summary)
+
+
+async def test_memory_limit_runs_files_one_at_a_time(tmp_path, make_image_pdf):
+    """見積もりメモリ量が上限を超える場合は1件ずつ圧縮することのテスト"""
+    sources = []
+    for i in range(3):
+        source = tmp_path / f"scan{i}.pdf"
+        make_image_pdf(source, pages=1)
+        sources.append(source)
+    events = []
+    listener = MagicMock()
+    listener.item_started.side_effect = lambda index, name: events.append(("start", index))
+    listener.item_finished.side_effect = lambda index, result: events.append(("finish", index))
+
+    service = PDFCompressionService(file_workers=3, memory_limit_mb=1)
+    try:
+        summary = await service.compress_files(sources, listener, compression_ratio=50)
+    finally:
+        service.shutdown()
+
+    assert summary.failed == 0
+    assert events == [("start", 0), ("finish", 0), ("start", 1), ("finish", 1), ("start", 2), ("finish", 2)]
+
+
+async def test_low_memory_mode_matches_default_output(tmp_path, make_image_pdf):
+    """省メモリモードでも同じ結果になり、最大メモリ使用量が記録されることのテスト"""
+    original = tmp_path / "original.pdf"
+    make_image_pdf(original)
+    outputs = []
+    for low_memory in (False, True):
+        source = tmp_path / f"low_memory_{low_memory}.pdf"
+        source.write_bytes(original.read_bytes())
+        # 予算を極端に小さくしても、1件ずつ処理して完了する
+        service = PDFCompressionService(image_workers=4, low_memory=low_memory,
+                                        memory_budget_mb=1 if low_memory else None)
+        try:
+            result = await service.compress_pdf(source, compression_ratio=50)
+        finally:
+            service.shutdown()
+        assert result.error is None
+        outputs.append(image_streams(result.output_path))
+
+    assert outputs[0] == outputs[1]
+    if sys.platform.startswith("linux"):
+        assert result.peak_memory_bytes > 0
+
+
+async def test_stage_metrics_are_returned_from_worker_processes(tmp_path, make_image_pdf):
+    """ワーカープロセスで計測したステージごとの時間とカウンタが記録されることのテスト"""
+    sources = []
+    for i in range(2):
+        source = tmp_path / f"scan{i}.pdf"
+        make_image_pdf(source, pages=2)
+        sources.append(source)
+    log_path = tmp_path / "metrics.jsonl"
+    recorder = MetricsRecorder(log_path)
+
+    service = PDFCompressionService(file_workers=2, metrics=recorder)
+    try:
+        summary = await service.compress_files(sources, compression_ratio=50)
+    finally:
+        service.shutdown()
+
+    metrics = summary.results[0].metrics
+    assert {"open", "collect", "decode", "encode", "write_back", "save", "queue_wait"} <= set(metrics["stages"])
+    assert metrics["counters"]["pages"] == 2
+    assert metrics["counters"]["bytes_in"] == summary.results[0].original_size
+    assert len(log_path.read_text(encoding="utf-8").splitlines()) == 2
+    assert recorder.summary()["compress"]["jobs"] == 2
+
+
+async def test_metrics_are_off_by_default(tmp_path, make_image_pdf):
+    """計測を有効にしない場合は計測結果を持たないことのテスト"""
+    source = tmp_path / "scan.pdf"
+    make_image_pdf(source, pages=1)
+
+    result = await PDFCompressionService(image_workers=1).compress_pdf(source)
+
+    assert result.error is None
+    assert result.metrics is None
+
+
+async def test_target_size_picks_quality_and_encodes_once(tmp_path, make_image_pdf):
+    """目標サイズから品質を推定し、本番のエンコードは選んだ品質で1回だけ行うことのテスト"""
+    source = tmp_path / "scan.pdf"
+    make_image_pdf(source, pages=12)
+    service = PDFCompressionService(image_workers=1)
+    reference = await service.compress_pdf(source, compression_ratio=60)
+
+    with patch.object(service, "_recompress_images", wraps=service._recompress_images) as recompress:
+        result = await service.compress_pdf(source, target_size_mb=reference.compressed_size / (1024 * 1024))
+
+    assert result.error is None
+    assert recompress.call_count == 1
+    assert recompress.call_args.args[1] == result.quality
+    assert result.target_size == reference.compressed_size
+    assert result.estimated_size <= result.target_size
+    assert abs(result.compressed_size - result.estimated_size) < result.compressed_size * 0.25
+
+
+async def test_target_size_limits(tmp_path, make_image_pdf):
+    """余裕のある目標では最高品質、届かない目標では最低品質を選ぶことのテスト"""
+    source = tmp_path / "scan.pdf"
+    make_image_pdf(source, pages=3)
+    service = PDFCompressionService(image_workers=1)
+
+    generous = await service.compress_pdf(source, target_size_mb=100)
+    impossible = await service.compress_pdf(source, target_size_mb=0.0001)
+
+    assert generous.quality == 95
+    assert impossible.quality == 5
+    assert impossible.compressed_size > impossible.target_size
+
+
+async def test_analysis_lists_images_without_encoding(tmp_path, make_image_pdf, make_jpeg_pdf):
+    """分析が画像をエンコードせずに、固有の画像ごとの情報と削減見込みを返すことのテスト"""
+    flate = tmp_path / "flate.pdf"
+    shared = tmp_path / "shared.pdf"
+    make_image_pdf(flate, pages=2)
+    make_jpeg_pdf(shared, quality=90)
+    service = PDFCompressionService(image_workers=1)
+
+    with patch("domain.image_recompressor.recompress_image") as recompress:
+        flate_analysis = await service.analyze_pdf(flate, compression_ratio=75)
+        shared_analysis = await service.analyze_pdf(shared, compression_ratio=75)
+
+    recompress.assert_not_called()
+    assert flate_analysis.error is None
+    assert [image.pages for image in flate_analysis.images] == [[1], [2]]
+    first = flate_analysis.images[0]
+    assert (first.filter, first.width, first.height, first.bits_per_component) == ("/FlateDecode", 64, 48, 8)
+    assert first.estimated_bytes < first.bytes
+    assert flate_analysis.estimated_savings > 0
+
+    assert len(shared_analysis.images) == 1
+    assert shared_analysis.image_references == 3
+    image = shared_analysis.images[0]
+    assert image.pages == [1, 2, 3]
+    assert image.jpeg_quality == 90
+    assert shared_analysis.to_dict()["images"][0]["estimated_savings"] == image.bytes - image.estimated_bytes
+
+
+async def test_files_without_expected_savings_are_skipped(tmp_path, make_jpeg_pdf):
+    """要求より低い品質のJPEGだけを持つPDFは、再圧縮・保存せずにスキップすることのテスト"""
+    source = tmp_path / "low.pdf"
+    make_jpeg_pdf(source, quality=20)
+    service = PDFCompressionService(image_workers=1, min_savings_ratio=0.01)
+
+    with patch.object(service, "_recompress_images", wraps=service._recompress_images) as recompress:
+        skipped = await service.compress_pdf(source, compression_ratio=75)
+
+    assert skipped.error is None
+    assert skipped.skipped
+    assert skipped.output_path is None
+    assert skipped.compressed_size == skipped.original_size
+    assert skipped.estimated_savings == 0
+    recompress.assert_not_called()
+    assert not (tmp_path / "compressed_low.pdf").exists()
+
+    # 削減を見込める設定では通常どおり圧縮する
+    compressed = await service.compress_pdf(source, compression_ratio=95)
+    assert not compressed.skipped
+    assert os.path.exists(compressed.output_path)
+
+
+async def test_save_profiles_trade_speed_for_size(tmp_path, make_font_pdf):
+    """保存プロファイルごとに、書き換えていないストリームの扱いと取り除くデータが変わることのテスト"""
+    source = tmp_path / "fonts.pdf"
+    make_font_pdf(source)
+    with pikepdf.open(source) as pdf:
+        original_contents = pdf.pages[0].Contents.read_raw_bytes()
+
+    results = {}
+    for profile in ("fast", "balanced", "maximum"):
+        service = PDFCompressionService(image_workers=1, save_profile=profile)
+        results[profile] = await service.compress_pdf(source)
+        os.replace(results[profile].output_path, tmp_path / f"{profile}.pdf")
+        assert results[profile].error is None
+        assert results[profile].save_profile == profile
+        assert results[profile].save_seconds > 0
+
+    with pikepdf.open(tmp_path / "fast.pdf") as pdf:
+        # 速度優先では手を加えていないストリームをそのまま書き出す
+        assert pdf.pages[0].Contents.read_raw_bytes() == original_contents
+        assert pdf.docinfo.get("/Title") == "Sample"
+    with pikepdf.open(tmp_path / "balanced.pdf") as pdf:
+        assert pdf.pages[0].Contents.read_raw_bytes() != original_contents
+        assert "/Metadata" in pdf.Root
+    with pikepdf.open(tmp_path / "maximum.pdf") as pdf:
+        font_files = {page.Resources.Font.F1.FontDescriptor.FontFile2.objgen for page in pdf.pages}
+        assert len(font_files) == 1
+        assert "/Unused" not in pdf.pages[0].Resources.XObject
+        assert "/Metadata" not in pdf.Root
+        assert "/Title" not in pdf.docinfo
+    assert results["maximum"].compressed_size < results["balanced"].compressed_size < results["fast"].compressed_size
+
+
+def test_unknown_save_profile_is_rejected():
+    """不明な保存プロファイルを指定するとValueErrorになることのテスト"""
+    with pytest.raises(ValueError):
+        PDFCompressionService(save_profile="smallest")
+
+
+async def test_maximum_profile_counts_font_and_metadata_savings(tmp_path, make_font_pdf):
+    """画像のないPDFでも、最大圧縮では重複フォントとメタデータの削減を見込んでスキップしないことのテスト"""
+    source = tmp_path / "fonts.pdf"
+    make_font_pdf(source)
+    # 圧縮されていないストリームを残さず、画像以外の削減はフォントとメタデータだけにする
+    with pikepdf.open(source, allow_overwriting_input=True) as pdf:
+        for page in pdf.pages:
+            del page.Resources['/XObject']
+        pdf.save(source, compress_streams=True)
+
+    balanced = await PDFCompressionService(
+        image_workers=1, min_savings_ratio=DEFAULT_MIN_SAVINGS_RATIO,
+    ).compress_pdf(source)
+    maximum = await PDFCompressionService(
+        image_workers=1, min_savings_ratio=DEFAULT_MIN_SAVINGS_RATIO, save_profile="maximum", metrics=MetricsRecorder(),
+    ).compress_pdf(source)
+
+    assert balanced.skipped
+    assert maximum.error is None
+    assert not maximum.skipped
+    assert maximum.estimated_savings > 0
+    assert maximum.metrics["counters"]["fonts_merged"] == 2
+    assert maximum.compressed_size < maximum.original_size
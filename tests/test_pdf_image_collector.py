@@ -0,0 +1,71 @@
+import pikepdf
+
+from domain.pdf_image_collector import PdfImageCollector
+
+
+def make_image(pdf, filter_=None):
+    image = pikepdf.Stream(pdf, b"\x00" * 12)
+    image.Type = pikepdf.Name.XObject
+    image.Subtype = pikepdf.Name.Image
+    image.Width, image.Height = 2, 2
+    image.ColorSpace = pikepdf.Name.DeviceRGB
+    image.BitsPerComponent = 8
+    if filter_:
+        image.Filter = filter_
+    return pdf.make_indirect(image)
+
+
+def make_form(pdf, **xobjects):
+    form = pikepdf.Stream(pdf, b"/Im0 Do")
+    form.Type = pikepdf.Name.XObject
+    form.Subtype = pikepdf.Name.Form
+    form.BBox = [0, 0, 10, 10]
+    form.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(**xobjects))
+    return pdf.make_indirect(form)
+
+
+def test_shared_images_are_collected_once():
+    """複数ページで共有された画像が1件にまとめられることのテスト"""
+    pdf = pikepdf.new()
+    logo = make_image(pdf)
+    for _ in range(3):
+        page = pdf.add_blank_page()
+        page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Logo=logo))
+
+    collector = PdfImageCollector()
+    for i, page in enumerate(pdf.pages):
+        collector.add_page(page, i + 1)
+
+    assert collector.references == 3
+    assert collector.unique_images == 1
+    assert collector.jobs[0].pages == [1, 2, 3]
+
+
+def test_images_inside_forms_are_collected():
+    """Form XObjectの中の画像（自己参照を含む）も収集されることのテスト"""
+    pdf = pikepdf.new()
+    inner = make_image(pdf)
+    form = make_form(pdf, Im0=inner)
+    form.Resources.XObject.Self = form
+    page = pdf.add_blank_page()
+    page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Fm0=form))
+
+    collector = PdfImageCollector()
+    collector.add_page(pdf.pages[0], 1)
+
+    assert [job.objgen for job in collector.jobs] == [inner.objgen]
+
+
+def test_rejected_images_are_counted_but_not_queued():
+    """対象外の画像は件数に含めつつ再圧縮の対象にしないことのテスト"""
+    pdf = pikepdf.new()
+    jpeg = make_image(pdf, pikepdf.Name.DCTDecode)
+    raw = make_image(pdf)
+    page = pdf.add_blank_page()
+    page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=jpeg, Im1=raw))
+
+    collector = PdfImageCollector(accept=lambda xobj: xobj.get('/Filter') != '/DCTDecode')
+    collector.add_page(pdf.pages[0], 1)
+
+    assert collector.unique_images == 2
+    assert [job.objgen for job in collector.jobs] == [raw.objgen]
@@ -0,0 +1,84 @@
+import io
+from unittest.mock import patch
+
+import pikepdf
+
+from application.conversion_service import ConversionService
+from application.pdf_compression_service import PDFCompressionService
+from application.pdf_pipeline import PdfPipeline
+from application.progress import ProgressListener
+
+
+class RecordingListener(ProgressListener):
+    def __init__(self):
+        self.events = []
+
+    def item_started(self, index, name):
+        self.events.append(("started", index))
+
+    def item_finished(self, index, result):
+        self.events.append(("finished", index))
+
+
+def make_pipeline():
+    return PdfPipeline(
+        PDFCompressionService(image_workers=1, file_workers=0),
+        ConversionService(max_workers=0),
+    )
+
+
+async def test_pipeline_reads_once_and_writes_both_outputs(tmp_path, make_report_pdf):
+    """入力を1回だけ読み込み、圧縮したPDFとMarkdownの両方を1件の結果として返すことのテスト"""
+    source = tmp_path / "report.pdf"
+    make_report_pdf(source)
+    pipeline = make_pipeline()
+    listener = RecordingListener()
+
+    with patch("pikepdf.open", wraps=pikepdf.open) as pdf_open, \
+            patch("domain.markdown_converter.open", create=True) as file_open:
+        summary = await pipeline.process_files([source], listener)
+
+    result = summary.results[0]
+    assert result.error is None
+    assert result.state == "done"
+    assert result.input_bytes == source.stat().st_size
+    # 圧縮も変換も読み込み済みの内容を使い、ファイルを開き直さない
+    assert isinstance(pdf_open.call_args.args[0], io.BytesIO)
+    file_open.assert_not_called()
+    assert (tmp_path / "compressed_report.pdf").exists()
+    assert "Pipeline report" in (tmp_path / "report.md").read_text(encoding="utf-8")
+    assert result.compression.original_size == result.input_bytes
+    assert result.conversion.state == "done"
+    assert listener.events == [("started", 0), ("finished", 0)]
+    assert summary.to_dict()["failed"] == 0
+
+
+async def test_pipeline_output_matches_separate_services(tmp_path, make_report_pdf):
+    """まとめて実行した結果が、圧縮と変換を別々に実行した結果と一致することのテスト"""
+    source = tmp_path / "a.pdf"
+    make_report_pdf(source)
+    pipeline = make_pipeline()
+
+    compressed = await pipeline.compression_service.compress_pdf(source)
+    converted = await pipeline.conversion_service.convert_file(source)
+    markdown = (tmp_path / "a.md").read_text(encoding="utf-8")
+    result = (await pipeline.process_files([source])).results[0]
+
+    assert result.compression.compressed_size == compressed.compressed_size
+    assert result.compression.images_replaced == compressed.images_replaced == 1
+    assert result.conversion.output_bytes == converted.output_bytes
+    assert (tmp_path / "a.md").read_text(encoding="utf-8") == markdown
+
+
+async def test_pipeline_reports_missing_files_as_one_error(tmp_path):
+    """読み込めないファイルは両方の処理を行わず、1件のエラーとして返すことのテスト"""
+    pipeline = make_pipeline()
+    listener = RecordingListener()
+
+    summary = await pipeline.process_files([tmp_path / "missing.pdf"], listener)
+
+    result = summary.results[0]
+    assert result.state == "error"
+    assert result.compression is None and result.conversion is None
+    assert summary.failed == 1
+    assert listener.events == [("started", 0), ("finished", 0)]
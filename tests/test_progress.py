@@ -0,0 +1,50 @@
+from application.progress import ProgressListener, ThrottledProgress
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Recorder(ProgressListener):
+    def __init__(self):
+        self.fractions = []
+        self.finished = []
+
+    def item_progress(self, index, fraction):
+        self.fractions.append(fraction)
+
+    def item_finished(self, index, result):
+        self.finished.append(index)
+
+
+def test_throttled_progress_coalesces_small_and_frequent_updates():
+    """進捗が細かく・頻繁な場合に通知が間引かれることのテスト"""
+    clock = FakeClock()
+    recorder = Recorder()
+    listener = ThrottledProgress(recorder, fps=10, min_step=0.05, clock=clock)
+
+    # 2,000ページ分の通知を1ミリ秒間隔で送る
+    for page in range(1, 2001):
+        clock.now = page * 0.001
+        listener.item_progress(0, page / 2000)
+    listener.item_finished(0, None)
+
+    assert len(recorder.fractions) <= 21
+    assert recorder.fractions[0] == 1 / 2000
+    assert recorder.fractions[-1] == 1.0
+    assert recorder.finished == [0]
+
+
+def test_throttled_progress_can_disable_limits():
+    """fps・min_stepに0を指定すると間引かないことのテスト"""
+    recorder = Recorder()
+    listener = ThrottledProgress(recorder, fps=0, min_step=0)
+
+    for i in range(10):
+        listener.item_progress(0, i / 10)
+
+    assert len(recorder.fractions) == 10
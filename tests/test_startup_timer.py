@@ -0,0 +1,56 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from infrastructure.startup_timer import StartupTimer, cold_import_times
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 10.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_marks_are_relative_to_start():
+    """各段階の時刻が起点からの経過時間で記録されることのテスト"""
+    clock = FakeClock()
+    timer = StartupTimer(clock=clock)
+    clock.now = 10.5
+    timer.mark("first_frame")
+
+    assert timer.to_dict() == {"marks": {"first_frame": 0.5}, "imports": {}}
+
+
+def test_only_newly_imported_modules_are_recorded(tmp_path, monkeypatch):
+    """初めて読み込んだモジュールだけ読み込み時間が記録されることのテスト"""
+    (tmp_path / "startup_timer_sample.py").write_text("VALUE = 1\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "startup_timer_sample", raising=False)
+    timer = StartupTimer()
+
+    timer.warm_up(["json", "startup_timer_sample", "missing_module_for_startup_test"])
+
+    assert list(timer.imports) == ["startup_timer_sample"]
+
+
+def test_cold_import_times_reports_missing_modules():
+    """別プロセスでの読み込み時間と、読み込めないモジュールの扱いのテスト"""
+    times = cold_import_times(["json", "missing_module_for_startup_test"])
+
+    assert times["json"] > 0
+    assert times["missing_module_for_startup_test"] is None
+
+
+def test_services_do_not_import_heavy_libraries():
+    """サービスの読み込み時にpikepdf・Pillow・markitdownを読み込まないことのテスト"""
+    code = (
+        "import sys, application.conversion_service, application.pdf_compression_service; "
+        "sys.exit(any(m in sys.modules for m in ('pikepdf', 'PIL', 'markitdown')))"
+    )
+    completed = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR)
+
+    assert completed.returncode == 0